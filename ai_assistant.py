@@ -1,13 +1,29 @@
 import os
-import openai
-from openai import OpenAI
+import threading
 import streamlit as st
 import json
 from database import get_responses
+from instrumentation import traced
+from metrics import OPENAI_REQUEST_SECONDS, OPENAI_ERRORS
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+# The OpenAI client is created on first use, which keeps the openai import
+# and client construction off the app's startup path
+_client = None
+_client_lock = threading.Lock()
 
+def get_client():
+    """Get the shared OpenAI client, creating it on first use"""
+    global _client
+    
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    
+    return _client
+
+@traced("llm")
 def generate_chatbot_response(user_input, survey_responses=None, chat_history=None):
     """
     Generates a response from the AI chatbot based on user input and survey responses.
@@ -105,17 +121,20 @@ def generate_chatbot_response(user_input, survey_responses=None, chat_history=No
     try:
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=150
-        )
+        with OPENAI_REQUEST_SECONDS.time(call="chat"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=150
+            )
         
         return response.choices[0].message.content
     except Exception as e:
+        OPENAI_ERRORS.inc(call="chat")
         return f"I'm having trouble connecting right now. Please try again later. Error: {str(e)}"
 
+@traced("llm")
 def get_initial_message(survey_responses=None):
     """
     Generates an initial message from the AI assistant based on survey responses.
@@ -167,13 +186,15 @@ def get_initial_message(survey_responses=None):
     try:
         # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
         # do not change this unless explicitly requested by the user
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=150
-        )
+        with OPENAI_REQUEST_SECONDS.time(call="initial_message"):
+            response = get_client().chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=150
+            )
         
         return response.choices[0].message.content
     except Exception as e:
+        OPENAI_ERRORS.inc(call="initial_message")
         return "Thanks for completing the survey! I'm Hurdl, your wellbeing assistant. How are you feeling about work this week?"
\ No newline at end of file
@@ -4,20 +4,26 @@ import datetime
 import uuid
 import os
 import time
-from utils import initialize_session_state, admin_login, check_password
-from survey_questions import get_survey_questions
-from data_analysis import (calculate_wellbeing_index, 
-                           calculate_psychological_safety, 
-                           analyze_sentiment, 
-                           detect_trends,
-                           calculate_workload_scores)
-from visualization import (render_wellbeing_chart, 
-                           render_safety_chart, 
-                           render_sentiment_chart,
-                           render_workload_heatmap,
-                           render_trend_alerts)
-from database import get_responses, get_filtered_responses, save_response
-from ai_assistant import generate_chatbot_response, get_initial_message
+from utils import initialize_session_state, admin_login, get_current_tenant, is_admin
+from survey_questions import CURRENT_SURVEY_VERSION, get_metric_columns, get_survey
+from database import (get_responses, get_filtered_responses, get_binned_scores, get_cube, get_response_counts,
+                      get_sketch_summary, get_text_summary, get_theme_summary, get_data_version, save_response, search_comments,
+                      get_forecasts, get_forecast_week, closed_week, DatabaseBusyError, SEARCH_PAGE_SIZE)
+from privacy import MIN_GROUP_SIZE, is_reportable, protect, suppression_mask
+from forecasting import risk_flags
+from instrumentation import profile_run, traced
+from shared_cache import get_shared_cache
+from session_store import get_session_store
+from metrics import (SUBMISSIONS, LOAD_RESPONSES_REQUESTS, LOAD_RESPONSES_MISSES, SCRIPT_RUNS,
+                     DASHBOARD_RENDER_SECONDS, start_metrics_server)
+
+# data_analysis (TextBlob), visualization (altair/plotly), ai_assistant
+# (OpenAI) and shared_dataset (pyarrow) are imported where they are first
+# used, so employees filling in the check-in never pay for the dashboard
+# and chatbot dependencies
+
+# Read responses from the loader's shared memory (see shared_dataset.py)
+SHARED_DATASET = os.environ.get("HURDL_SHARED_DATASET") == "1"
 
 # Set page config
 st.set_page_config(
@@ -30,6 +36,10 @@ st.set_page_config(
 # Initialize session state
 initialize_session_state()
 
+# Expose Prometheus metrics on a local port when configured
+if os.environ.get("HURDL_METRICS_PORT"):
+    start_metrics_server(int(os.environ["HURDL_METRICS_PORT"]), os.environ.get("HURDL_METRICS_ADDR", "127.0.0.1"))
+
 # Create necessary folders
 if not os.path.exists("data"):
     try:
@@ -39,75 +49,248 @@ if not os.path.exists("data"):
         pass
 
 # Load data
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def load_responses():
-    """Load responses from the database"""
+def load_responses(tenant=None, data_version=None):
+    """
+    Load responses from the tenant's database (cached). Cached copies are
+    keyed by the data version, so they are reused until the next write and
+    never served after it.
+    """
+    LOAD_RESPONSES_REQUESTS.inc()
+    
+    if data_version is None:
+        data_version = get_data_version(tenant)
+    
+    if SHARED_DATASET:
+        from shared_dataset import attach_responses
+        
+        # Zero-copy views of the responses the loader published to shared
+        # memory, used whenever they are up to date
+        version, df = attach_responses(tenant)
+        if df is not None and version == data_version:
+            return df
+    
     try:
-        # Get responses from the database
-        return get_responses()
+        return _load_responses_cached(tenant, data_version)
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return pd.DataFrame()
 
+# The cached loaders below take the data version (or, for forecasts, the
+# last week folded in) only as part of the cache key: it changes on every
+# write, so new data misses the cache instead of being read stale.
+
+# Each entry is a full copy of a tenant's responses; older versions are
+# never asked for again and age out
+@st.cache_data(max_entries=8, show_spinner=False)
+def _load_responses_cached(tenant, data_version):
+    # Only runs the first time this process sees this version of the data.
+    # Other workers may already have loaded it into the shared cache.
+    return get_shared_cache().get_or_compute("responses", (tenant,), data_version,
+                                             lambda: _read_responses(tenant))
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_filtered_responses(tenant, start_date, end_date, department, location, data_version):
+    """
+    Load the responses matching the dashboard filters (cached).
+    """
+    return get_filtered_responses(start_date=start_date, end_date=end_date, department=department,
+                                  location=location, tenant=tenant)
+
+def _read_responses(tenant):
+    # Only runs when no worker has loaded this version yet
+    LOAD_RESPONSES_MISSES.inc()
+    return get_responses(tenant=tenant)
+
+def shared_result(name, chart_key, compute):
+    """
+    Compute a dashboard result once per filters and data version across all
+    workers. chart_key ends with the data version, the rest is the key.
+    """
+    return get_shared_cache().get_or_compute(name, chart_key[:-1], chart_key[-1], compute)
+
+@st.cache_data(max_entries=64)
+def load_trend_series(tenant, start_date, end_date, department, location, data_version):
+    """
+    Load the binned trend series for the dashboard charts (cached).
+    """
+    from data_analysis import choose_time_bin
+
+    # Trend lines are binned in SQL so the charts get one point per period
+    # instead of one per response
+    filters = dict(start_date=start_date, end_date=end_date, department=department,
+                   location=location, tenant=tenant)
+    freq = choose_time_bin(start_date, end_date)
+    return {
+        "freq": freq,
+        "overall": get_binned_scores(["wellbeing", "safety", "workload"], freq,
+                                     min_group_size=MIN_GROUP_SIZE, **filters),
+        "by_department": get_binned_scores(["wellbeing"], freq, by="department",
+                                           min_group_size=MIN_GROUP_SIZE, **filters)
+    }
+
+@st.cache_data(max_entries=64)
+def load_search_page(tenant, start_date, end_date, department, location, data_version, search_text, page):
+    """
+    Load one page of comment search results and the number of matches
+    (cached, so paging back and forth doesn't search again).
+    """
+    return search_comments(search_text, start_date, end_date, department, location, tenant=tenant,
+                           limit=SEARCH_PAGE_SIZE, offset=(page - 1) * SEARCH_PAGE_SIZE)
+
+@st.cache_data(max_entries=16)
+def load_forecasts(tenant, metric, last_week):
+    """
+    Load a metric's department forecasts (cached). Check-ins update them
+    in the background once a week closes.
+    """
+    return get_forecasts(metric, tenant=tenant)
+
+@st.cache_data(max_entries=64)
+def is_selection_reportable(tenant, start_date, end_date, department, location, data_version):
+    """
+    Whether the responses matching the dashboard filters can be shown
+    without identifying anyone (cached): at least MIN_GROUP_SIZE of them,
+    and not recoverable by subtracting the other departments or locations
+    from the unfiltered totals.
+    """
+    by = [column for column, value in (("department", department), ("location", location)) if value]
+    if not by:
+        counts = get_response_counts(["department"], start_date, end_date, tenant=tenant)
+        return is_reportable(counts["responses"].sum())
+    
+    counts = get_response_counts(by, start_date, end_date, tenant=tenant)
+    selected = (counts[by] == [value for value in (department, location) if value]).all(axis=1).to_numpy()
+    if not selected.any():
+        return False
+    
+    hidden = suppression_mask(counts["responses"].to_numpy(), [counts[column].to_numpy() for column in by])
+    return not hidden[selected].any()
+
+# Number of profiled reruns kept per session for export
+MAX_TRACES = 20
+
+# Sections of the HR dashboard, one shown at a time
+DASHBOARD_TABS = [
+    "Wellbeing Index",
+    "Psychological Safety",
+    "Workload Heatmap",
+    "Department × Location",
+    "Week over Week",
+    "Distribution",
+    "Sentiment Analysis",
+    "Comment Search",
+    "Trend Alerts",
+    "Forecast",
+    "Response Breakdown"
+]
+
+# "form" shows the whole check-in as one form submitted once; "steps" shows
+# one question per page, which costs a server script run per question
+SURVEY_MODE = os.environ.get("HURDL_SURVEY_MODE", "form")
+
 # Main application
 def main():
+    # Admins can opt in to profiling every script run
+    profiling = st.session_state.authenticated and st.session_state.show_profiler
+    
+    with profile_run("rerun", enabled=profiling) as trace:
+        render_app()
+    
+    if trace is not None:
+        from visualization import render_profiler_panel
+        
+        st.session_state.traces = (st.session_state.get("traces", []) + [trace])[-MAX_TRACES:]
+        render_profiler_panel(trace, st.session_state.traces)
+
+def render_app():
+    # Resolve the organisation whose database shard this session uses
+    try:
+        tenant = get_current_tenant()
+    except ValueError as e:
+        st.error(str(e))
+        return
+    
     # Sidebar
     with st.sidebar:
         st.title("Hurdl")
         st.subheader("Workplace Wellbeing Platform")
         
         # Navigation
-        if st.session_state.authenticated:
+        if is_admin(tenant):
             st.sidebar.success("Logged in as Admin")
+            st.sidebar.checkbox("Show performance profiler", key="show_profiler")
             if st.sidebar.button("Logout"):
                 st.session_state.authenticated = False
+                st.session_state.admin_tenant = None
                 st.rerun()
                 
             page = "HR Dashboard"
         else:
             page = st.sidebar.radio("Navigation", ["Employee Check-in", "HR Dashboard"])
             
-            if page == "HR Dashboard" and not st.session_state.authenticated:
+            if page == "HR Dashboard":
                 st.sidebar.info("Please log in to access the HR Dashboard")
-                admin_login()
+                admin_login(tenant)
         
         st.sidebar.image("https://pixabay.com/get/g16b831cd415041e78ecfba9a297568f21cff48e1aeb86dbf89906a21cd975e3c5a83197d60f95b27065b6b75872328c956788bffde50d82a9d5f8107fcf6d5c2_1280.jpg", 
                          caption="Mental Wellbeing", use_container_width=True)
     
+    SCRIPT_RUNS.inc(page=page)
+    
     # Main content
     if page == "Employee Check-in":
-        render_employee_checkin()
-    elif page == "HR Dashboard" and st.session_state.authenticated:
-        render_hr_dashboard()
+        render_employee_checkin(tenant)
+    elif page == "HR Dashboard" and is_admin(tenant):
+        with DASHBOARD_RENDER_SECONDS.time():
+            render_hr_dashboard(tenant)
     elif page == "HR Dashboard":
         st.title("HR Dashboard")
         st.info("Please log in using the sidebar to access the HR Dashboard")
 
-def render_employee_checkin():
+# Departments and locations employees choose from on the check-in
+CHECKIN_DEPARTMENTS = ["Engineering", "Marketing", "Sales", "Product", "HR", "Finance", "Other"]
+CHECKIN_LOCATIONS = ["Remote", "HQ", "Regional Office", "Other"]
+
+BUSY_MESSAGE = ("We couldn't save your check-in because lots of people are submitting right now. "
+                "Your answers are kept, please press Submit Survey again.")
+
+@traced("page")
+def render_employee_checkin(tenant=None):
     st.title("Weekly Wellbeing Check-in")
     st.subheader("Your anonymous feedback helps create a better workplace")
     
+    if SURVEY_MODE == "form":
+        render_survey_form(tenant)
+    else:
+        render_survey_steps(tenant)
+    
+    render_checkin_chatbot()
+
+def render_survey_steps(tenant=None):
+    """
+    One question per script run: every "Next Question" click re-runs the
+    whole script on the server (HURDL_SURVEY_MODE=steps).
+    """
     # Basic info (still anonymous)
     col1, col2 = st.columns(2)
     with col1:
-        department = st.selectbox(
-            "Department",
-            ["Engineering", "Marketing", "Sales", "Product", "HR", "Finance", "Other"]
-        )
+        department = st.selectbox("Department", CHECKIN_DEPARTMENTS)
     
     with col2:
-        location = st.selectbox(
-            "Location",
-            ["Remote", "HQ", "Regional Office", "Other"]
-        )
+        location = st.selectbox("Location", CHECKIN_LOCATIONS)
     
     # Show progress
     if "survey_step" not in st.session_state:
         st.session_state.survey_step = 0
     
-    # Get questions
-    questions = get_survey_questions()
-    total_questions = sum(1 for q in questions if q["type"] != "header")
+    # A survey started before a new version was deployed finishes on the
+    # version it started with
+    if "survey_version" not in st.session_state:
+        st.session_state.survey_version = CURRENT_SURVEY_VERSION
+    
+    # Get questions (compiled once per process)
+    survey = get_survey(st.session_state.survey_version)
+    total_questions = survey.total_questions
     
     # Display progress
     if st.session_state.survey_step > 0:
@@ -136,40 +319,13 @@ def render_employee_checkin():
             submit_label = "Start Survey"
         
         elif st.session_state.survey_step > 0 and st.session_state.survey_step <= total_questions:
-            # Find current question (accounting for headers)
-            current_q_index = 0
-            current_q = None
-            
-            for i, q in enumerate(questions):
-                if q["type"] != "header":
-                    current_q_index += 1
-                
-                if current_q_index == st.session_state.survey_step:
-                    current_q = q
-                    break
-                
-                # Also display any headers that come before this question
-                if q["type"] == "header" and current_q_index == st.session_state.survey_step - 1:
-                    st.subheader(q["text"])
+            # Display any headers that come before this question
+            for header in survey.headers_before(st.session_state.survey_step):
+                st.subheader(header)
             
             # Display the current question
-            if current_q:
-                if current_q["type"] == "scale":
-                    st.write(current_q["text"])
-                    response = st.slider("Rating", 1, 5, 3, 
-                                        help="1 = Strongly Disagree, 5 = Strongly Agree",
-                                        key=f"q_{current_q['id']}")
-                    st.session_state.responses[f"q_{current_q['id']}"] = response
-                
-                elif current_q["type"] == "text":
-                    st.write(current_q["text"])
-                    response = st.text_area("Response", key=f"q_{current_q['id']}")
-                    st.session_state.responses[f"q_{current_q['id']}"] = response
-                
-                elif current_q["type"] == "radio":
-                    st.write(current_q["text"])
-                    response = st.radio("Options", current_q["options"], key=f"q_{current_q['id']}")
-                    st.session_state.responses[f"q_{current_q['id']}"] = response
+            current_q = survey.question(st.session_state.survey_step)
+            st.session_state.responses[current_q.column] = render_question(current_q)
             
             if st.session_state.survey_step == total_questions:
                 submit_label = "Submit Survey"
@@ -181,14 +337,6 @@ def render_employee_checkin():
             st.success("Thank you for completing the survey!")
             # Removed balloons effect
             submit_label = "Start New Survey"
-            
-            # Set flag to show chatbot after form is submitted
-            if st.session_state.survey_step == total_questions + 1:
-                # Store the survey responses for the chatbot
-                st.session_state.current_survey_responses = st.session_state.responses
-                
-                # Set flag to show chatbot
-                st.session_state.show_chatbot = True
         
         # Submit button
         submitted = st.form_submit_button(submit_label)
@@ -205,25 +353,16 @@ def render_employee_checkin():
                 st.rerun()
             
             elif st.session_state.survey_step == total_questions:
-                # Save responses
-                new_response = {
-                    "response_id": str(uuid.uuid4()),
-                    "timestamp": datetime.datetime.now(),
-                    "department": department,
-                    "location": location
-                }
-                
-                # Add all question responses
-                for key, value in st.session_state.responses.items():
-                    new_response[key] = value
-                
-                # Save to database
-                save_response(new_response)
+                # Save responses. If the database is too busy the answers are
+                # kept, so pressing submit again retries the save.
+                if not save_checkin(st.session_state.responses, department, location, tenant,
+                                    survey_version=survey.version):
+                    st.error(BUSY_MESSAGE)
+                    return
                 
-                # Refresh data by invalidating the cache
-                # In newer Streamlit versions we'd use st.cache_data.clear()
-                # but we'll use rerun to achieve the same effect
-                pass
+                # Start the chatbot on the survey responses
+                get_session_store().start_chat(st.session_state.session_id, st.session_state.responses)
+                st.session_state.show_chatbot = True
                 
                 # Reset for thank you message
                 st.session_state.survey_step = total_questions + 1
@@ -232,23 +371,37 @@ def render_employee_checkin():
                 st.rerun()
             
             else:
-                # Reset to start again
+                # Reset to start again, on the current survey version
                 st.session_state.survey_step = 0
+                del st.session_state.survey_version
                 st.rerun()
+
+def render_checkin_chatbot():
+    store = get_session_store()
+    session_id = st.session_state.session_id
     
-    # Show chatbot if survey was completed
+    chat = None
     if st.session_state.show_chatbot:
+        chat = store.get(session_id)
+        if chat is None:
+            # The conversation was evicted while the tab sat idle
+            st.session_state.show_chatbot = False
+    
+    # Show chatbot if survey was completed
+    if chat is not None:
+        from ai_assistant import generate_chatbot_response, get_initial_message
+        
         st.subheader("Chat with Hurdl AI Assistant")
         st.write("Our AI assistant is here to chat about your wellbeing and provide support based on your survey responses.")
         
         # Initialize chat if it's empty
-        if not st.session_state.chat_messages:
+        if not chat.message_count:
             # Add initial message from AI
-            initial_message = get_initial_message(st.session_state.current_survey_responses)
-            st.session_state.chat_messages.append({"role": "assistant", "content": initial_message})
+            initial_message = get_initial_message(chat.survey_responses)
+            store.add_message(session_id, "assistant", initial_message)
         
-        # Display chat messages
-        for message in st.session_state.chat_messages:
+        # Display chat messages (older ones are read back from the chat store)
+        for message in store.history(session_id):
             if message["role"] == "user":
                 st.chat_message("user").write(message["content"])
             else:
@@ -257,21 +410,22 @@ def render_employee_checkin():
         # Chat input
         if prompt := st.chat_input("Type your message here..."):
             # Add user message to chat history
-            st.session_state.chat_messages.append({"role": "user", "content": prompt})
+            store.add_message(session_id, "user", prompt)
             
             # Display user message
             st.chat_message("user").write(prompt)
             
             # Generate response
             with st.spinner("Thinking..."):
+                # Only the recent turns kept in memory are sent as context
                 response = generate_chatbot_response(
                     prompt, 
-                    st.session_state.current_survey_responses,
-                    [m for m in st.session_state.chat_messages if m["role"] != "system"]
+                    chat.survey_responses,
+                    store.recent_messages(session_id)
                 )
             
             # Add AI response to chat history
-            st.session_state.chat_messages.append({"role": "assistant", "content": response})
+            store.add_message(session_id, "assistant", response)
             
             # Display AI response
             st.chat_message("assistant", avatar="🧠").write(response)
@@ -283,11 +437,148 @@ def render_employee_checkin():
         st.image("https://pixabay.com/get/ga933469d2f3c1804571fb9364004d9f1a23479dbb1f9a411723cc1ed6eb9421e63bce3237089010787f794249903b9115cffcf0e1cd289fe55a75a7961316116_1280.jpg", 
                 caption="Wellness in the workplace", use_container_width=True)
 
-def render_hr_dashboard():
+def render_survey_form(tenant=None):
+    """
+    The whole questionnaire as one form (HURDL_SURVEY_MODE=form). Answering
+    questions happens in the browser without running anything on the
+    server; submitting saves the response and shows the thank-you message
+    in a single script run.
+    """
+    if st.session_state.get("survey_submitted"):
+        st.success("Thank you for completing the survey!")
+        st.button("Start New Survey", on_click=reset_survey_form)
+        return
+    
+    if "survey_error" in st.session_state:
+        st.error(st.session_state.pop("survey_error"))
+    
+    survey = get_survey()
+    
+    with st.form(key="survey_form"):
+        st.markdown("""
+        ### Welcome to your weekly check-in
+        
+        This quick survey helps us understand how you're feeling at work.
+        Your responses are completely anonymous and will help improve our workplace.
+        
+        It will take less than 3 minutes to complete.
+        """)
+        
+        # Basic info (still anonymous). Inside the form, so changing them
+        # doesn't run the script either.
+        col1, col2 = st.columns(2)
+        with col1:
+            st.selectbox("Department", CHECKIN_DEPARTMENTS, key="checkin_department")
+        
+        with col2:
+            st.selectbox("Location", CHECKIN_LOCATIONS, key="checkin_location")
+        
+        for q in survey.questions:
+            for header in survey.headers_before(q.step):
+                st.subheader(header)
+            render_question(q)
+        
+        # Saved in the callback, which runs before the script, so this one
+        # run already shows the outcome
+        st.form_submit_button("Submit Survey", on_click=submit_survey_form, args=(survey, tenant))
+
+def submit_survey_form(survey, tenant=None):
+    """Form submit callback: save the answers held in the widgets' state"""
+    responses = {column: st.session_state[column] for column in survey.columns}
+    
+    if not save_checkin(responses, st.session_state.checkin_department,
+                        st.session_state.checkin_location, tenant, survey_version=survey.version):
+        st.session_state.survey_error = BUSY_MESSAGE
+        return
+    
+    st.session_state.survey_submitted = True
+    
+    # Start the chatbot on the survey responses and show it
+    get_session_store().start_chat(st.session_state.session_id, responses)
+    st.session_state.show_chatbot = True
+    
+    # The next survey starts from the default answers
+    for key in responses:
+        del st.session_state[key]
+
+def reset_survey_form():
+    st.session_state.survey_submitted = False
+
+def render_question(q):
+    """Show one survey question and return its current answer"""
+    st.write(q.text)
+    
+    if q.type == "scale":
+        return st.slider("Rating", 1, 5, 3, 
+                         help="1 = Strongly Disagree, 5 = Strongly Agree",
+                         key=q.column)
+    
+    elif q.type == "text":
+        return st.text_area("Response", key=q.column)
+    
+    elif q.type == "radio":
+        return st.radio("Options", q.options, key=q.column)
+
+def save_checkin(responses, department, location, tenant=None, survey_version=CURRENT_SURVEY_VERSION):
+    """Save a completed check-in; returns False if the database stayed too busy"""
+    new_response = {
+        "response_id": str(uuid.uuid4()),
+        "timestamp": datetime.datetime.now(),
+        "department": department,
+        "location": location,
+        "survey_version": survey_version
+    }
+    
+    # Add all question responses
+    for key, value in responses.items():
+        new_response[key] = value
+    
+    # Feeds the distinct check-in sessions estimate only (see database.RESPONDENT_COLUMN)
+    new_response["respondent"] = st.session_state.respondent_token
+    
+    # Save to database
+    try:
+        save_response(new_response, tenant=tenant)
+    except DatabaseBusyError:
+        SUBMISSIONS.inc(status="busy")
+        return False
+    except Exception:
+        SUBMISSIONS.inc(status="error")
+        raise
+    SUBMISSIONS.inc(status="success")
+    
+    # The write bumped the data version, so every cache keyed on it misses
+    # on the next read; nothing to clear here
+    return True
+
+@traced("page")
+def render_hr_dashboard(tenant=None):
+    from data_analysis import (calculate_wellbeing_index, 
+                               calculate_psychological_safety, 
+                               analyze_sentiment, 
+                               detect_trends,
+                               calculate_workload_scores,
+                               cohort_matrix,
+                               COHORT_WEEKS)
+    from visualization import (render_wellbeing_chart, 
+                               render_safety_chart, 
+                               render_sentiment_chart,
+                               render_theme_chart,
+                               render_search_results,
+                               render_workload_heatmap,
+                               render_department_location_heatmap,
+                               render_cohort_matrix,
+                               render_distribution_chart,
+                               render_trend_alerts,
+                               render_forecast,
+                               METRIC_TITLES)
+    
     st.title("HR Wellbeing Dashboard")
     
-    # Load data
-    responses_df = load_responses()
+    # Load data. The version is read once so that everything on the page
+    # describes the same data.
+    data_version = get_data_version(tenant)
+    responses_df = load_responses(tenant, data_version)
     
     if len(responses_df) == 0:
         st.warning("No survey responses available yet. Dashboard will populate once employees complete check-ins.")
@@ -329,38 +620,48 @@ def render_hr_dashboard():
             start_date = min_date
             end_date = datetime.datetime.combine(max_date, datetime.time(23, 59, 59))
     
+    # Fingerprint of everything the charts depend on: unchanged filters and
+    # data mean reruns reuse the responses, results and chart specs from an
+    # earlier run
+    chart_key = (
+        tenant,
+        datetime.datetime.combine(start_date, datetime.time.min),
+        datetime.datetime.combine(end_date, datetime.time.max),
+        None if selected_dept == "All" else selected_dept,
+        None if selected_loc == "All" else selected_loc,
+        data_version
+    )
+    
     # Filter data using database query for better performance
-    if selected_dept == "All" and selected_loc == "All":
-        # Just filter by date
-        filtered_df = get_filtered_responses(
-            start_date=datetime.datetime.combine(start_date, datetime.time.min),
-            end_date=datetime.datetime.combine(end_date, datetime.time.max)
-        )
-    else:
-        # Filter by all criteria
-        filtered_df = get_filtered_responses(
-            start_date=datetime.datetime.combine(start_date, datetime.time.min),
-            end_date=datetime.datetime.combine(end_date, datetime.time.max),
-            department=None if selected_dept == "All" else selected_dept,
-            location=None if selected_loc == "All" else selected_loc
-        )
+    filtered_df = load_filtered_responses(*chart_key)
     
     if len(filtered_df) == 0:
         st.warning("No data available for the selected filters.")
         return
     
-    # Calculate metrics
-    wellbeing_index = calculate_wellbeing_index(filtered_df)
-    psychological_safety = calculate_psychological_safety(filtered_df)
-    sentiment_scores = analyze_sentiment(filtered_df)
-    workload_scores = calculate_workload_scores(filtered_df)
-    trends = detect_trends(responses_df, filtered_df)
+    if not is_selection_reportable(*chart_key):
+        st.warning(f"To keep responses anonymous, results are only shown for groups of at least "
+                   f"{MIN_GROUP_SIZE} responses. Widen the filters to see this data.")
+        return
+    
+    # Sentiment and trends are only computed when their tab is opened, then
+    # kept for the session until the filters or data change
+    panel_cache = st.session_state.get("panel_cache")
+    if panel_cache is None or panel_cache.get("key") != chart_key:
+        st.session_state.panel_cache = panel_cache = {"key": chart_key}
+    
+    # Calculate metrics (shared with the other workers)
+    wellbeing_index, psychological_safety = shared_result(
+        "key_metrics", chart_key,
+        lambda: (calculate_wellbeing_index(filtered_df), calculate_psychological_safety(filtered_df))
+    )
     
     # Display metrics
     st.header("Key Metrics")
     
-    # Top metrics
-    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    # Top metrics. The sentiment score is shown in the Sentiment Analysis
+    # section, which is the only one that analyzes the comments.
+    metric_col1, metric_col2 = st.columns(2)
     
     with metric_col1:
         st.metric("Wellbeing Index", f"{wellbeing_index:.1f}/5.0")
@@ -368,54 +669,194 @@ def render_hr_dashboard():
     with metric_col2:
         st.metric("Psychological Safety", f"{psychological_safety:.1f}/5.0")
     
-    with metric_col3:
-        st.metric("Sentiment Score", f"{sentiment_scores['overall']:.1f}/5.0")
-    
     # Visualizations
     st.header("Detailed Analysis")
+    st.caption(f"Groups with fewer than {MIN_GROUP_SIZE} responses are hidden to keep responses anonymous.")
     
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
-        "Wellbeing Index", 
-        "Psychological Safety",
-        "Workload Heatmap",
-        "Sentiment Analysis",
-        "Trend Alerts"
-    ])
+    # Unlike st.tabs, which runs every tab body on each rerun, only the
+    # selected section is computed and drawn
+    selected_tab = st.radio(
+        "Dashboard section",
+        DASHBOARD_TABS,
+        horizontal=True,
+        key="dashboard_tab",
+        label_visibility="collapsed"
+    )
     
-    with tab1:
-        render_wellbeing_chart(filtered_df)
+    if selected_tab == "Wellbeing Index":
+        render_wellbeing_chart(filtered_df, load_trend_series(*chart_key), key=chart_key)
         
-    with tab2:
-        render_safety_chart(filtered_df)
+    elif selected_tab == "Psychological Safety":
+        render_safety_chart(filtered_df, load_trend_series(*chart_key), key=chart_key)
         
-    with tab3:
-        render_workload_heatmap(filtered_df, workload_scores)
+    elif selected_tab == "Workload Heatmap":
+        workload_scores = calculate_workload_scores(filtered_df, min_group_size=MIN_GROUP_SIZE)
+        render_workload_heatmap(filtered_df, workload_scores, load_trend_series(*chart_key), key=chart_key)
         
-    with tab4:
-        render_sentiment_chart(filtered_df, sentiment_scores)
+    elif selected_tab == "Department × Location":
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            cube_metric = st.selectbox("Metric", list(METRIC_TITLES), format_func=METRIC_TITLES.get, key="cube_metric")
+        
+        with col2:
+            drill_department = st.selectbox("Drill into department", ["None"] + departments[1:], key="cube_department")
+        
+        # Answered from the pre-aggregated cube: cost grows with the number
+        # of department/location/week cells, not with the number of responses
+        cube_filters = dict(
+            start_date=chart_key[1],
+            end_date=chart_key[2],
+            questions=get_metric_columns(cube_metric),
+            tenant=tenant
+        )
+        cells = get_cube(["department", "location"], **cube_filters)
+        drill_cells = None
+        if drill_department != "None":
+            drill_cells = get_cube(["location", "week"], department=drill_department, **cube_filters)
         
-    with tab5:
-        render_trend_alerts(trends)
+        render_department_location_heatmap(cells, cube_metric, drill_cells, drill_department,
+                                           key=chart_key + (cube_metric, drill_department))
+        
+    elif selected_tab == "Week over Week":
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            cohort_metric = st.selectbox("Metric", list(METRIC_TITLES), format_func=METRIC_TITLES.get, key="cohort_metric")
+        
+        with col2:
+            cohort_weeks = st.slider("Weeks", min_value=4, max_value=52, value=COHORT_WEEKS, key="cohort_weeks")
+        
+        with col3:
+            cohort_value = st.radio("Show", ["change", "score"], format_func=str.title, horizontal=True,
+                                    key="cohort_value")
+        
+        # Every department and week from one roll-up of the cube, starting
+        # a week early so the first week shown has a change
+        cohort_cells = get_cube(
+            ["department", "week"],
+            start_date=chart_key[2] - datetime.timedelta(weeks=cohort_weeks),
+            end_date=chart_key[2],
+            department=chart_key[3],
+            location=chart_key[4],
+            questions=get_metric_columns(cohort_metric),
+            tenant=tenant
+        )
+        cohorts = cohort_matrix(cohort_cells, cohort_metric, chart_key[2], cohort_weeks, MIN_GROUP_SIZE)
+        render_cohort_matrix(cohorts, cohort_metric, cohort_value,
+                             key=chart_key + (cohort_metric, cohort_weeks, cohort_value))
+        
+    elif selected_tab == "Distribution":
+        distribution_metric = st.selectbox("Metric", list(METRIC_TITLES), format_func=METRIC_TITLES.get,
+                                           key="distribution_metric")
+        
+        # Merged from per-day sketches, so no responses are read or sorted
+        sketch_filters = dict(
+            start_date=chart_key[1],
+            end_date=chart_key[2],
+            department=chart_key[3],
+            location=chart_key[4],
+            tenant=tenant,
+            min_group_size=MIN_GROUP_SIZE
+        )
+        render_distribution_chart(
+            get_sketch_summary(**sketch_filters),
+            get_sketch_summary(by="department", **sketch_filters),
+            distribution_metric,
+            key=chart_key + (distribution_metric,)
+        )
+        
+    elif selected_tab == "Sentiment Analysis":
+        if "sentiment" not in panel_cache:
+            # Common words and topics are summed from the per-day counts
+            panel_cache["sentiment"] = shared_result(
+                "sentiment", chart_key,
+                lambda: analyze_sentiment(filtered_df, get_text_summary(*chart_key[1:5], tenant=tenant))
+            )
+        render_sentiment_chart(filtered_df, panel_cache["sentiment"], key=chart_key)
+        
+        # Counted from the stored theme of each comment, so no text is read
+        themes, pending = get_theme_summary(*chart_key[1:5], tenant=tenant, min_group_size=MIN_GROUP_SIZE)
+        # Themes change as comments are clustered in the background, which
+        # doesn't change the data version, so the chart is keyed on them too
+        render_theme_chart(themes, pending, key=chart_key + tuple(themes["label"]) + tuple(themes["comments"]))
+        
+    elif selected_tab == "Comment Search":
+        st.subheader("Search Comments")
+        search_text = st.text_input("Search comments", placeholder="e.g. deadline, manager",
+                                    key="comment_search", label_visibility="collapsed")
+        
+        # A new search or new filters start again from the first page
+        if st.session_state.get("comment_search_last") != (search_text, chart_key):
+            st.session_state.comment_search_last = (search_text, chart_key)
+            st.session_state.comment_search_page = 1
+        
+        if search_text.strip():
+            page = st.session_state.get("comment_search_page", 1)
+            
+            # Answered from the full-text index, within the dashboard filters
+            results, total = load_search_page(*chart_key, search_text, page)
+            render_search_results(results, total, (page - 1) * SEARCH_PAGE_SIZE)
+            
+            pages = max(1, -(-total // SEARCH_PAGE_SIZE))
+            if pages > 1:
+                st.number_input("Page", min_value=1, max_value=pages, step=1, key="comment_search_page")
+        
+    elif selected_tab == "Trend Alerts":
+        if "trends" not in panel_cache:
+            panel_cache["trends"] = shared_result("trends", chart_key, lambda: detect_trends(responses_df, filtered_df, MIN_GROUP_SIZE))
+        render_trend_alerts(panel_cache["trends"])
+        
+    elif selected_tab == "Forecast":
+        forecast_metric = st.selectbox("Metric", list(METRIC_TITLES), format_func=METRIC_TITLES.get,
+                                       key="forecast_metric")
+        
+        # Forecasts are per department over whole weeks, so they follow the
+        # department filter but not the dates or location. History runs up
+        # to the last week the forecasts have seen.
+        last_week = get_forecast_week(forecast_metric, tenant)
+        forecasts = load_forecasts(tenant, forecast_metric, last_week)
+        if last_week is None:
+            last_week = closed_week()
+        if chart_key[3]:
+            forecasts = forecasts[forecasts["department"] == chart_key[3]]
+        flags = risk_flags(forecasts, forecast_metric)
+        
+        # Recent weeks for context, from the cube like the week-over-week view
+        history_cells = get_cube(
+            ["department", "week"],
+            start_date=last_week - datetime.timedelta(weeks=COHORT_WEEKS),
+            end_date=last_week,
+            department=chart_key[3],
+            questions=get_metric_columns(forecast_metric),
+            tenant=tenant
+        )
+        history = cohort_matrix(history_cells, forecast_metric, last_week, COHORT_WEEKS, MIN_GROUP_SIZE)
+        render_forecast(history, forecasts, flags, forecast_metric, chart_key[3],
+                        key=(tenant, chart_key[3], forecast_metric, last_week, data_version))
+        
+    elif selected_tab == "Response Breakdown":
+        # Show by department and location
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader("Responses by Department")
+            dept_counts = filtered_df["department"].value_counts().reset_index()
+            dept_counts.columns = ["Department", "Count"]
+            dept_counts = protect(dept_counts, ["Department"], count_column="Count")
+            st.bar_chart(dept_counts.set_index("Department"))
+        
+        with col2:
+            st.subheader("Responses by Location")
+            loc_counts = filtered_df["location"].value_counts().reset_index()
+            loc_counts.columns = ["Location", "Count"]
+            loc_counts = protect(loc_counts, ["Location"], count_column="Count")
+            st.bar_chart(loc_counts.set_index("Location"))
     
     # Response summary
     st.header("Response Summary")
     st.write(f"Total Responses: {len(filtered_df)}")
     
-    # Show by department and location
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        st.subheader("Responses by Department")
-        dept_counts = filtered_df["department"].value_counts().reset_index()
-        dept_counts.columns = ["Department", "Count"]
-        st.bar_chart(dept_counts.set_index("Department"))
-    
-    with col2:
-        st.subheader("Responses by Location")
-        loc_counts = filtered_df["location"].value_counts().reset_index()
-        loc_counts.columns = ["Location", "Count"]
-        st.bar_chart(loc_counts.set_index("Location"))
-    
     # Show data visualization imagery
     st.image("https://pixabay.com/get/gb369b38f76e80fa3e95a65e4234affee5345ae73597efc76d0fba8fabb58e1c949584e77b86a5460ccdd5fc1f6bea46cb16b9630d5eaf4d48c3b5847a45ebbdc_1280.jpg", 
              caption="Data visualization", use_container_width=True)
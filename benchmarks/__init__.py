@@ -0,0 +1,10 @@
+"""
+Benchmarks for the wellbeing platform.
+
+Run a benchmark from the repository root, e.g.::
+
+    python -m benchmarks.bench_tenants
+
+Results are printed and written as JSON to ``benchmarks/results`` so they can
+be compared across commits.
+"""
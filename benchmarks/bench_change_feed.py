@@ -0,0 +1,61 @@
+"""
+Data version (change feed) benchmark.
+
+Measures what the caches pay to check the data version on every rerun, and
+what the triggers that bump it add to bulk inserts, by loading the same
+responses into a shard with and without them. Also checks the version
+moves with every write and only then.
+
+    python -m benchmarks.bench_change_feed --rows 200000
+"""
+import argparse
+import time
+
+import database
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import generate_responses
+
+def insert_rate(df, triggers):
+    """Rows per second bulk inserting df into a fresh shard"""
+    with isolated_database():
+        database.get_pool()
+        if not triggers:
+            with database.get_pool().connection() as conn, conn:
+                for event in ("insert", "update", "delete"):
+                    conn.execute(f"DROP TRIGGER responses_{event}_version")
+
+        start = time.perf_counter()
+        seed_responses(df)
+        return round(len(df) / (time.perf_counter() - start), 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    df = generate_responses(args.rows, seed=0)
+
+    with isolated_database():
+        seed_responses(df)
+        version = database.get_data_version()
+        if version != args.rows:
+            raise SystemExit(f"Data version {version} after inserting {args.rows} responses")
+
+        database.get_responses()
+        if database.get_data_version() != version:
+            raise SystemExit("Reading responses changed the data version")
+
+        results = {
+            "rows": args.rows,
+            "get_data_version": time_call(database.get_data_version, repeat=200)
+        }
+
+    results["insert_rows_per_sec"] = {
+        "without_triggers": insert_rate(df, triggers=False),
+        "with_triggers": insert_rate(df, triggers=True)
+    }
+
+    write_results("change-feed", results)
+
+if __name__ == "__main__":
+    main()
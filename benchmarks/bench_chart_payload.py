@@ -0,0 +1,87 @@
+"""
+Trend chart payload benchmark.
+
+Builds the department wellbeing trend over a multi-year synthetic dataset
+two ways: from raw daily points per department (the old chart data) and
+from SQL-binned, LTTB-downsampled points (what the dashboard now sends),
+and compares the Vega-Lite spec size and the time to build it.
+
+    python -m benchmarks.bench_chart_payload --rows 300000 --days 1095
+"""
+import argparse
+import time
+
+import altair as alt
+import pandas as pd
+
+import database
+import data_analysis
+from survey_questions import get_metric_columns
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import generate_responses
+
+def department_chart(points):
+    return alt.Chart(points).mark_line().encode(
+        x="date:T",
+        y="wellbeing_score:Q",
+        color="department:N"
+    )
+
+def raw_points(df):
+    """Daily mean per department, as the charts computed it before binning"""
+    df = df.copy()
+    df["wellbeing_score"] = df[get_metric_columns("wellbeing")].mean(axis=1)
+    df["date"] = df["timestamp"].dt.date
+    points = df.groupby(["department", "date"])["wellbeing_score"].mean().reset_index()
+    points["date"] = pd.to_datetime(points["date"])
+    return points
+
+def binned_points(start, end):
+    freq = data_analysis.choose_time_bin(start, end)
+    binned = database.get_binned_scores(["wellbeing"], freq, start_date=start, end_date=end, by="department")
+    points = data_analysis.downsample_series(binned[["period", "department", "wellbeing_score"]],
+                                             "period", "wellbeing_score", by="department")
+    return points.rename(columns={"period": "date"})
+
+def measure(build):
+    """Spec size and build + serialize time for a chart data builder"""
+    points = build()
+    spec = department_chart(points).to_json()
+    timing = time_call(lambda: department_chart(build()).to_json(), repeat=3)
+    return {"points": len(points), "spec_bytes": len(spec), "build": timing}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--days", type=int, default=1095)
+    args = parser.parse_args()
+
+    alt.data_transformers.disable_max_rows()
+
+    end = pd.Timestamp.now().floor("D")
+    start = end - pd.Timedelta(days=args.days)
+
+    with isolated_database():
+        seed_responses(generate_responses(args.rows, seed=0, start=start, end=end))
+        # sqlite3 binds datetimes, not pandas Timestamps
+        start, end = start.to_pydatetime(), (end + pd.Timedelta(days=1)).to_pydatetime()
+
+        started = time.perf_counter()
+        df = database.get_filtered_responses(start_date=start, end_date=end)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        raw = measure(lambda: raw_points(df))
+        binned = measure(lambda: binned_points(start, end))
+
+    results = {
+        "rows": args.rows,
+        "days": args.days,
+        "raw_load_ms": round(load_ms, 3),
+        "raw": raw,
+        "binned": binned,
+        "spec_size_ratio": round(raw["spec_bytes"] / binned["spec_bytes"], 1)
+    }
+    write_results("chart-payload", results)
+
+if __name__ == "__main__":
+    main()
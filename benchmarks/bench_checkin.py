@@ -0,0 +1,141 @@
+"""
+Employee check-in round trip benchmark.
+
+Drives complete check-ins through Streamlit's AppTest in both survey modes:
+"steps" (one question per script run) and "form" (the whole questionnaire
+submitted once). Reports the server script executions each completed
+check-in costs and the measured duration of every round trip.
+
+AppTest sessions can't run concurrently in one process, so the latency of
+many employees checking in at the same moment is replayed from those
+measurements: one server process runs scripts one at a time (sessions
+share the GIL), each employee sends their next round trip as soon as the
+previous one returns, and the server serves round trips first come first
+served.
+
+The chatbot's opening message is replaced with a canned one: it is an
+OpenAI request, network wait that doesn't occupy the server, and is the
+same in both modes.
+
+    python -m benchmarks.bench_checkin --employees 1000 --samples 20
+"""
+import os
+import heapq
+import argparse
+import logging
+import time
+from streamlit.testing.v1 import AppTest
+
+import database
+import metrics
+import ai_assistant
+from benchmarks.common import isolated_database, percentile, seed_responses, write_results
+from demo_data import generate_responses
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def script_runs():
+    return sum(metrics.SCRIPT_RUNS._values.values())
+
+def timed(round_trips, run):
+    """Run one round trip (a page load or click), recording its duration"""
+    start = time.perf_counter()
+    at = run()
+    round_trips.append((time.perf_counter() - start) * 1000)
+    if at.exception:
+        raise SystemExit(f"Check-in raised: {at.exception[0].value}")
+    return at
+
+def complete_steps(at):
+    """Start the survey, answer every question and submit, one click per question"""
+    round_trips = []
+    timed(round_trips, at.run)
+    while not at.success:
+        if at.slider:
+            at.slider[0].set_value(4)
+        timed(round_trips, at.button[0].click().run)
+    return round_trips
+
+def complete_form(at):
+    """Fill in the whole form and submit it once"""
+    round_trips = []
+    timed(round_trips, at.run)
+    for slider in at.slider:
+        slider.set_value(4)
+    timed(round_trips, at.button[0].click().run)
+    if not at.success:
+        raise SystemExit("Form submission did not complete the check-in")
+    return round_trips
+
+FLOWS = {"steps": complete_steps, "form": complete_form}
+
+def replay(check_ins, employees, think_ms=0.0):
+    """
+    Completion latency (ms) of employees who all start at once, each
+    repeating a measured check-in's round trips, on a server running one
+    round trip at a time in arrival order.
+    """
+    # (time the round trip is sent, employee, index of the round trip)
+    pending = [(0.0, e, 0) for e in range(employees)]
+    heapq.heapify(pending)
+    server_free = 0.0
+    completed = []
+
+    while pending:
+        sent, employee, step = heapq.heappop(pending)
+        round_trips = check_ins[employee % len(check_ins)]
+        finished = max(sent, server_free) + round_trips[step]
+        server_free = finished
+
+        if step + 1 < len(round_trips):
+            heapq.heappush(pending, (finished + think_ms, employee, step + 1))
+        else:
+            completed.append(finished)
+
+    return completed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=20, help="Check-ins measured per mode")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Time an employee spends per page")
+    parser.add_argument("--rows", type=int, default=10000, help="Responses already in the database")
+    args = parser.parse_args()
+
+    # Bare-mode and deprecation warnings would drown the output
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    ai_assistant.get_initial_message = lambda survey_responses=None: "Thanks for checking in!"
+
+    results = {"employees": args.employees, "samples": args.samples, "think_ms": args.think_ms}
+    with isolated_database():
+        seed_responses(generate_responses(args.rows, seed=0))
+        # Cluster the seeded comments now, not in the background during the run
+        database.update_themes()
+
+        for mode, flow in FLOWS.items():
+            # app.py reads the mode on every script run
+            os.environ["HURDL_SURVEY_MODE"] = mode
+
+            # The first session pays one-off imports and cache fills
+            flow(AppTest.from_file(APP_PATH, default_timeout=600))
+
+            before = script_runs()
+            check_ins = [flow(AppTest.from_file(APP_PATH, default_timeout=600)) for _ in range(args.samples)]
+            runs = (script_runs() - before) / args.samples
+
+            server_ms = [sum(round_trips) for round_trips in check_ins]
+            completed = replay(check_ins, args.employees, args.think_ms)
+            results[mode] = {
+                "round_trips_per_checkin": len(check_ins[0]),
+                "script_runs_per_checkin": runs,
+                "server_ms_per_checkin": round(percentile(server_ms, 50), 3),
+                "p50_completion_ms": round(percentile(completed, 50), 3),
+                "p95_completion_ms": round(percentile(completed, 95), 3),
+                "checkins_per_sec": round(args.employees / (max(completed) / 1000), 1)
+            }
+
+    write_results("checkin", results)
+
+if __name__ == "__main__":
+    main()
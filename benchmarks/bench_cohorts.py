@@ -0,0 +1,121 @@
+"""
+Week-over-week cohort matrix benchmark.
+
+Seeds a year of responses from --departments departments and builds the
+weeks x departments matrix of a metric, with week-over-week changes,
+three ways: from the response cube rolled up to department and week
+(get_cube + data_analysis.cohort_matrix, what the dashboard does), with
+one pandas groupby over the loaded responses, and with a separate filter
+of the responses per department and week. Checks the three agree, and
+reports the size and build time of the heatmap spec.
+
+    python -m benchmarks.bench_cohorts --rows 500000 --departments 200 --weeks 52
+"""
+import json
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+
+import database
+import data_analysis
+from privacy import MIN_GROUP_SIZE
+from survey_questions import get_metric_columns
+from visualization import build_cohort_specs
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import iter_responses
+
+METRIC = "wellbeing"
+
+def from_cube(end_date, weeks):
+    cells = database.get_cube(["department", "week"], start_date=end_date - datetime.timedelta(weeks=weeks),
+                              end_date=end_date, questions=get_metric_columns(METRIC))
+    return data_analysis.cohort_matrix(cells, METRIC, end_date, weeks)
+
+def week_starts(df):
+    """Monday of each response's week"""
+    days = df["timestamp"].dt.normalize()
+    return days - pd.to_timedelta(days.dt.dayofweek, unit="D")
+
+def from_groupby(df, end_date, weeks):
+    """Mean of every answer per department and week, in one groupby"""
+    columns = get_metric_columns(METRIC)
+    answers = df[columns]
+    grouped = pd.DataFrame({
+        "department": df["department"],
+        "week": week_starts(df),
+        "total": answers.sum(axis=1),
+        "n": answers.notna().sum(axis=1)
+    }).groupby(["department", "week"])[["total", "n"]].sum()
+
+    matrix = (grouped["total"] / grouped["n"]).unstack("week")
+    return matrix, matrix.diff(axis=1)
+
+def from_filters(df, end_date, weeks, departments):
+    """The same means with one filter of the responses per department and week"""
+    columns = get_metric_columns(METRIC)
+    starts = week_starts(df)
+    last_week = pd.Timestamp(end_date).normalize() - pd.Timedelta(days=pd.Timestamp(end_date).dayofweek)
+    all_weeks = pd.date_range(last_week - pd.Timedelta(weeks=weeks), last_week, freq="7D")
+
+    scores = {}
+    for department in departments:
+        for week in all_weeks:
+            cell = df[(df["department"] == department) & (starts == week)][columns]
+            scores[(department, week)] = cell.stack().mean()
+    return scores
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--departments", type=int, default=200)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter-departments", type=int, default=10,
+                        help="Departments for the filter per cell version, which is too slow for all of them")
+    args = parser.parse_args()
+
+    departments = [f"Department {i:03d}" for i in range(args.departments)]
+    results = {"rows": args.rows, "departments": args.departments, "weeks": args.weeks}
+
+    with isolated_database():
+        for chunk in iter_responses(args.rows, chunk_size=250000, seed=0, departments=departments):
+            seed_responses(chunk)
+
+        df = database.get_responses()
+        end_date = datetime.datetime.combine(df["timestamp"].max().date(), datetime.time.max)
+        start_date = end_date - datetime.timedelta(weeks=args.weeks + 1)
+        df = df[df["timestamp"] >= start_date]
+
+        cohorts = from_cube(end_date, args.weeks)
+        matrix, change = from_groupby(df, end_date, args.weeks)
+        changed = cohorts.dropna(subset=["change"])
+        sample = changed.sample(min(500, len(changed)), random_state=0)
+        for row in sample.itertuples():
+            if not np.isclose(row.wellbeing_score, matrix.loc[row.department, row.week]) or \
+                    not np.isclose(row.change, change.loc[row.department, row.week]):
+                raise SystemExit(f"Cube and groupby differ for {row.department}, week of {row.week:%Y-%m-%d}")
+
+        specs = build_cohort_specs(cohorts, METRIC)
+        results.update({
+            "cells": len(cohorts),
+            "cube": time_call(from_cube, end_date, args.weeks, repeat=args.repeat),
+            "cohort_matrix_only": time_call(data_analysis.cohort_matrix, database.get_cube(
+                ["department", "week"], start_date=end_date - datetime.timedelta(weeks=args.weeks),
+                end_date=end_date, questions=get_metric_columns(METRIC)
+            ), METRIC, end_date, args.weeks, MIN_GROUP_SIZE, repeat=args.repeat),
+            "groupby_loaded_responses": time_call(from_groupby, df, end_date, args.weeks, repeat=args.repeat),
+            "filter_per_cell": time_call(from_filters, df, end_date, args.weeks,
+                                         departments[:args.filter_departments], repeat=1),
+            "heatmap_spec": time_call(build_cohort_specs, cohorts, METRIC, repeat=args.repeat),
+            "heatmap_spec_kb": round(len(json.dumps(specs["heatmap"])) / 1024, 1)
+        })
+
+    # Filtering costs the same for every department
+    results["filter_per_cell_all_departments_est_ms"] = round(
+        results["filter_per_cell"]["median_ms"] * args.departments / args.filter_departments
+    )
+    write_results("cohorts", results)
+
+if __name__ == "__main__":
+    main()
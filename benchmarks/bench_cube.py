@@ -0,0 +1,92 @@
+"""
+Response cube benchmark.
+
+Compares answering department x location and drill-down queries from the
+pre-aggregated (department, location, week) cube against reading and
+aggregating the raw responses, checks both give the same means, and
+measures what keeping the cube up to date adds to a single submission.
+
+    python -m benchmarks.bench_cube --rows 500000
+"""
+import argparse
+import datetime
+import uuid
+import numpy as np
+import pandas as pd
+
+import database
+import data_analysis
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import generate_responses
+
+def raw_scores(metric, dimensions, department=None):
+    """Metric scores per group from raw responses (the pre-cube path)"""
+    df = database.get_filtered_responses(department=department)
+    if "week" in dimensions:
+        df["week"] = df["timestamp"].dt.to_period("W-SUN").dt.start_time
+    questions = data_analysis.get_metric_columns(metric)
+    answers = df.melt(id_vars=dimensions, value_vars=questions).dropna(subset=["value"])
+    return answers.groupby(dimensions)["value"].mean().reset_index()
+
+def cube_scores(metric, dimensions, department=None):
+    cube = database.get_cube(dimensions, department=department,
+                             questions=data_analysis.get_metric_columns(metric))
+    return data_analysis.cube_scores(cube, metric, dimensions)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    args = parser.parse_args()
+
+    with isolated_database():
+        seed_responses(generate_responses(args.rows, seed=0))
+
+        with database.get_pool().connection() as conn:
+            cells = conn.execute("SELECT COUNT(*) FROM response_cube").fetchone()[0]
+
+        # The cube must agree with aggregating the raw responses
+        dimensions = ["department", "location"]
+        expected = raw_scores("wellbeing", dimensions)
+        actual = cube_scores("wellbeing", dimensions)
+        if not np.allclose(expected["value"], actual["wellbeing_score"]):
+            raise SystemExit("Cube scores differ from raw aggregation")
+
+        results = {
+            "rows": args.rows,
+            "cube_cells": cells,
+            "department_x_location": {
+                "raw": time_call(raw_scores, "wellbeing", dimensions, repeat=3),
+                "cube": time_call(cube_scores, "wellbeing", dimensions, repeat=10)
+            },
+            "drill_down_location_x_week": {
+                "raw": time_call(raw_scores, "wellbeing", ["location", "week"], department="Engineering", repeat=3),
+                "cube": time_call(cube_scores, "wellbeing", ["location", "week"], department="Engineering", repeat=10)
+            },
+            "roll_up_all": {
+                "cube": time_call(cube_scores, "wellbeing", [], repeat=10)
+            },
+            "rebuild_cube": time_call(database.rebuild_cube, repeat=1)
+        }
+
+        # Cost of the cube upsert on the submit path, rolled back each time
+        one = generate_responses(1, seed=1)
+        one["timestamp"] = pd.Timestamp.now()
+
+        def update_cube():
+            with database.get_pool().connection() as conn:
+                database._update_cube(conn, one)
+                conn.rollback()
+
+        def submit():
+            response = one.iloc[0].to_dict()
+            response["response_id"] = str(uuid.uuid4())
+            response["timestamp"] = datetime.datetime.now()
+            database.save_response(response)
+
+        results["update_cube_one_response"] = time_call(update_cube, repeat=50)
+        results["save_response"] = time_call(submit, repeat=50)
+
+    write_results("cube", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Department forecast benchmark.
+
+Simulates --series weekly score series (drifting levels with noise and
+missing weeks) and times fitting the damped Holt models of forecasting:
+all series at once as numpy arrays, against one series at a time (timed
+on --loop-series series and extrapolated), and adding one closed week to
+a stored model against refitting every week. Reports forecast accuracy
+over the last --horizon weeks against carrying the last score forward,
+and the stored model size. Then seeds responses from --departments
+departments and times update_forecasts for the first fit and for one
+newly closed week, and get_forecasts.
+
+    python -m benchmarks.bench_forecast --series 1000 --weeks 104 --rows 500000
+"""
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+import database
+from forecasting import FORECAST_WEEKS, HoltModel, risk_flags
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import iter_responses
+
+METRIC = "wellbeing"
+
+def simulate_series(n_series, n_weeks, seed=0, missing=0.1):
+    """Weekly scores whose level drifts with a slowly changing trend"""
+    rng = np.random.default_rng(seed)
+    trend = np.cumsum(rng.normal(0, 0.01, (n_series, n_weeks)), axis=1)
+    level = rng.uniform(2.5, 4.0, (n_series, 1)) + np.cumsum(trend, axis=1) * 0.5
+    scores = np.clip(level + rng.normal(0, 0.15, (n_series, n_weeks)), 1, 5)
+    scores[rng.random((n_series, n_weeks)) < missing] = np.nan
+    return scores
+
+def fit_one_by_one(keys, matrix):
+    """A model per series, as fitting each department on its own would"""
+    return [HoltModel().fit([key], row[None, :]) for key, row in zip(keys, matrix)]
+
+def add_week(blob, keys, week):
+    """What update_forecasts does once a week closes: load, update, store"""
+    model = HoltModel.from_bytes(blob)
+    model.update(keys, week)
+    return model.to_bytes()
+
+def forecast_errors(matrix, horizon):
+    """Mean absolute errors of the model and the last score over the held-out weeks"""
+    keys = list(range(len(matrix)))
+    history, actual = matrix[:, :-horizon], matrix[:, -horizon:]
+    forecasts = HoltModel().fit(keys, history).forecast(horizon)
+    predicted = forecasts[forecasts["weeks_ahead"] > 0].pivot(
+        index="key", columns="weeks_ahead", values="forecast"
+    ).reindex(keys).to_numpy()
+
+    # The last score carried forward
+    last = pd.DataFrame(history).ffill(axis=1).iloc[:, -1].to_numpy()
+    naive = np.repeat(last[:, None], horizon, axis=1)
+
+    scored = ~np.isnan(actual) & ~np.isnan(predicted)
+    return {
+        "holt_mae": round(float(np.abs(predicted - actual)[scored].mean()), 4),
+        "last_value_mae": round(float(np.abs(naive - actual)[scored].mean()), 4),
+        "forecasts_scored": int(scored.sum())
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=1000)
+    parser.add_argument("--weeks", type=int, default=104)
+    parser.add_argument("--horizon", type=int, default=FORECAST_WEEKS)
+    parser.add_argument("--loop-series", type=int, default=50,
+                        help="Series for the one series at a time version, which is slow for all of them")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--departments", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    keys = [f"Department {i:04d}" for i in range(args.series)]
+    matrix = simulate_series(args.series, args.weeks)
+    results = {"series": args.series, "weeks": args.weeks, "horizon": args.horizon}
+
+    # Both fits must give the same forecasts
+    model = HoltModel().fit(keys, matrix)
+    together = model.forecast(args.horizon)
+    apart = pd.concat([m.forecast(args.horizon) for m in fit_one_by_one(keys[:args.loop_series],
+                                                                       matrix[:args.loop_series])])
+    if not np.allclose(together[together["key"].isin(keys[:args.loop_series])]["forecast"], apart["forecast"]):
+        raise SystemExit("Fitting the series together and one by one gives different forecasts")
+
+    previous = HoltModel().fit(keys, matrix[:, :-1]).to_bytes()
+    forecasts = together.rename(columns={"key": "department"})
+    results.update({
+        "fit_vectorized": time_call(lambda: HoltModel().fit(keys, matrix), repeat=args.repeat),
+        "fit_one_by_one": time_call(fit_one_by_one, keys[:args.loop_series], matrix[:args.loop_series],
+                                    repeat=1),
+        "add_week": time_call(add_week, previous, keys, matrix[:, -1], repeat=args.repeat),
+        "add_week_update_only": time_call(HoltModel.from_bytes(previous).update, keys, matrix[:, -1],
+                                          repeat=args.repeat),
+        "forecast": time_call(model.forecast, args.horizon, repeat=args.repeat),
+        "risk_flags": time_call(risk_flags, forecasts, METRIC, repeat=args.repeat),
+        "model_kb": round(len(model.to_bytes()) / 1024, 1),
+        "accuracy": forecast_errors(matrix, args.horizon)
+    })
+    # Every series costs the same to fit on its own
+    results["fit_one_by_one_all_series_est_ms"] = round(
+        results["fit_one_by_one"]["median_ms"] * args.series / args.loop_series
+    )
+
+    departments = [f"Department {i:03d}" for i in range(args.departments)]
+    with isolated_database():
+        for chunk in iter_responses(args.rows, chunk_size=250000, seed=0, departments=departments):
+            seed_responses(chunk)
+
+        # A week ago, every week but the one just closed had closed
+        now = pd.Timestamp.now()
+        for name, at in (("update_forecasts_first_fit", now - pd.Timedelta(weeks=1)),
+                         ("update_forecasts_new_week", now)):
+            start = time.perf_counter()
+            weeks = database.update_forecasts(now=at)
+            results[name] = {"ms": round((time.perf_counter() - start) * 1000, 3), "weeks": weeks}
+        results["update_forecasts_up_to_date"] = time_call(database.update_forecasts, now=now, repeat=args.repeat)
+        results["get_forecasts"] = time_call(database.get_forecasts, METRIC, repeat=args.repeat)
+
+    write_results("forecast", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Wide vs long storage layout benchmark.
+
+Seeds the same responses into a wide shard (one column per question) and a
+long shard (one row per answer) and times the write path, the full and
+filtered read paths, and adding a new question.
+
+    python -m benchmarks.bench_layouts --rows 100000
+"""
+import argparse
+import time
+import uuid
+import datetime
+
+import database
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import generate_responses
+
+def run_layout(layout, rows):
+    database.STORAGE_LAYOUT = layout
+
+    start = time.perf_counter()
+    seed_responses(generate_responses(rows, seed=0))
+    seed_seconds = time.perf_counter() - start
+
+    one = generate_responses(1, seed=1).iloc[0].to_dict()
+
+    def submit():
+        one["response_id"] = str(uuid.uuid4())
+        one["timestamp"] = datetime.datetime.now()
+        database.save_response(one)
+
+    since = datetime.datetime.now() - datetime.timedelta(days=7)
+    results = {
+        "seed_rows_per_sec": round(rows / seed_seconds, 1),
+        "save_response": time_call(submit, repeat=50),
+        "get_responses": time_call(database.get_responses, repeat=3),
+        "get_filtered_responses": time_call(
+            database.get_filtered_responses, start_date=since, department="Engineering", repeat=5
+        ),
+        "cross_tenant_summary": time_call(database.get_cross_tenant_summary, repeat=5)
+    }
+
+    # A new question is a metadata-only ALTER in the wide layout and needs
+    # no schema change at all in the long layout
+    with database.get_pool().connection() as conn:
+        start = time.perf_counter()
+        if layout == "wide":
+            conn.execute("ALTER TABLE responses ADD COLUMN q_bench INTEGER")
+            conn.commit()
+        results["add_question_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    original = database.STORAGE_LAYOUT
+    results = {"rows": args.rows}
+    try:
+        for layout in ["wide", "long"]:
+            with isolated_database():
+                results[layout] = run_layout(layout, args.rows)
+    finally:
+        database.STORAGE_LAYOUT = original
+
+    write_results("layouts", results)
+
+if __name__ == "__main__":
+    main()
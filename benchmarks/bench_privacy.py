@@ -0,0 +1,116 @@
+"""
+Small-group suppression benchmark.
+
+Builds department x location x day aggregates of Poisson-distributed
+response counts, from busy (most cells above k) to sparse (most cells
+below it), and times privacy.suppression_mask, which suppresses over all
+cells at once, against the same rules applied one total at a time in
+Python. Checks every result: no shown cell below k, and no total along any
+dimension left with a single suppressed cell that subtraction would give
+away. Also reports how much min_group_size adds to get_binned_scores.
+
+    python -m benchmarks.bench_privacy --departments 40 --locations 8 --days 365
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+import privacy
+from database import get_binned_scores
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import generate_responses
+
+def grid(departments, locations, days, rate, seed):
+    """Response counts for every (department, location, day) cell"""
+    rng = np.random.default_rng(seed)
+    keys = np.indices((departments, locations, days)).reshape(3, -1)
+    counts = rng.poisson(rate, keys.shape[1])
+    return counts, list(keys)
+
+def naive_mask(counts, keys, k):
+    """The same suppression, looping over cells and totals in Python"""
+    suppressed = [0 < c < k for c in counts]
+    totals = []
+    for axis in range(len(keys)):
+        groups = {}
+        for i in range(len(counts)):
+            groups.setdefault(tuple(key[i] for d, key in enumerate(keys) if d != axis), []).append(i)
+        totals.append(list(groups.values()))
+
+    changed = True
+    while changed:
+        changed = False
+        for cells_by_total in totals:
+            for cells in cells_by_total:
+                if sum(suppressed[i] for i in cells) != 1:
+                    continue
+                shown = [i for i in cells if not suppressed[i] and counts[i] > 0]
+                if shown:
+                    suppressed[min(shown, key=lambda i: counts[i])] = True
+                    changed = True
+    return np.array(suppressed)
+
+def check(counts, keys, mask, k):
+    """Problems left by a suppression mask (empty when it is safe)"""
+    problems = []
+    if ((counts > 0) & (counts < k) & ~mask).any():
+        problems.append("cells below k shown")
+
+    df = pd.DataFrame({f"d{i}": key for i, key in enumerate(keys)})
+    df["hidden"] = mask & (counts > 0)
+    for axis in range(len(keys)):
+        others = [f"d{i}" for i in range(len(keys)) if i != axis]
+        if (df.groupby(others)["hidden"].sum() == 1).any():
+            problems.append(f"lone suppressed cell along d{axis}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--departments", type=int, default=40)
+    parser.add_argument("--locations", type=int, default=8)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--rates", type=float, nargs="+", default=[20, 8, 3], help="Mean responses per cell")
+    parser.add_argument("--naive-days", type=int, default=30, help="Days in the grid for the Python version")
+    parser.add_argument("--rows", type=int, default=50000, help="Responses for the get_binned_scores timing")
+    parser.add_argument("--k", type=int, default=privacy.MIN_GROUP_SIZE)
+    args = parser.parse_args()
+
+    results = {"k": args.k, "grid": [args.departments, args.locations, args.days], "rates": {}}
+    for rate in args.rates:
+        counts, keys = grid(args.departments, args.locations, args.days, rate, seed=0)
+        mask = privacy.suppression_mask(counts, keys, args.k)
+
+        # The Python loops are too slow for the full grid
+        small_counts, small_keys = grid(args.departments, args.locations, args.naive_days, rate, seed=0)
+        small_mask = naive_mask(small_counts, small_keys, args.k)
+
+        results["rates"][str(rate)] = {
+            "cells": len(counts),
+            "below_k": int(((counts > 0) & (counts < args.k)).sum()),
+            "suppressed": int(mask.sum()),
+            "vectorized": time_call(privacy.suppression_mask, counts, keys, args.k),
+            "naive_cells": len(small_counts),
+            "naive_suppressed": int(small_mask.sum()),
+            "naive": time_call(naive_mask, small_counts, small_keys, args.k, repeat=1),
+            "vectorized_same_cells": time_call(privacy.suppression_mask, small_counts, small_keys, args.k),
+            "problems": check(counts, keys, mask, args.k) + check(small_counts, small_keys, small_mask, args.k)
+        }
+
+    with isolated_database():
+        seed_responses(generate_responses(args.rows, seed=0))
+        results["binned_scores"] = {
+            freq: {
+                "without_k": time_call(get_binned_scores, ["wellbeing"], freq, by="department"),
+                "with_k": time_call(get_binned_scores, ["wellbeing"], freq, by="department",
+                                    min_group_size=args.k)
+            }
+            for freq in ("day", "week")
+        }
+
+    write_results("privacy", results)
+
+    if any(rate["problems"] for rate in results["rates"].values()):
+        raise SystemExit("Suppression left identifiable cells")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Dashboard first paint and rerun latency benchmark.
+
+Renders the HR dashboard with Streamlit's AppTest (time to first paint),
+then reruns it with the filters and data unchanged. Reruns
+are timed with the chart spec cache warm and with it cleared before every
+rerun, which is what each rerun cost before specs were memoized. The
+profiler's per-stage totals show how much of each rerun is chart building.
+
+    python -m benchmarks.bench_rerun --rows 50000 --reruns 10
+"""
+import os
+import argparse
+import logging
+import time
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.common import isolated_database, seed_responses, write_results
+from demo_data import generate_responses
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def timed_reruns(at, reruns, before=None):
+    """Rerun the app and summarise wall time and time spent building charts"""
+    durations, chart_ms = [], []
+    for _ in range(reruns):
+        if before:
+            before()
+        start = time.perf_counter()
+        at.run()
+        durations.append((time.perf_counter() - start) * 1000)
+        if at.exception:
+            raise SystemExit(f"Dashboard raised: {at.exception[0].value}")
+        chart_ms.append(at.session_state["traces"][-1].totals_by_category().get("chart", 0.0))
+
+    return {
+        "median_ms": round(float(np.median(durations)), 3),
+        "min_ms": round(min(durations), 3),
+        "chart_median_ms": round(float(np.median(chart_ms)), 3),
+        "repeat": reruns
+    }
+
+def open_sections(at):
+    """Time opening each dashboard section for the first time, then again"""
+    timings = {}
+    for label in ["first", "again"]:
+        for tab in at.radio(key="dashboard_tab").options:
+            at.radio(key="dashboard_tab").set_value(tab)
+            start = time.perf_counter()
+            at.run()
+            timings[f"{tab} ({label})"] = round((time.perf_counter() - start) * 1000, 3)
+
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--reruns", type=int, default=10)
+    args = parser.parse_args()
+
+    # Bare-mode and deprecation warnings would drown the output
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    # The app renders with an API key present; the chatbot is not used here
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+    with isolated_database():
+        end = pd.Timestamp.now().floor("D")
+        seed_responses(generate_responses(args.rows, seed=0, start=end - pd.Timedelta(days=90), end=end))
+
+        at = AppTest.from_file(APP_PATH, default_timeout=300)
+        at.session_state["authenticated"] = True
+        at.session_state["admin_tenant"] = "default"
+        at.session_state["show_profiler"] = True
+
+        start = time.perf_counter()
+        at.run()
+        first_ms = (time.perf_counter() - start) * 1000
+        if at.exception:
+            raise SystemExit(f"Dashboard raised: {at.exception[0].value}")
+
+        import visualization
+        results = {
+            "rows": args.rows,
+            "first_render_ms": round(first_ms, 3),
+            "rerun_cached_specs": timed_reruns(at, args.reruns),
+            "rerun_rebuilt_specs": timed_reruns(at, args.reruns, before=visualization._cached_specs.clear),
+            "open_section_ms": open_sections(at)
+        }
+
+    write_results("rerun", results)
+
+if __name__ == "__main__":
+    main()
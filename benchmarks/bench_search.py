@@ -0,0 +1,118 @@
+"""
+Comment search benchmark.
+
+Seeds a database with about --comments non-blank comments and times
+database.search_comments for rare and common words, several words,
+prefixes, dashboard filters and a deep page, against the only way to
+search before the comment index: loading the filtered responses into
+pandas and scanning their text. Also checks that a save whose comment
+index write fails leaves nothing behind.
+
+    python -m benchmarks.bench_search --comments 1000000
+"""
+import argparse
+import datetime
+
+import database
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import generate_responses, iter_responses
+
+# (name, search text, filters, offset)
+QUERIES = [
+    ("rare_word", "timeline", {}, 0),
+    ("common_word", "week", {}, 0),
+    ("two_words", "manager supportive", {}, 0),
+    ("prefix", "manag", {}, 0),
+    ("department", "deadline", {"department": "Engineering"}, 0),
+    ("last_30_days", "workload", {"days": 30}, 0),
+    ("page_50", "week", {}, 49 * database.SEARCH_PAGE_SIZE)
+]
+
+def pandas_search(text, **filters):
+    """Load the filtered responses and scan their comments for the text"""
+    df = database.get_filtered_responses(**filters)
+    matches = 0
+    for col in ("q_9", "q_10"):
+        matches += int(df[col].fillna("").str.contains(text, case=False, regex=False).sum())
+    return matches
+
+# What a save changes, for checking a failed one changed nothing
+SAVE_STATE_QUERIES = [
+    "SELECT COUNT(*) FROM responses",
+    "SELECT version FROM data_version WHERE id = 1",
+    "SELECT SUM(n) FROM response_cube",
+    "SELECT SUM(n) FROM term_counts",
+    "SELECT COUNT(*) FROM comment_index"
+]
+
+def save_state():
+    with database.get_pool().connection() as conn:
+        return [conn.execute(query).fetchone()[0] for query in SAVE_STATE_QUERIES]
+
+def check_failed_save_rolls_back():
+    """Fail the comment index write of a save and check the whole save rolled back"""
+    batch = generate_responses(10, seed=1)
+    before = save_state()
+
+    def fail(*args):
+        raise RuntimeError("Injected comment index failure")
+
+    index_comments = database._update_comment_index
+    database._update_comment_index = fail
+    try:
+        database.save_responses(batch)
+    except RuntimeError:
+        pass
+    else:
+        raise SystemExit("The injected comment index failure was not raised")
+    finally:
+        database._update_comment_index = index_comments
+
+    if save_state() != before:
+        raise SystemExit("A save whose comment index write failed was partly committed")
+
+    # Nothing was left behind, so saving the same responses again succeeds
+    database.save_responses(batch)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Synthetic responses average about 0.9 non-blank comments
+    rows = int(args.comments / 0.9)
+    results = {"rows": rows, "queries": {}}
+
+    with isolated_database():
+        for chunk in iter_responses(rows, chunk_size=250000, seed=0):
+            seed_responses(chunk)
+
+        check_failed_save_rolls_back()
+
+        with database.get_pool().connection() as conn:
+            results["comments"] = conn.execute("SELECT COUNT(*) FROM comment_index").fetchone()[0]
+            latest = database.from_epoch([conn.execute("SELECT MAX(timestamp) FROM responses").fetchone()[0]])[0]
+
+        for name, text, filters, offset in QUERIES:
+            filters = dict(filters)
+            if "days" in filters:
+                filters["start_date"] = latest - datetime.timedelta(days=filters.pop("days"))
+
+            _, total = database.search_comments(text, offset=offset, **filters)
+            results["queries"][name] = {
+                "search": text,
+                "matches": total,
+                **time_call(database.search_comments, text, offset=offset, repeat=args.repeat, **filters)
+            }
+
+        results["pandas_scan"] = {
+            "search": "deadline",
+            "matches": pandas_search("deadline"),
+            **time_call(pandas_search, "deadline", repeat=1)
+        }
+
+    write_results("search", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Session state footprint benchmark.
+
+Simulates employee sessions arriving over a working window: each fills in
+the check-in, and a share of them go on to chat with the assistant for a
+few turns. The same sessions are held twice: the way the app used to keep
+them (the whole chat and the survey answers in st.session_state, plus the
+admin-only entries every session was given) and the way it keeps them now
+(small values in st.session_state, the conversation in the session store
+with older messages offloaded). Reports memory per session and in total,
+measured with tracemalloc and by the store's own accounting, before and
+after idle sessions are evicted.
+
+    python -m benchmarks.bench_sessions --sessions 5000
+"""
+import os
+import uuid
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+import session_store
+from benchmarks.common import percentile, write_results
+from survey_questions import get_survey
+
+DEPARTMENTS = ["Engineering", "Marketing", "Sales", "Product", "HR", "Finance", "Other"]
+LOCATIONS = ["Remote", "HQ", "Regional Office", "Other"]
+
+def text(length):
+    return os.urandom(length // 2 + 1).hex()[:length]
+
+def simulate(sessions, chat_share, mean_turns, window_seconds, seed):
+    """
+    One (start time, survey answers, chat messages) per session. Messages
+    are (role, length): their text is made when a session is held, as the
+    app receives it, so it counts towards that session's memory.
+    """
+    rng = random.Random(seed)
+    survey = get_survey()
+
+    simulated = []
+    for _ in range(sessions):
+        answers = {
+            q.column: rng.randint(1, 5) if q.type == "scale" else text(rng.choice([0, 40, 160]))
+            for q in survey.questions
+        }
+
+        messages = []
+        if rng.random() < chat_share:
+            # The assistant opens, then each turn is a message and a reply
+            messages.append(("assistant", rng.randint(300, 900)))
+            turns = min(int(rng.expovariate(1 / mean_turns)) + 1, 60)
+            for _ in range(turns):
+                messages.append(("user", rng.randint(20, 240)))
+                messages.append(("assistant", rng.randint(300, 900)))
+
+        simulated.append((rng.uniform(0, window_seconds), answers, messages))
+    return simulated
+
+def widget_state(rng):
+    return {"checkin_department": rng.choice(DEPARTMENTS), "checkin_location": rng.choice(LOCATIONS)}
+
+def hold_before(simulated, seed):
+    """Session states as the app used to keep them"""
+    rng = random.Random(seed)
+    states = []
+    for _, answers, messages in simulated:
+        state = {
+            "authenticated": False,
+            "auth_attempts": 0,
+            "chat_messages": [{"role": role, "content": text(length)} for role, length in messages],
+            "current_survey_responses": dict(answers),
+            "show_chatbot": bool(messages),
+            "show_profiler": False,
+            "traces": [],
+            "panel_cache": {},
+            "respondent_token": uuid.uuid4().hex,
+            "survey_submitted": True
+        }
+        state.update(widget_state(rng))
+        states.append(state)
+    return states
+
+def hold_after(simulated, store, clock, seed):
+    """Session states as the app keeps them now, with chats in the store"""
+    rng = random.Random(seed)
+    states = []
+    for started, answers, messages in sorted(simulated, key=lambda s: s[0]):
+        clock[0] = started
+        state = {
+            "authenticated": False,
+            "admin_tenant": None,
+            "auth_attempts": 0,
+            "session_id": uuid.uuid4().hex,
+            "show_chatbot": bool(messages),
+            "show_profiler": False,
+            "respondent_token": uuid.uuid4().hex,
+            "survey_submitted": True
+        }
+        state.update(widget_state(rng))
+
+        if messages:
+            store.start_chat(state["session_id"], answers)
+            for role, length in messages:
+                store.add_message(state["session_id"], role, text(length))
+        states.append(state)
+    return states
+
+def hold_in_store(simulated, memory_turns, idle_seconds, window_seconds):
+    """Hold the sessions the current way and summarize their memory"""
+    # A simulated clock, so sessions age without waiting
+    clock = [0.0]
+    archive = session_store.ChatArchive(tempfile.mkdtemp(prefix="hurdl-bench-"))
+    store = session_store.SessionStore(memory_turns, idle_seconds, archive, clock=lambda: clock[0])
+
+    states, traced_bytes = measure(lambda: hold_after(simulated, store, clock, seed=1))
+    chat_sizes = {session_id: chat.size for session_id, chat in store._sessions.items()}
+    sizes = [session_store.deep_size(state) + chat_sizes.get(state["session_id"], 0) for state in states]
+
+    summary = summarize(sizes, traced_bytes)
+    summary["store"] = store.stats()
+    summary["chat_archive_mb"] = round(os.path.getsize(archive.path) / 2 ** 20, 2) if archive.path else 0
+
+    # Sessions still open in a tab at the end of the window
+    clock[0] = window_seconds
+    summary["evicted_at_window_end"] = store.evict_idle()
+    summary["store_sessions_after_eviction"] = store.stats()["sessions"]
+
+    archive.close()
+    return summary
+
+def measure(build):
+    """Run build(), returning its result and the bytes it left allocated"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, after - before
+
+def summarize(sizes, traced_bytes):
+    return {
+        "traced_total_mb": round(traced_bytes / 2 ** 20, 2),
+        "per_session_mean_kb": round(sum(sizes) / len(sizes) / 1024, 2),
+        "per_session_p95_kb": round(percentile(sizes, 95) / 1024, 2),
+        "per_session_max_kb": round(max(sizes) / 1024, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--chat-share", type=float, default=0.4, help="Share of sessions that chat")
+    parser.add_argument("--mean-turns", type=float, default=6)
+    parser.add_argument("--window-hours", type=float, default=4, help="Time over which sessions arrive")
+    parser.add_argument("--memory-turns", type=int, default=session_store.CHAT_MEMORY_TURNS)
+    parser.add_argument("--idle-seconds", type=float, default=session_store.SESSION_IDLE_SECONDS)
+    args = parser.parse_args()
+
+    window_seconds = args.window_hours * 3600
+    simulated = simulate(args.sessions, args.chat_share, args.mean_turns, window_seconds, seed=0)
+
+    before_states, before_bytes = measure(lambda: hold_before(simulated, seed=1))
+    before_sizes = [session_store.deep_size(state) for state in before_states]
+    del before_states
+
+    results = {
+        "sessions": args.sessions,
+        "chatting_sessions": sum(1 for _, _, messages in simulated if messages),
+        "chat_messages": sum(len(messages) for _, _, messages in simulated),
+        "memory_turns": args.memory_turns,
+        "idle_seconds": args.idle_seconds,
+        "before": summarize(before_sizes, before_bytes),
+        # Offloading alone, then with idle sessions evicted as they go
+        "after_offload_only": hold_in_store(simulated, args.memory_turns, float("inf"), window_seconds),
+        "after": hold_in_store(simulated, args.memory_turns, args.idle_seconds, window_seconds)
+    }
+    write_results("sessions", results)
+
+if __name__ == "__main__":
+    main()
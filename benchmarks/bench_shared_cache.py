@@ -0,0 +1,101 @@
+"""
+Shared cache benchmark.
+
+Starts several worker processes, as several Streamlit replicas would be,
+and has them all load the responses at the same moment through the shared
+disk cache. Checks the data is read once per data version rather than once
+per worker, and compares each worker's load time with reading the
+database itself.
+
+    python -m benchmarks.bench_shared_cache --rows 200000 --workers 8
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import time
+import uuid
+
+import database
+from benchmarks.common import isolated_database, percentile, seed_responses, write_results
+from demo_data import generate_responses
+from shared_cache import DiskCache
+
+def _worker(db_path, cache_dir, shared, barrier, results):
+    database.DB_PATH = db_path
+    cache = DiskCache(cache_dir)
+    computed = []
+
+    def compute():
+        computed.append(True)
+        return database.get_responses()
+
+    barrier.wait()
+    start = time.perf_counter()
+    if shared:
+        df = cache.get_or_compute("responses", (None,), database.get_data_version(), compute)
+    else:
+        df = compute()
+    results.put({"ms": (time.perf_counter() - start) * 1000, "computed": len(computed), "rows": len(df)})
+
+def load_in_workers(db_path, cache_dir, workers, shared):
+    """Load the responses in every worker at once; one result per worker"""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+
+    processes = [
+        context.Process(target=_worker, args=(db_path, cache_dir, shared, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    durations = [outcome["ms"] for outcome in outcomes]
+    return {
+        "computations": sum(outcome["computed"] for outcome in outcomes),
+        "rows": outcomes[0]["rows"],
+        "p50_ms": round(percentile(durations, 50), 3),
+        "max_ms": round(max(durations), 3),
+        "total_ms": round(sum(durations), 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with isolated_database() as directory:
+        seed_responses(generate_responses(args.rows, seed=0))
+        cache_dir = os.path.join(directory, "cache")
+
+        results = {
+            "rows": args.rows,
+            "workers": args.workers,
+            "per_process": load_in_workers(database.DB_PATH, cache_dir, args.workers, shared=False),
+            "shared_cold": load_in_workers(database.DB_PATH, cache_dir, args.workers, shared=True),
+            "shared_warm": load_in_workers(database.DB_PATH, cache_dir, args.workers, shared=True)
+        }
+
+        # A new response changes the data version, so exactly one worker reloads
+        response = generate_responses(1, seed=1).iloc[0].to_dict()
+        response["response_id"] = str(uuid.uuid4())
+        response["timestamp"] = datetime.datetime.now()
+        database.save_response(response)
+        results["shared_after_write"] = load_in_workers(database.DB_PATH, cache_dir, args.workers, shared=True)
+
+    write_results("shared-cache", results)
+
+    expected = {"shared_cold": 1, "shared_warm": 0, "shared_after_write": 1}
+    for name, computations in expected.items():
+        if results[name]["computations"] != computations:
+            raise SystemExit(f"{name}: {results[name]['computations']} computations, expected {computations}")
+    if results["shared_after_write"]["rows"] != args.rows + 1:
+        raise SystemExit("Workers served responses older than the data version")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Shared-memory dataset benchmark.
+
+Publishes the responses once, then starts several worker processes that
+either read the responses from the database (each holding its own copy)
+or attach to the published Arrow file. Reports each worker's load latency
+and how much memory the responses add to it, privately and as its
+proportional share of pages shared with the other workers (PSS). Also
+checks that analysis runs on the read-only frames and that a refresh swaps
+in new data without invalidating frames already attached.
+
+    python -m benchmarks.bench_shared_dataset --rows 500000 --workers 8
+"""
+import argparse
+import datetime
+import multiprocessing
+import os
+import time
+import uuid
+
+import database
+import data_analysis
+import shared_dataset
+from benchmarks.common import isolated_database, percentile, seed_responses, write_results
+from demo_data import generate_responses
+
+def memory_kb():
+    """Private and proportional (PSS) memory of this process, in kB"""
+    usage = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("Pss", "Private_Clean", "Private_Dirty"):
+                usage[name] = int(value.split()[0])
+    return {"private": usage["Private_Clean"] + usage["Private_Dirty"], "pss": usage["Pss"]}
+
+def _worker(db_path, dataset_dir, attach, barrier, results):
+    database.DB_PATH = db_path
+    before = memory_kb()
+
+    barrier.wait()
+    start = time.perf_counter()
+    if attach:
+        _, df = shared_dataset.attach_responses(directory=dataset_dir)
+    else:
+        df = database.get_responses()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    # Touch every column, as the dashboard's analysis would
+    wellbeing = data_analysis.calculate_wellbeing_index(df)
+    for column in df.columns:
+        df[column].iloc[-1]
+
+    # Wait until every worker holds the data before measuring, so shared
+    # pages are split between all of them
+    barrier.wait()
+    after = memory_kb()
+    results.put({
+        "load_ms": load_ms,
+        "private_mb": (after["private"] - before["private"]) / 1024,
+        "pss_mb": (after["pss"] - before["pss"]) / 1024,
+        "wellbeing": wellbeing
+    })
+    barrier.wait()
+
+def run_workers(db_path, dataset_dir, workers, attach):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+
+    processes = [
+        context.Process(target=_worker, args=(db_path, dataset_dir, attach, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    return {
+        "load_p50_ms": round(percentile([o["load_ms"] for o in outcomes], 50), 3),
+        "load_max_ms": round(max(o["load_ms"] for o in outcomes), 3),
+        "private_mb_per_worker": round(percentile([o["private_mb"] for o in outcomes], 50), 1),
+        "pss_mb_per_worker": round(percentile([o["pss_mb"] for o in outcomes], 50), 1),
+        "pss_mb_total": round(sum(o["pss_mb"] for o in outcomes), 1),
+        "wellbeing": outcomes[0]["wellbeing"]
+    }
+
+def check_swap(dataset_dir, rows):
+    """A refresh replaces the dataset while frames attached earlier stay readable"""
+    version, old = shared_dataset.attach_responses(directory=dataset_dir)
+
+    response = generate_responses(1, seed=1).iloc[0].to_dict()
+    response["response_id"] = str(uuid.uuid4())
+    response["timestamp"] = datetime.datetime.now()
+    database.save_response(response)
+    shared_dataset.publish_responses(directory=dataset_dir)
+
+    new_version, new = shared_dataset.attach_responses(directory=dataset_dir)
+    if len(old) != rows or len(new) != rows + 1 or new_version == version:
+        raise SystemExit("Swapped dataset does not match the database")
+    if new_version != database.get_data_version():
+        raise SystemExit("Published data version is out of date")
+
+    # The old mapping outlives the file it came from
+    old["q_1"].sum()
+
+    try:
+        new["q_1"].to_numpy()[0] = 0
+    except ValueError:
+        return True
+    raise SystemExit("Attached frames should be read-only")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with isolated_database() as directory:
+        seed_responses(generate_responses(args.rows, seed=0))
+        dataset_dir = os.path.join(shared_dataset.DATASET_DIR, os.path.basename(directory))
+
+        start = time.perf_counter()
+        shared_dataset.publish_responses(directory=dataset_dir)
+        publish_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            results = {
+                "rows": args.rows,
+                "workers": args.workers,
+                "publish_ms": round(publish_ms, 3),
+                "dataset_mb": round(os.path.getsize(shared_dataset.get_dataset_path(directory=dataset_dir)) / 2 ** 20, 1),
+                "database_read": run_workers(database.DB_PATH, dataset_dir, args.workers, attach=False),
+                "shared_attach": run_workers(database.DB_PATH, dataset_dir, args.workers, attach=True),
+            }
+            results["read_only_swap_ok"] = check_swap(dataset_dir, args.rows)
+        finally:
+            for name in os.listdir(dataset_dir):
+                os.unlink(os.path.join(dataset_dir, name))
+            os.rmdir(dataset_dir)
+
+    write_results("shared-dataset", results)
+
+    if results["database_read"]["wellbeing"] != results["shared_attach"]["wellbeing"]:
+        raise SystemExit("Attached responses give different results")
+
+if __name__ == "__main__":
+    main()
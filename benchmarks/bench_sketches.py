@@ -0,0 +1,99 @@
+"""
+Quantile and distinct-count sketch benchmark.
+
+Seeds responses with session tokens, then compares the sketch summary
+(p10/median/p90 per department and distinct sessions) with exact values
+computed from the raw responses. The run fails if the sketches are less
+accurate than they should be. Also reports the storage taken by the
+sketches and the latency of both paths.
+
+    python -m benchmarks.bench_sketches --rows 500000 --respondents 50000
+"""
+import argparse
+import time
+import numpy as np
+
+import database
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import generate_responses
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+# KLL (k=200) rank error and HyperLogLog (p=10, ~3% standard error) bounds
+MAX_RANK_ERROR = 0.03
+MAX_DISTINCT_ERROR = 0.10
+
+def rank_error(values, estimate, q):
+    """How far q is from the range of ranks the estimated value occupies"""
+    below = np.mean(values < estimate)
+    at_or_below = np.mean(values <= estimate)
+    return max(0.0, below - q, q - at_or_below)
+
+def exact_summary():
+    """Exact per-department quantiles of the wellbeing score from raw responses"""
+    df = database.get_responses()
+    df["wellbeing"] = df[database.get_metric_columns("wellbeing")].mean(axis=1)
+    return df.groupby("department")["wellbeing"].quantile(list(QUANTILES)).unstack()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--respondents", type=int, default=50000)
+    args = parser.parse_args()
+
+    df = generate_responses(args.rows, seed=0, respondents=args.respondents)
+    df["wellbeing"] = df[database.get_metric_columns("wellbeing")].mean(axis=1)
+
+    with isolated_database():
+        start = time.perf_counter()
+        seed_responses(df.drop(columns=["wellbeing"]))
+        seed_seconds = time.perf_counter() - start
+
+        summary = database.get_sketch_summary(by="department").set_index("department")
+
+        rank_errors, distinct_errors = [], []
+        for department, group in df.groupby("department"):
+            row = summary.loc[department]
+            values = group["wellbeing"].to_numpy()
+            for q in QUANTILES:
+                rank_errors.append(rank_error(values, row[f"wellbeing_p{round(q * 100)}"], q))
+
+            exact = group["respondent"].nunique()
+            distinct_errors.append(abs(row["sessions"] - exact) / exact)
+
+        with database.get_pool().connection() as conn:
+            sketch_bytes, cells = conn.execute(
+                "SELECT SUM(LENGTH(sketch)), COUNT(DISTINCT department || location || day) FROM response_sketches"
+            ).fetchone()
+
+        results = {
+            "rows": args.rows,
+            "respondents": args.respondents,
+            "seed_rows_per_sec": round(args.rows / seed_seconds, 1),
+            "accuracy": {
+                "max_rank_error": round(max(rank_errors), 5),
+                "mean_rank_error": round(float(np.mean(rank_errors)), 5),
+                "max_distinct_relative_error": round(max(distinct_errors), 5),
+                "mean_distinct_relative_error": round(float(np.mean(distinct_errors)), 5)
+            },
+            "memory": {
+                "sketch_cells": cells,
+                "sketch_bytes": sketch_bytes,
+                # What an exact answer has to hold in memory: every score and token
+                "exact_bytes": int(df[["department", "wellbeing", "respondent"]].memory_usage(deep=True).sum())
+            },
+            "latency": {
+                "sketch_summary_by_department": time_call(database.get_sketch_summary, by="department", repeat=5),
+                "sketch_summary_overall": time_call(database.get_sketch_summary, repeat=5),
+                "exact_quantiles_by_department": time_call(exact_summary, repeat=3)
+            }
+        }
+
+    write_results("sketches", results)
+
+    accuracy = results["accuracy"]
+    if accuracy["max_rank_error"] > MAX_RANK_ERROR or accuracy["max_distinct_relative_error"] > MAX_DISTINCT_ERROR:
+        raise SystemExit(f"Sketch accuracy out of bounds: {accuracy}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cold start benchmark based on ``python -X importtime``.
+
+Imports ``app`` in a fresh interpreter (the same work a new Streamlit worker
+does before rendering the check-in) and reports the total import time and the
+slowest top-level imports. It fails when a dashboard- or chatbot-only
+dependency sneaks back onto the startup path, or when startup exceeds
+``--max-ms``, so it can be run as a regression check.
+
+    python -m benchmarks.bench_startup --max-ms 2000
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import numpy as np
+
+from benchmarks.common import write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the HR dashboard or the chatbot need
+DEFERRED_MODULES = ["data_analysis", "visualization", "ai_assistant", "textblob", "openai", "plotly.express"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+def measure_import(statement):
+    """Run a statement under -X importtime and parse the per-module timings"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    ).stderr
+
+    modules = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            # Nesting is shown by indentation: one space for top-level imports,
+            # three for the modules they import directly, and so on
+            modules[name] = {"cumulative_us": int(cumulative), "depth": (len(indent) + 1) // 2}
+
+    return modules
+
+def summarise(statement, repeat):
+    """Measure a statement several times and keep the median total"""
+    runs = [measure_import(statement) for _ in range(repeat)]
+    totals = [sum(m["cumulative_us"] for m in run.values() if m["depth"] == 1) for run in runs]
+    last = runs[-1]
+
+    slowest = sorted(
+        ((name, m["cumulative_us"]) for name, m in last.items() if m["depth"] == 2),
+        key=lambda item: item[1], reverse=True
+    )[:10]
+
+    return {
+        "median_ms": round(float(np.median(totals)) / 1000, 1),
+        "slowest_imports_ms": {name: round(us / 1000, 1) for name, us in slowest},
+        "modules": set(last)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="fail if the check-in startup median exceeds this")
+    args = parser.parse_args()
+
+    checkin = summarise("import app", args.repeat)
+    full = summarise("import app, data_analysis, visualization, ai_assistant", args.repeat)
+
+    leaked = [name for name in DEFERRED_MODULES if name in checkin["modules"]]
+
+    results = {
+        "checkin_startup_ms": checkin["median_ms"],
+        "full_startup_ms": full["median_ms"],
+        "checkin_slowest_imports_ms": checkin["slowest_imports_ms"],
+        "deferred_modules_imported_at_startup": leaked
+    }
+    write_results("startup", results)
+
+    if leaked:
+        raise SystemExit(f"Deferred modules imported at startup: {', '.join(leaked)}")
+    if args.max_ms is not None and checkin["median_ms"] > args.max_ms:
+        raise SystemExit(f"Startup took {checkin['median_ms']} ms (limit {args.max_ms} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Concurrent survey submission stress harness.
+
+Simulates employees submitting check-ins at the same moment: N submitters,
+as threads (sessions in one Streamlit process) or processes (several
+replicas sharing the database), each call database.save_response, the
+same path as the check-in form. Reports the success rate, p50/p99 submit
+latency, throughput and how many writes needed a retry.
+
+Run it with the defaults, then with the settings this replaced to compare:
+
+    python -m benchmarks.bench_submissions --submitters 32 --per-submitter 20
+    python -m benchmarks.bench_submissions --journal-mode delete --busy-timeout-ms 0 --retries 0
+"""
+import argparse
+import datetime
+import multiprocessing
+import threading
+import time
+import uuid
+
+import database
+import metrics
+from benchmarks.common import isolated_database, percentile, seed_responses, write_results
+from demo_data import generate_responses
+
+def configure(journal_mode, busy_timeout_ms, retries):
+    database.JOURNAL_MODE = journal_mode
+    database.BUSY_TIMEOUT_MS = busy_timeout_ms
+    database.WRITE_RETRIES = retries
+
+def submit_all(responses, start_at):
+    """Submit responses one by one; returns (latency ms, error name) per submission"""
+    # Everyone starts at once, as after an all-hands reminder
+    time.sleep(max(0.0, start_at - time.time()))
+
+    outcomes = []
+    for response in responses:
+        response = dict(response, response_id=str(uuid.uuid4()), timestamp=datetime.datetime.now())
+        start = time.perf_counter()
+        try:
+            database.save_response(response)
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        outcomes.append(((time.perf_counter() - start) * 1000, error))
+    return outcomes
+
+def _process_submitter(db_path, config, responses, start_at, results):
+    database.DB_PATH = db_path
+    configure(*config)
+    # A running replica has already opened the shard
+    database.get_pool()
+    outcomes = submit_all(responses, start_at)
+    results.put((outcomes, metrics.DB_WRITE_RETRIES._values.get((), 0)))
+
+def run_threads(batches, start_at):
+    outcomes = []
+    lock = threading.Lock()
+
+    def run(batch):
+        result = submit_all(batch, start_at)
+        with lock:
+            outcomes.extend(result)
+
+    retries_before = metrics.DB_WRITE_RETRIES._values.get((), 0)
+    threads = [threading.Thread(target=run, args=(batch,)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes, metrics.DB_WRITE_RETRIES._values.get((), 0) - retries_before
+
+def run_processes(batches, start_at, config):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=_process_submitter, args=(database.DB_PATH, config, batch, start_at, results))
+        for batch in batches
+    ]
+    for process in processes:
+        process.start()
+
+    outcomes, retries = [], 0
+    for _ in processes:
+        result, process_retries = results.get()
+        outcomes.extend(result)
+        retries += process_retries
+    for process in processes:
+        process.join()
+    return outcomes, retries
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submitters", type=int, default=32)
+    parser.add_argument("--per-submitter", type=int, default=20)
+    parser.add_argument("--mode", choices=["threads", "processes"], default="threads")
+    parser.add_argument("--seed-rows", type=int, default=50000, help="Responses already in the database")
+    parser.add_argument("--journal-mode", default=database.JOURNAL_MODE)
+    parser.add_argument("--busy-timeout-ms", type=int, default=database.BUSY_TIMEOUT_MS)
+    parser.add_argument("--retries", type=int, default=database.WRITE_RETRIES)
+    args = parser.parse_args()
+
+    config = (args.journal_mode, args.busy_timeout_ms, args.retries)
+    configure(*config)
+
+    responses = generate_responses(args.submitters * args.per_submitter, seed=1).to_dict("records")
+    batches = [responses[i::args.submitters] for i in range(args.submitters)]
+
+    with isolated_database():
+        if args.seed_rows:
+            seed_responses(generate_responses(args.seed_rows, seed=0))
+            # Cluster the seeded comments now, not in the background during the run
+            database.update_themes()
+        database.close_pools()
+
+        # Leave time for spawned processes to import everything
+        start_at = time.time() + (5 if args.mode == "processes" else 0.2)
+        if args.mode == "threads":
+            outcomes, retries = run_threads(batches, start_at)
+        else:
+            outcomes, retries = run_processes(batches, start_at, config)
+        elapsed = time.time() - start_at
+
+        saved = database.get_data_version() - args.seed_rows
+
+    latencies = [ms for ms, error in outcomes if error is None]
+    errors = {}
+    for _, error in outcomes:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+
+    results = {
+        "mode": args.mode,
+        "submitters": args.submitters,
+        "per_submitter": args.per_submitter,
+        "journal_mode": args.journal_mode,
+        "busy_timeout_ms": args.busy_timeout_ms,
+        "retries": args.retries,
+        "attempted": len(outcomes),
+        "succeeded": len(latencies),
+        "success_rate": round(len(latencies) / len(outcomes), 4),
+        "errors": errors,
+        "writes_retried": retries,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies, default=0), 3),
+        "throughput_per_sec": round(len(latencies) / elapsed, 1)
+    }
+    write_results(f"submissions-{args.mode}", results)
+
+    if saved != len(latencies):
+        raise SystemExit(f"{len(latencies)} submissions reported success but {saved} were saved")
+
+if __name__ == "__main__":
+    main()
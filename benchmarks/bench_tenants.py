@@ -0,0 +1,141 @@
+"""
+Mixed-tenant throughput benchmark.
+
+Simulates one large tenant that continuously writes and scans its data while
+many small tenants submit check-ins and load their dashboards. The workload
+is run twice: once with every tenant in a single database file (the old
+layout) and once with one shard per tenant. After the sharded run each
+tenant's row count is checked to prove no writes leaked between shards.
+
+    python -m benchmarks.bench_tenants --tenants 8 --seconds 5
+"""
+import argparse
+import threading
+import time
+import uuid
+import datetime
+import numpy as np
+
+import database
+from survey_questions import get_question_columns
+from benchmarks.common import isolated_database, percentile, seed_responses, write_results
+from demo_data import generate_responses
+
+BIG_TENANT = "bigcorp"
+
+def _new_response(rng):
+    response = {
+        "response_id": str(uuid.uuid4()),
+        "timestamp": datetime.datetime.now(),
+        "department": "Engineering",
+        "location": "Remote"
+    }
+    for col in get_question_columns("scale"):
+        response[col] = int(rng.integers(1, 6))
+    for col in get_question_columns("text"):
+        response[col] = "Fine"
+    return response
+
+def run_workload(sharded, args):
+    """Run the mixed workload and return latency/throughput figures"""
+    small_tenants = [f"tenant{i:03d}" for i in range(args.tenants)]
+
+    def route(tenant):
+        # In the single-file layout every tenant shares the default database
+        return tenant if sharded else None
+
+    # Distinct seeds keep response IDs unique when tenants share one file
+    seed_responses(generate_responses(args.big_rows, seed=1000), route(BIG_TENANT))
+    for i, tenant in enumerate(small_tenants):
+        seed_responses(generate_responses(args.small_rows, seed=i), route(tenant))
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    submit_latencies = []
+    read_latencies = []
+    big_scans = [0]
+    written = {tenant: 0 for tenant in small_tenants}
+
+    def big_tenant_worker():
+        local_rng = np.random.default_rng(7)
+        while not stop.is_set():
+            database.save_response(_new_response(local_rng), tenant=route(BIG_TENANT))
+            database.get_responses(tenant=route(BIG_TENANT))
+            big_scans[0] += 1
+
+    def small_tenant_worker(worker_id):
+        local_rng = np.random.default_rng(worker_id)
+        while not stop.is_set():
+            tenant = small_tenants[int(local_rng.integers(len(small_tenants)))]
+
+            start = time.perf_counter()
+            database.save_response(_new_response(local_rng), tenant=route(tenant))
+            submitted = time.perf_counter()
+            database.get_filtered_responses(department="Engineering", tenant=route(tenant))
+            finished = time.perf_counter()
+
+            with lock:
+                written[tenant] += 1
+                submit_latencies.append((submitted - start) * 1000)
+                read_latencies.append((finished - submitted) * 1000)
+
+    threads = [threading.Thread(target=big_tenant_worker)]
+    threads += [threading.Thread(target=small_tenant_worker, args=(i,)) for i in range(args.submitters)]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    isolated = None
+    if sharded:
+        # Every small tenant must hold exactly its seed rows plus its own writes
+        isolated = all(
+            len(database.get_responses(tenant=tenant)) == args.small_rows + written[tenant]
+            for tenant in small_tenants
+        )
+
+    return {
+        "small_tenant_submits": len(submit_latencies),
+        "small_tenant_submits_per_sec": round(len(submit_latencies) / elapsed, 1),
+        "submit_p50_ms": round(percentile(submit_latencies, 50), 3),
+        "submit_p99_ms": round(percentile(submit_latencies, 99), 3),
+        "read_p50_ms": round(percentile(read_latencies, 50), 3),
+        "read_p99_ms": round(percentile(read_latencies, 99), 3),
+        "big_tenant_scans": big_scans[0],
+        "isolation_verified": isolated
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=8)
+    parser.add_argument("--small-rows", type=int, default=2000)
+    parser.add_argument("--big-rows", type=int, default=100000)
+    parser.add_argument("--submitters", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for layout, sharded in [("single_file", False), ("sharded", True)]:
+        with isolated_database():
+            results[layout] = run_workload(sharded, args)
+
+    with isolated_database():
+        for i in range(args.tenants):
+            seed_responses(generate_responses(args.small_rows, seed=i), f"tenant{i:03d}")
+        start = time.perf_counter()
+        summary = database.get_cross_tenant_summary()
+        results["cross_tenant_summary_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        results["cross_tenant_summary_rows"] = int(summary.loc["All", "responses"])
+
+    if results["sharded"]["isolation_verified"] is False:
+        raise SystemExit("Tenant isolation check failed")
+
+    write_results("tenants", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Common words and topics benchmark.
+
+Times the dashboard's common words and topic mentions for date ranges of
+increasing length, summed from the per-day term and topic counts
+(database.get_text_summary), against tokenizing the comments of the
+filtered responses, which analyze_sentiment did on every render. Also
+reports the cost of rebuilding the counts after a lexicon change.
+
+    python -m benchmarks.bench_text_counts --rows 500000
+"""
+import argparse
+import datetime
+
+import database
+from survey_questions import get_question_columns
+from text_processing import count_topics, tokenize
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import iter_responses
+
+RANGE_DAYS = [7, 30, 90, 365]
+
+def tokenized_counts(start_date, end_date, department=None):
+    """Common words and topics by loading and tokenizing the filtered comments"""
+    df = database.get_filtered_responses(start_date, end_date, department)
+    words = []
+    for col in get_question_columns("text"):
+        for text in df[col].dropna():
+            words.extend(tokenize(text))
+
+    counts = {}
+    for word in words:
+        counts[word] = counts.get(word, 0) + 1
+    return dict(sorted(counts.items(), key=lambda x: x[1], reverse=True)[:10]), count_topics(words)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--department", default="Engineering")
+    args = parser.parse_args()
+
+    results = {"rows": args.rows, "ranges": {}}
+    with isolated_database():
+        for chunk in iter_responses(args.rows, chunk_size=250000, seed=0):
+            seed_responses(chunk)
+
+        with database.get_pool().connection() as conn:
+            latest = database.from_epoch([conn.execute("SELECT MAX(timestamp) FROM responses").fetchone()[0]])[0]
+            results["term_cells"] = conn.execute("SELECT COUNT(*) FROM term_counts").fetchone()[0]
+        end_date = datetime.datetime.combine(latest.date(), datetime.time.max)
+
+        for days in RANGE_DAYS:
+            start_date = datetime.datetime.combine(latest.date() - datetime.timedelta(days=days - 1), datetime.time.min)
+            summary = database.get_text_summary(start_date, end_date)
+            words, topics = tokenized_counts(start_date, end_date)
+            if summary["common_words"] != words or summary["topics"] != topics:
+                # Words tied on count may come in another order
+                if sorted(summary["common_words"].values()) != sorted(words.values()) or summary["topics"] != topics:
+                    raise SystemExit(f"Counts differ for the last {days} days")
+
+            results["ranges"][f"{days}d"] = {
+                "precomputed": time_call(database.get_text_summary, start_date, end_date),
+                "precomputed_department": time_call(database.get_text_summary, start_date, end_date,
+                                                    args.department),
+                "tokenized": time_call(tokenized_counts, start_date, end_date, repeat=1),
+                "tokenized_department": time_call(tokenized_counts, start_date, end_date, args.department,
+                                                  repeat=1)
+            }
+
+        results["rebuild"] = time_call(database.rebuild_text_counts, repeat=1)
+
+    write_results("text_counts", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Comment theme clustering benchmark.
+
+Streams synthetic comments through text_processing.ThemeModel in
+mini-batches, as check-ins would arrive, and reports throughput and peak
+memory (tracemalloc) at increasing comment counts, to show memory stays
+flat. Then seeds a database and reports how long update_themes takes to
+catch up on its comments, and the dashboard's cost of showing themes for a
+filter: get_theme_summary, counted from stored assignments, against
+analyze_sentiment's keyword topics, which tokenize every comment.
+
+    python -m benchmarks.bench_themes --comments 1000000 --rows 50000
+"""
+import time
+import argparse
+import itertools
+import tracemalloc
+
+import database
+from data_analysis import analyze_sentiment
+from text_processing import THEME_COUNT, ThemeModel
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import generate_responses
+
+def iter_comments(count, chunk_size=50000):
+    """count non-blank comments from synthetic responses, in chunks"""
+    produced = 0
+    for chunk_index in itertools.count():
+        chunk = generate_responses(chunk_size, seed=0, chunk=chunk_index, id_offset=chunk_index * chunk_size)
+        texts = [text for col in ("q_9", "q_10") for text in chunk[col].tolist() if text]
+        yield texts[:count - produced]
+        produced += len(texts)
+        if produced >= count:
+            return
+
+def stream(comments, batch_size, k, checkpoints, trace=False):
+    """
+    Fit a model over the comments a batch at a time, sampling throughput,
+    or with trace the peak memory (tracemalloc slows allocation down, so
+    the two are measured in separate runs).
+    """
+    model = ThemeModel(k)
+    checkpoints = list(checkpoints)
+    samples = []
+    seen = 0
+    fit_seconds = 0.0
+
+    if trace:
+        tracemalloc.start()
+    for texts in iter_comments(comments):
+        if trace:
+            # Only what the model holds and a batch's work should count
+            tracemalloc.reset_peak()
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            start = time.perf_counter()
+            model.partial_fit(batch)
+            fit_seconds += time.perf_counter() - start
+            seen += len(batch)
+
+            if checkpoints and seen >= checkpoints[0]:
+                checkpoints.pop(0)
+                if trace:
+                    samples.append({"comments": seen, "peak_mb": round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)})
+                else:
+                    samples.append({"comments": seen, "comments_per_sec": round(seen / fit_seconds)})
+    if trace:
+        tracemalloc.stop()
+
+    return model, samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--comments", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=database.THEME_BATCH_SIZE)
+    parser.add_argument("--k", type=int, default=THEME_COUNT)
+    parser.add_argument("--rows", type=int, default=50000, help="Responses in the database")
+    args = parser.parse_args()
+
+    checkpoints = [n for n in (10000, 100000, 1000000, 10000000) if n < args.comments] + [args.comments]
+    model, throughput = stream(args.comments, args.batch_size, args.k, checkpoints)
+    _, memory = stream(args.comments, args.batch_size, args.k, checkpoints, trace=True)
+    results = {
+        "batch_size": args.batch_size,
+        "k": args.k,
+        "stream": {
+            "throughput": throughput,
+            "memory": memory,
+            "model_kb": round(len(model.to_bytes()) / 1024, 1),
+            "labels": model.labels()
+        }
+    }
+
+    with isolated_database():
+        seed_responses(generate_responses(args.rows, seed=0))
+
+        start = time.perf_counter()
+        assigned = database.update_themes(batch_size=args.batch_size)
+        catch_up = time.perf_counter() - start
+
+        responses = database.get_responses()
+        results["database"] = {
+            "rows": args.rows,
+            "comments_assigned": assigned,
+            "catch_up_sec": round(catch_up, 2),
+            "theme_summary": time_call(database.get_theme_summary),
+            "keyword_topics": time_call(analyze_sentiment, responses, repeat=1)
+        }
+
+    write_results("themes", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Integer timestamp benchmark.
+
+Seeds a database in time order, as check-ins arrive, then copies its
+responses into a table with the text timestamps pandas used to write (and
+no index, as before), and compares the two for date ranges of increasing
+length: range scans (responses per department, as get_response_counts
+counts them), loading the responses (get_filtered_responses, with the
+integer scan without its index in between) and turning the stored
+timestamps into datetime64. Also reports how long converting the text
+timestamps of an existing shard takes.
+
+    python -m benchmarks.bench_timestamps --rows 1000000
+"""
+import sqlite3
+import argparse
+import datetime
+import pandas as pd
+
+import database
+from benchmarks.common import isolated_database, seed_responses, time_call, write_results
+from demo_data import iter_responses
+
+# (name, days back from the latest response, department)
+RANGES = [
+    ("7_days", 7, None),
+    ("30_days", 30, None),
+    ("30_days_department", 30, "Engineering"),
+    ("365_days", 365, None)
+]
+
+def copy_with_text_timestamps(conn, table):
+    """Copy the responses into table with timestamps as pandas wrote them"""
+    for chunk in pd.read_sql_query("SELECT * FROM responses", conn, chunksize=100000):
+        chunk["timestamp"] = database.from_epoch(chunk["timestamp"])
+        chunk.to_sql(table, conn, if_exists="append", index=False)
+    conn.commit()
+
+def read_text(conn, start_date, end_date, department=None):
+    """The read path before integer timestamps: string comparisons and parsing"""
+    query = "SELECT * FROM responses_text WHERE timestamp >= ? AND timestamp <= ?"
+    params = [start_date, end_date]
+    if department:
+        query += " AND department = ?"
+        params.append(department)
+    return pd.read_sql_query(query, conn, params=params, parse_dates={"timestamp": {"format": "ISO8601"}})
+
+def count_text(conn, start_date, end_date):
+    """Responses per department, comparing text timestamps"""
+    return conn.execute(
+        "SELECT department, COUNT(*) FROM responses_text WHERE timestamp >= ? AND timestamp <= ? "
+        "GROUP BY department", (start_date, end_date)
+    ).fetchall()
+
+def read_unindexed(conn, start_date, end_date, department=None):
+    """Integer timestamps scanned without the index"""
+    query = "SELECT * FROM responses NOT INDEXED WHERE timestamp >= ? AND timestamp <= ?"
+    params = [database.to_epoch([start_date])[0].item(), database.to_epoch([end_date])[0].item()]
+    if department:
+        query += " AND department = ?"
+        params.append(department)
+    df = pd.read_sql_query(query, conn, params=params)
+    df["timestamp"] = database.from_epoch(df["timestamp"])
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {"rows": args.rows, "ranges": {}}
+    with isolated_database():
+        # Check-ins are stored in the order they arrive, so in time order
+        responses = pd.concat(iter_responses(args.rows, chunk_size=250000, seed=0), ignore_index=True)
+        responses = responses.sort_values("timestamp", kind="stable")
+        for offset in range(0, len(responses), 250000):
+            seed_responses(responses.iloc[offset:offset + 250000])
+        del responses
+
+        conn = sqlite3.connect(database.DB_PATH)
+        copy_with_text_timestamps(conn, "responses_text")
+        latest = database.from_epoch([conn.execute("SELECT MAX(timestamp) FROM responses").fetchone()[0]])[0]
+        end_date = datetime.datetime.combine(latest.date(), datetime.time.max)
+
+        for name, days, department in RANGES:
+            start_date = datetime.datetime.combine(latest.date() - datetime.timedelta(days=days - 1),
+                                                   datetime.time.min)
+            text = read_text(conn, start_date, end_date, department)
+            integer = database.get_filtered_responses(start_date, end_date, department)
+            if len(text) != len(integer) or not text["timestamp"].sort_values().reset_index(drop=True).equals(
+                    integer["timestamp"].sort_values().reset_index(drop=True)):
+                raise SystemExit(f"Text and integer timestamps select different rows for {name}")
+
+            results["ranges"][name] = {"rows": len(integer)}
+            if department is None:
+                results["ranges"][name]["count_by_department"] = {
+                    "text": time_call(count_text, conn, start_date, end_date, repeat=args.repeat),
+                    "integer": time_call(database.get_response_counts, ["department"], start_date, end_date,
+                                         repeat=args.repeat)
+                }
+            results["ranges"][name]["load"] = {
+                "text": time_call(read_text, conn, start_date, end_date, department, repeat=args.repeat),
+                "integer_unindexed": time_call(read_unindexed, conn, start_date, end_date, department,
+                                               repeat=args.repeat),
+                "integer": time_call(database.get_filtered_responses, start_date, end_date, department,
+                                     repeat=args.repeat)
+            }
+
+        # Turning every stored timestamp into datetime64
+        text = pd.Series([row[0] for row in conn.execute("SELECT timestamp FROM responses_text")])
+        integer = pd.Series([row[0] for row in conn.execute("SELECT timestamp FROM responses")])
+        results["materialize_timestamps"] = {
+            "text": time_call(pd.to_datetime, text, format="ISO8601", repeat=args.repeat),
+            "integer": time_call(database.from_epoch, integer, repeat=args.repeat)
+        }
+        del text, integer
+
+        # Converting an existing shard's text timestamps, as init_db does once
+        conn.execute("ALTER TABLE responses_text RENAME TO responses_converted")
+        copy = sqlite3.connect(database.DB_PATH.replace("responses.db", "converted.db"))
+        conn.close()
+        copy.execute(f"ATTACH DATABASE '{database.DB_PATH}' AS source")
+        copy.execute("CREATE TABLE responses AS SELECT * FROM source.responses_converted")
+        copy.commit()
+        results["convert_timestamps"] = time_call(database._convert_timestamps, copy, repeat=1)
+        copy.commit()
+        copy.close()
+
+    write_results("timestamps", results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+import database
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def percentile(values, p):
+    """Return the p-th percentile of a list of numbers (0 if empty)"""
+    if len(values) == 0:
+        return 0.0
+    return float(np.percentile(values, p))
+
+def time_call(fn, *args, repeat=5, **kwargs):
+    """Time repeated calls of fn and summarise the durations in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "min_ms": round(min(durations), 3),
+        "median_ms": round(float(np.median(durations)), 3),
+        "mean_ms": round(float(np.mean(durations)), 3),
+        "repeat": repeat
+    }
+
+def seed_responses(df, tenant=None):
+    """Bulk insert a DataFrame of responses into a tenant's database"""
+    database.save_responses(df, tenant=tenant)
+
+@contextmanager
+def isolated_database():
+    """Point the database module at a throwaway directory for the duration"""
+    original = (database.DB_PATH, database.TENANT_DIR)
+    directory = tempfile.mkdtemp(prefix="hurdl-bench-")
+
+    database.close_pools()
+    database.DB_PATH = os.path.join(directory, "responses.db")
+    database.TENANT_DIR = os.path.join(directory, "tenants")
+    try:
+        yield directory
+    finally:
+        database.close_pools()
+        database.DB_PATH, database.TENANT_DIR = original
+        shutil.rmtree(directory, ignore_errors=True)
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def write_results(name, results):
+    """Print benchmark results and write them as JSON keyed by git commit"""
+    commit = _git_commit()
+    payload = {
+        "benchmark": name,
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": pd.Timestamp.now().isoformat(),
+        "results": results
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{name}-{commit}.json")
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, default=str)
+
+    print(json.dumps(results, indent=2, default=str))
+    print(f"Results written to {path}")
+    return path
@@ -0,0 +1,142 @@
+"""
+End-to-end benchmark suite.
+
+Generates a synthetic dataset, loads it into a throwaway database and times
+the write path, the read paths, every analysis function in data_analysis
+and building each dashboard chart. Results are written as JSON; pass
+``--compare`` with an earlier results file to see regressions.
+
+    python -m benchmarks.run --rows 200000
+    python -m benchmarks.run --compare benchmarks/results/suite-abc1234.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import time
+import uuid
+
+import database
+from benchmarks.common import isolated_database, time_call, write_results
+from demo_data import generate_responses, iter_responses
+
+# Timings that got slower by more than this fraction are flagged
+REGRESSION_THRESHOLD = 0.10
+
+def bench_generator(rows):
+    start = time.perf_counter()
+    total = sum(len(chunk) for chunk in iter_responses(rows, seed=0))
+    return {"rows_per_sec": round(total / (time.perf_counter() - start), 1)}
+
+def bench_database(rows):
+    results = {}
+
+    start = time.perf_counter()
+    for chunk in iter_responses(rows, seed=0):
+        database.save_responses(chunk)
+    results["save_responses_rows_per_sec"] = round(rows / (time.perf_counter() - start), 1)
+
+    one = generate_responses(1, seed=1).iloc[0].to_dict()
+
+    def submit():
+        one["response_id"] = str(uuid.uuid4())
+        one["timestamp"] = datetime.datetime.now()
+        database.save_response(one)
+
+    last_month = datetime.datetime.now() - datetime.timedelta(days=30)
+    results["save_response"] = time_call(submit, repeat=50)
+    results["get_responses"] = time_call(database.get_responses, repeat=3)
+    results["get_filtered_responses_30d"] = time_call(database.get_filtered_responses, start_date=last_month, repeat=5)
+    results["get_filtered_responses_30d_department"] = time_call(
+        database.get_filtered_responses, start_date=last_month, department="Engineering", repeat=5
+    )
+    return results
+
+def bench_analysis(full_df, current_df, text_rows):
+    import data_analysis
+
+    text_df = current_df.head(text_rows)
+    return {
+        "calculate_wellbeing_index": time_call(data_analysis.calculate_wellbeing_index, current_df),
+        "calculate_psychological_safety": time_call(data_analysis.calculate_psychological_safety, current_df),
+        "calculate_workload_scores": time_call(lambda: data_analysis.calculate_workload_scores(current_df.copy())),
+        f"analyze_sentiment_{len(text_df)}_rows": time_call(data_analysis.analyze_sentiment, text_df, repeat=3),
+        "detect_trends": time_call(lambda: data_analysis.detect_trends(full_df, text_df), repeat=3)
+    }
+
+def bench_charts(current_df):
+    """Time building and serializing every dashboard chart (Streamlit bare mode)"""
+    import data_analysis
+    import visualization
+
+    # Bare mode logs a warning per Streamlit call
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    sentiment = data_analysis.analyze_sentiment(current_df.head(500))
+    workload = data_analysis.calculate_workload_scores(current_df.copy())
+
+    return {
+        "render_wellbeing_chart": time_call(lambda: visualization.render_wellbeing_chart(current_df.copy())),
+        "render_safety_chart": time_call(lambda: visualization.render_safety_chart(current_df.copy())),
+        "render_workload_heatmap": time_call(lambda: visualization.render_workload_heatmap(current_df.copy(), workload)),
+        "render_sentiment_chart": time_call(lambda: visualization.render_sentiment_chart(current_df, sentiment))
+    }
+
+def compare(results, baseline):
+    """Print the change of every timing against earlier results"""
+    def timings(tree, prefix=""):
+        for key, value in tree.items():
+            if isinstance(value, dict) and "median_ms" in value:
+                yield prefix + key, value["median_ms"]
+            elif isinstance(value, dict):
+                yield from timings(value, prefix + key + ".")
+
+    old = dict(timings(baseline))
+    regressions = []
+    for name, median in timings(results):
+        if name not in old or not old[name]:
+            continue
+        change = (median - old[name]) / old[name]
+        flag = "  REGRESSION" if change > REGRESSION_THRESHOLD else ""
+        print(f"{name:60s} {old[name]:10.2f} -> {median:10.2f} ms ({change:+.0%}){flag}")
+        if flag:
+            regressions.append(name)
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--text-rows", type=int, default=2000,
+                        help="rows passed to analyze_sentiment (TextBlob is slow)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    # Read the baseline first: it may be the file this run overwrites
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = {"rows": args.rows, "generator": bench_generator(args.rows)}
+
+    with isolated_database():
+        results["database"] = bench_database(args.rows)
+
+        full_df = database.get_responses()
+        last_month = full_df["timestamp"].max() - datetime.timedelta(days=30)
+        current_df = full_df[full_df["timestamp"] >= last_month]
+        results["current_period_rows"] = len(current_df)
+
+        results["analysis"] = bench_analysis(full_df, current_df, args.text_rows)
+        results["charts"] = bench_charts(current_df)
+
+    write_results("suite", results)
+
+    if baseline is not None:
+        regressions = compare(results, baseline)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} timings regressed by more than {REGRESSION_THRESHOLD:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,19 @@
 import pandas as pd
 import numpy as np
-from textblob import TextBlob
-import re
-from datetime import datetime, timedelta
+from datetime import timedelta
+from survey_questions import get_metric_columns, get_question_columns
+from instrumentation import span, traced
+from privacy import group_means, protect, suppression_mask
+from text_processing import count_topics, tokenize
 
+@traced("analysis")
 def calculate_wellbeing_index(df):
     """
     Calculate overall wellbeing index from survey responses.
     Scale of 1-5, with 5 being the best.
     """
-    # Questions related to wellbeing (adjust based on actual questions)
-    wellbeing_questions = ["q_1", "q_2", "q_3", "q_4"]
+    # Questions related to wellbeing
+    wellbeing_questions = get_metric_columns("wellbeing")
     
     # Check if we have these columns
     available_questions = [q for q in wellbeing_questions if q in df.columns]
@@ -24,13 +27,14 @@ def calculate_wellbeing_index(df):
     
     return overall_wellbeing
 
+@traced("analysis")
 def calculate_psychological_safety(df):
     """
     Calculate psychological safety score from survey responses.
     Scale of 1-5, with 5 being the best.
     """
-    # Questions related to psychological safety (adjust based on actual questions)
-    safety_questions = ["q_5", "q_6", "q_7", "q_8"]
+    # Questions related to psychological safety
+    safety_questions = get_metric_columns("safety")
     
     # Check if we have these columns
     available_questions = [q for q in safety_questions if q in df.columns]
@@ -44,13 +48,19 @@ def calculate_psychological_safety(df):
     
     return overall_safety
 
-def analyze_sentiment(df):
+@traced("analysis")
+def analyze_sentiment(df, text_counts=None):
     """
     Analyze sentiment from text responses.
     Returns sentiment scores and analysis.
+    text_counts, the common words and topics of the same responses as
+    precomputed by database.get_text_summary, saves tokenizing every answer.
     """
-    # Questions with text responses (adjust based on actual questions)
-    text_questions = ["q_9", "q_10"]
+    # TextBlob is slow to import, so only load it when sentiment is needed
+    from textblob import TextBlob
+    
+    # Questions with text responses
+    text_questions = get_question_columns("text")
     
     # Check if we have these columns
     available_questions = [q for q in text_questions if q in df.columns]
@@ -80,13 +90,14 @@ def analyze_sentiment(df):
         
         # Calculate sentiment for each response
         sentiments = []
-        for response in responses:
-            if isinstance(response, str) and response.strip():
-                blob = TextBlob(response)
-                # Convert from -1 to 1 scale to 1 to 5 scale
-                sentiment = (blob.sentiment.polarity + 1) * 2 + 1
-                sentiments.append(sentiment)
-                all_text.append(response)
+        with span("textblob_polarity", "analysis"):
+            for response in responses:
+                if isinstance(response, str) and response.strip():
+                    blob = TextBlob(response)
+                    # Convert from -1 to 1 scale to 1 to 5 scale
+                    sentiment = (blob.sentiment.polarity + 1) * 2 + 1
+                    sentiments.append(sentiment)
+                    all_text.append(response)
         
         if sentiments:
             avg_sentiment = sum(sentiments) / len(sentiments)
@@ -99,14 +110,13 @@ def analyze_sentiment(df):
         sentiment_results["overall"] = sum(sentiment_results["questions"].values()) / len(sentiment_results["questions"])
     
     # Extract common words and topics
-    if all_text:
-        # Combine all text
-        combined_text = " ".join(all_text).lower()
-        
-        # Remove common stop words
-        stop_words = ["the", "and", "i", "to", "a", "is", "in", "that", "it", "of", "for", "this", "with", "on", "be", "are"]
-        words = re.findall(r'\b\w+\b', combined_text)
-        words = [word for word in words if word not in stop_words and len(word) > 2]
+    if all_text and text_counts is not None:
+        sentiment_results["common_words"] = text_counts["common_words"]
+        sentiment_results["topics"] = text_counts["topics"]
+    
+    elif all_text:
+        # Same words as the theme clustering: lowercase, no stop words
+        words = [word for text in all_text for word in tokenize(text)]
         
         # Count word frequencies
         word_counts = {}
@@ -118,23 +128,18 @@ def analyze_sentiment(df):
         sentiment_results["common_words"] = dict(top_words)
         
         # Identify potential topics based on common words
-        topics = {
-            "workload": sum(1 for word in words if word in ["work", "workload", "busy", "overwork", "stress", "deadline", "time"]),
-            "team": sum(1 for word in words if word in ["team", "colleague", "coworker", "collaboration", "together"]),
-            "management": sum(1 for word in words if word in ["manager", "management", "leadership", "supervisor", "boss"]),
-            "growth": sum(1 for word in words if word in ["growth", "learning", "development", "progress", "career"])
-        }
-        
-        sentiment_results["topics"] = topics
+        sentiment_results["topics"] = count_topics(words)
     
     return sentiment_results
 
-def calculate_workload_scores(df):
+@traced("analysis")
+def calculate_workload_scores(df, min_group_size=None):
     """
-    Calculate workload scores by department and location.
+    Calculate workload scores by department and location, optionally
+    limited to groups of min_group_size (see privacy.protect).
     """
-    # Questions related to workload (adjust based on actual questions)
-    workload_questions = ["q_3", "q_7"]
+    # Questions related to workload
+    workload_questions = get_metric_columns("workload")
     
     # Check if we have these columns
     available_questions = [q for q in workload_questions if q in df.columns]
@@ -150,13 +155,13 @@ def calculate_workload_scores(df):
     # Calculate average workload score per response
     df['workload_score'] = df[available_questions].mean(axis=1)
     
-    # Group by department
-    dept_workload = df.groupby('department')['workload_score'].mean().reset_index()
+    # Group by department (means and group sizes in one groupby)
+    dept_workload = group_means(df, 'department', ['workload_score'], k=min_group_size)[['department', 'workload_score']]
     dept_workload.columns = ['category', 'score']
     dept_workload['type'] = 'department'
     
     # Group by location
-    loc_workload = df.groupby('location')['workload_score'].mean().reset_index()
+    loc_workload = group_means(df, 'location', ['workload_score'], k=min_group_size)[['location', 'workload_score']]
     loc_workload.columns = ['category', 'score']
     loc_workload['type'] = 'location'
     
@@ -169,10 +174,12 @@ def calculate_workload_scores(df):
         "overall": overall_workload
     }
 
-def detect_trends(full_df, current_df):
+@traced("analysis")
+def detect_trends(full_df, current_df, min_group_size=None):
     """
     Detect trends in the data by comparing current period to previous periods.
-    Returns alerts and trend information.
+    Returns alerts and trend information. With min_group_size, only the
+    periods and departments privacy.protect keeps are compared.
     """
     # Ensure we have timestamp column
     if 'timestamp' not in full_df.columns:
@@ -199,6 +206,10 @@ def detect_trends(full_df, current_df):
     if len(previous_df) == 0:
         return []
     
+    # Too few previous responses to report on anonymously
+    if min_group_size and len(previous_df) < min_group_size:
+        return []
+    
     trends = []
     
     # Compare wellbeing index
@@ -249,7 +260,19 @@ def detect_trends(full_df, current_df):
     # Check for department-specific trends
     departments = current_df['department'].unique()
     
+    # Departments too small to report on in either period (or whose values
+    # could be worked out from the totals above)
+    hidden = set()
+    if min_group_size:
+        for period_df in (current_df, previous_df):
+            counts = period_df['department'].value_counts()
+            mask = suppression_mask(counts.to_numpy(), [counts.index.to_numpy()], min_group_size)
+            hidden.update(counts.index[mask])
+    
     for dept in departments:
+        if dept in hidden:
+            continue
+        
         dept_current = current_df[current_df['department'] == dept]
         dept_previous = previous_df[previous_df['department'] == dept]
         
@@ -272,3 +295,194 @@ def detect_trends(full_df, current_df):
                 })
     
     return trends
+
+# Maximum number of points sent to the browser per chart
+MAX_CHART_POINTS = 500
+
+def choose_time_bin(start_date, end_date):
+    """
+    Choose the time bin for trend charts from the length of the date range.
+    Daily bins up to about four months, weekly up to two years, then monthly.
+    """
+    days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days
+    
+    if days <= 120:
+        return "day"
+    if days <= 730:
+        return "week"
+    return "month"
+
+def bin_scores(df, metrics, freq="day", by=None, min_group_size=None):
+    """
+    Average metric scores per time bin from raw responses.
+    Same output as database.get_binned_scores, for callers that already hold
+    the responses in memory.
+    """
+    if 'timestamp' not in df.columns or len(df) == 0:
+        return pd.DataFrame()
+    
+    periods = {"day": "D", "week": "W-SUN", "month": "M"}
+    binned = pd.DataFrame({"period": df['timestamp'].dt.to_period(periods[freq]).dt.start_time})
+    if by:
+        binned[by] = df[by]
+    
+    for metric in metrics:
+        columns = [q for q in get_metric_columns(metric) if q in df.columns]
+        if columns:
+            binned[f"{metric}_score"] = df[columns].mean(axis=1)
+    
+    group_columns = ["period"] + ([by] if by else [])
+    grouped = binned.groupby(group_columns)
+    result = grouped.mean().reset_index()
+    result["responses"] = grouped.size().to_numpy()
+    
+    return protect(result, group_columns, k=min_group_size)
+
+def lttb_downsample(df, x, y, threshold):
+    """
+    Downsample a line to at most threshold points with the
+    Largest-Triangle-Three-Buckets algorithm, which keeps the visual shape
+    (peaks and dips) of the series. df must be sorted by x.
+    """
+    df = df.dropna(subset=[y])
+    n = len(df)
+    
+    if threshold >= n or threshold < 3:
+        return df
+    
+    xs = df[x].to_numpy()
+    if np.issubdtype(xs.dtype, np.datetime64):
+        xs = xs.astype("datetime64[s]").astype(np.int64)
+    xs = xs.astype(float)
+    ys = df[y].to_numpy(dtype=float)
+    
+    # First and last points are always kept; the rest is split into buckets
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = xs[next_start:next_end].mean()
+        avg_y = ys[next_start:next_end].mean()
+        
+        # Pick the point in this bucket forming the largest triangle
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        areas = np.abs(
+            (xs[a] - avg_x) * (ys[start:end] - ys[a])
+            - (xs[a] - xs[start:end]) * (avg_y - ys[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected.append(a)
+    
+    selected.append(n - 1)
+    return df.iloc[selected]
+
+def downsample_series(df, x, y, max_points=MAX_CHART_POINTS, by=None):
+    """
+    Cap the number of points in a line chart, sharing the budget evenly
+    between the lines when the chart has one line per group (by).
+    """
+    if len(df) <= max_points:
+        return df
+    
+    if not by:
+        return lttb_downsample(df.sort_values(x), x, y, max_points)
+    
+    groups = df.groupby(by, sort=False)
+    per_line = max(3, max_points // max(groups.ngroups, 1))
+    
+    return pd.concat(
+        [lttb_downsample(group.sort_values(x), x, y, per_line) for _, group in groups],
+        ignore_index=True
+    )
+
+def cube_scores(cube, metric, dimensions=(), min_group_size=None):
+    """
+    Metric scores from rolled-up cube cells (see database.get_cube).
+    Returns the dimensions plus <metric>_score (mean of all answers to the
+    metric's questions), <metric>_std and answers, computed from the cells'
+    counts, sums and sums of squares without touching individual responses.
+    For min_group_size see privacy.protect.
+    """
+    dimensions = list(dimensions)
+    score = f"{metric}_score"
+    
+    cells = cube[cube["question"].isin(get_metric_columns(metric))]
+    if cells.empty:
+        return pd.DataFrame(columns=dimensions + [score, f"{metric}_std", "answers"])
+    
+    if dimensions:
+        totals = cells.groupby(dimensions)[["n", "total", "total_sq"]].sum().reset_index()
+    else:
+        totals = cells[["n", "total", "total_sq"]].sum().to_frame().T
+    
+    n = totals["n"].astype(float)
+    totals[score] = totals["total"] / n
+    # Sample variance from the running sums: (sum(x^2) - sum(x)^2 / n) / (n - 1)
+    variance = (totals["total_sq"] - totals["total"] ** 2 / n) / (n - 1).where(n > 1)
+    totals[f"{metric}_std"] = np.sqrt(variance.clip(lower=0))
+    totals["answers"] = totals["n"].astype(int)
+    
+    if min_group_size:
+        # Cells count answers; a group's responses are those to its most
+        # answered question
+        per_question = cells.groupby(dimensions + ["question"])["n"].sum()
+        if dimensions:
+            responses = per_question.groupby(level=dimensions).max()
+            totals["responses"] = responses.reindex(pd.MultiIndex.from_frame(totals[dimensions])).to_numpy()
+        else:
+            totals["responses"] = per_question.max()
+        totals = protect(totals, dimensions, k=min_group_size)
+    
+    return totals[dimensions + [score, f"{metric}_std", "answers"]]
+
+# Weeks shown by default in the week-over-week view
+COHORT_WEEKS = 12
+
+def cohort_matrix(cube, metric, end_date, weeks=COHORT_WEEKS, min_group_size=None):
+    """
+    Week-over-week scores of every department for the last weeks weeks up
+    to end_date, from cube cells rolled up to department and week (see
+    database.get_cube), including the week before the first shown.
+    Returns one row per department and week with <metric>_score, answers
+    and change (the score minus the department's score the week before),
+    from one grouped pass over the cells and a pivot, however many weeks
+    and departments there are. Weeks without answers (or hidden by
+    min_group_size) have no score or change.
+    """
+    score = f"{metric}_score"
+    columns = ["department", "week", score, "change", "answers"]
+    
+    scores = cube_scores(cube, metric, ["department", "week"], min_group_size=min_group_size)
+    if scores.empty:
+        return pd.DataFrame(columns=columns)
+    
+    # Every week in range, so weeks without answers leave gaps instead of
+    # being skipped over by the change
+    end = pd.Timestamp(end_date).normalize()
+    last_week = end - pd.Timedelta(days=end.dayofweek)
+    all_weeks = pd.date_range(last_week - pd.Timedelta(weeks=weeks), last_week, freq="7D")
+    
+    scores["week"] = pd.to_datetime(scores["week"])
+    matrix = scores.pivot(index="department", columns="week", values=score).reindex(columns=all_weeks)
+    answers = scores.pivot(index="department", columns="week", values="answers").reindex(columns=all_weeks)
+    change = matrix.diff(axis=1)
+    
+    # Drop the week before the first, which only feeds its change
+    shown = matrix.iloc[:, 1:].to_numpy()
+    departments = matrix.index.to_numpy()
+    cohorts = pd.DataFrame({
+        "department": np.repeat(departments, weeks),
+        "week": np.tile(all_weeks[1:], len(departments)),
+        score: shown.ravel(),
+        "change": change.iloc[:, 1:].to_numpy().ravel(),
+        "answers": answers.iloc[:, 1:].to_numpy().ravel()
+    })
+    
+    # Departments with nothing to show in the weeks shown
+    has_scores = np.repeat(~np.isnan(shown).all(axis=1), weeks)
+    return cohorts[has_scores].reset_index(drop=True)[columns]
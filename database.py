@@ -1,107 +1,1821 @@
 import sqlite3
 import os
+import re
+import time
+import argparse
+import queue
+import random
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+from survey_questions import CURRENT_SURVEY_VERSION, get_column_types, get_metric_columns, get_question_columns
+from instrumentation import span, traced
+from sketches import HyperLogLog, KLLSketch, hash_values
+from metrics import (SAVE_RESPONSE_SECONDS, DB_WRITE_RETRIES, THEME_UPDATE_ERRORS, THEME_UPDATE_SECONDS,
+                     FORECAST_UPDATE_ERRORS)
+from privacy import protect, suppression_mask
+from text_processing import LEXICON_VERSION, TOPIC_LEXICON, ThemeModel, tokenize
+from forecasting import FORECAST_METRICS, FORECAST_WEEKS, HoltModel, weekly_scores
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks (Windows): writers from different processes then rely
+    # on SQLite's busy timeout alone
+    fcntl = None
 
 # Database setup
 DB_PATH = "data/responses.db"
 
-def init_db():
-    """Initialize the database and create necessary tables if they don't exist"""
-    # Make sure data directory exists
-    if not os.path.exists("data"):
+# Each tenant (client organisation) gets its own database file so that one
+# tenant's writes and scans never contend with another tenant's
+TENANT_DIR = "data/tenants"
+DEFAULT_TENANT = "default"
+
+# Number of idle connections kept open per tenant shard
+POOL_SIZE = int(os.environ.get("HURDL_DB_POOL_SIZE", "4"))
+
+# How long a connection waits for another connection's write lock before
+# failing with "database is locked"
+BUSY_TIMEOUT_MS = int(os.environ.get("HURDL_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Journal mode set on every shard. In WAL mode readers never block the
+# writer and vice versa, so dashboards reading while employees submit
+# don't stall each other; use "delete" on filesystems without shared
+# memory support (e.g. network mounts).
+JOURNAL_MODE = os.environ.get("HURDL_DB_JOURNAL_MODE", "wal")
+JOURNAL_MODES = ("wal", "delete", "truncate", "persist")
+
+# Writes that still find the database locked after the busy timeout are
+# retried this many times, with jittered exponential backoff
+WRITE_RETRIES = int(os.environ.get("HURDL_DB_WRITE_RETRIES", "3"))
+RETRY_BACKOFF_SECONDS = 0.05
+RETRY_BACKOFF_MAX_SECONDS = 1.0
+
+# Storage layout for newly created shards. "wide" keeps one column per
+# question; "long" keeps one row per answer in the answers table, so a new
+# question never needs a schema change. Existing shards keep their layout.
+STORAGE_LAYOUT = os.environ.get("HURDL_STORAGE_LAYOUT", "wide")
+
+# Columns every response has regardless of the survey questions
+BASE_COLUMNS = ["response_id", "timestamp", "department", "location", "survey_version"]
+
+# Timestamps are stored as integer microseconds since 1970-01-01 (of the
+# naive local time responses are recorded in), so range filters compare
+# integers through an index and reads turn the column into datetime64
+# without parsing any text. SQL date functions take it as seconds.
+TIMESTAMP_UNIT = "us"
+TIMESTAMP_SECONDS = "timestamp / 1000000"
+TIMESTAMP_INDEX_SQL = "CREATE INDEX IF NOT EXISTS responses_timestamp ON responses (timestamp)"
+
+# Responses saved before survey versions were recorded all answered version 1
+SURVEY_VERSION_COLUMN_SQL = "survey_version INTEGER DEFAULT 1"
+
+ANSWERS_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS answers (
+    response_id TEXT,
+    question TEXT,
+    value_num REAL,
+    value_text TEXT,
+    PRIMARY KEY (response_id, question)
+) WITHOUT ROWID
+'''
+
+# Pre-aggregated (department, location, ISO week) cube of the scale
+# questions. Each cell keeps the count, sum and sum of squares of a
+# question's answers, so means and variances of any roll-up come from
+# summing cells instead of scanning responses.
+CUBE_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS response_cube (
+    department TEXT,
+    location TEXT,
+    week TEXT,
+    question TEXT,
+    n INTEGER,
+    total REAL,
+    total_sq REAL,
+    PRIMARY KEY (department, location, week, question)
+) WITHOUT ROWID
+'''
+
+CUBE_DIMENSIONS = ["department", "location", "week"]
+
+# Monday of the timestamp's ISO week, as YYYY-MM-DD
+WEEK_EXPRESSION = f"date({TIMESTAMP_SECONDS}, 'unixepoch', 'weekday 0', '-6 days')"
+
+# Cube cells for responses without a department or location
+UNKNOWN_DIMENSION = "Unknown"
+
+# Mergeable sketches per (department, location, day): a KLL quantile sketch
+# of each metric's per-response score and a HyperLogLog of check-in
+# sessions. Medians, percentiles and distinct sessions over any filter range
+# come from merging the cells' sketches.
+SKETCH_TABLE_SQL = '''
+CREATE TABLE IF NOT EXISTS response_sketches (
+    department TEXT,
+    location TEXT,
+    day TEXT,
+    name TEXT,
+    sketch BLOB,
+    PRIMARY KEY (department, location, day, name)
+) WITHOUT ROWID
+'''
+
+SKETCH_METRICS = ["wellbeing", "safety", "workload"]
+RESPONDENTS_SKETCH = "respondents"
+
+# Optional token of the browser session a response was submitted from. It
+# only feeds the sessions sketch (stored under the name "respondents", as a
+# hash) and is never stored with the responses. A session is not a person:
+# an employee who checks in on several visits is counted once per visit.
+RESPONDENT_COLUMN = "respondent"
+
+# Change feed: a counter bumped by triggers on every insert, update or
+# delete of a response, in the writing transaction. Caches key their
+# entries on it, so they miss as soon as the data changes and never
+# otherwise, whichever process or tool made the change.
+DATA_VERSION_SQL = '''
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+)
+'''
+
+DATA_VERSION_TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS responses_{event.lower()}_version AFTER {event} ON responses "
+    "BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END"
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+# Word and topic mention counts of the comments per (day, department,
+# location), so the dashboard's common words and topics for any range sum
+# a few small cells instead of tokenizing every comment. Keyed by day
+# first, as every dashboard query has a date range.
+TERM_COUNTS_SQL = '''
+CREATE TABLE IF NOT EXISTS term_counts (
+    day TEXT,
+    department TEXT,
+    location TEXT,
+    term TEXT,
+    n INTEGER,
+    PRIMARY KEY (day, department, location, term)
+) WITHOUT ROWID
+'''
+
+TOPIC_COUNTS_SQL = '''
+CREATE TABLE IF NOT EXISTS topic_counts (
+    day TEXT,
+    department TEXT,
+    location TEXT,
+    topic TEXT,
+    n INTEGER,
+    PRIMARY KEY (day, department, location, topic)
+) WITHOUT ROWID
+'''
+
+# Full-text index of the free-text answers (porter stemming, so "deadline"
+# also finds "deadlines"), one row per non-blank comment, written in the
+# same transaction as the response. A comment's rowid is its response's
+# rowid * COMMENT_SLOTS + the question's position, so filters join the
+# responses on their integer rowid.
+COMMENT_INDEX_SQL = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS comment_index USING fts5(
+    question UNINDEXED,
+    text,
+    tokenize = 'porter unicode61'
+)
+'''
+
+# Text questions a response can have comments for
+COMMENT_SLOTS = 16
+
+# Search results per dashboard page
+SEARCH_PAGE_SIZE = 20
+
+# Themes discovered in the free-text answers (see text_processing): the
+# theme of every clustered comment, and the model with the rowid of the
+# last response folded into it
+COMMENT_THEMES_SQL = '''
+CREATE TABLE IF NOT EXISTS comment_themes (
+    response_id TEXT,
+    question TEXT,
+    theme INTEGER,
+    PRIMARY KEY (response_id, question)
+) WITHOUT ROWID
+'''
+
+THEME_STATE_SQL = '''
+CREATE TABLE IF NOT EXISTS theme_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_rowid INTEGER NOT NULL,
+    model BLOB
+)
+'''
+
+# Responses clustered per mini-batch. Check-ins start a background update
+# once a batch is waiting, unless HURDL_THEME_UPDATES is 0 (then comments
+# are only clustered by update_themes)
+THEME_BATCH_SIZE = int(os.environ.get("HURDL_THEME_BATCH_SIZE", "256"))
+THEME_UPDATES = os.environ.get("HURDL_THEME_UPDATES", "1") != "0"
+
+# Each metric's department forecast model (see forecasting), with the
+# Monday of the last week folded into it (NULL before the first update).
+# Check-ins start a background update once a week has closed, unless
+# HURDL_FORECAST_UPDATES is 0 (then forecasts are only updated by
+# update_forecasts)
+FORECAST_UPDATES = os.environ.get("HURDL_FORECAST_UPDATES", "1") != "0"
+FORECAST_STATE_SQL = '''
+CREATE TABLE IF NOT EXISTS forecast_state (
+    metric TEXT PRIMARY KEY,
+    last_week TEXT,
+    model BLOB
+)
+'''
+
+class DatabaseBusyError(sqlite3.OperationalError):
+    """A write found the database locked on every attempt"""
+
+TENANT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# One background thread clusters comments, for one shard at a time
+_theme_executor = None
+_theme_jobs = set()
+_theme_lock = threading.Lock()
+
+# and another folds newly closed weeks into the forecasts
+_forecast_executor = None
+_forecast_jobs = set()
+_forecast_lock = threading.Lock()
+# Shard path -> the last closed week its forecasts were found to include,
+# so check-ins only look at forecast_state once a week
+_forecast_weeks = {}
+
+class ConnectionPool:
+    """A small pool of SQLite connections to one database shard"""
+
+    def __init__(self, path, layout="wide", size=POOL_SIZE):
+        self.path = path
+        self.layout = layout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._write_lock = threading.Lock()
+
+    def _open(self):
+        # Streamlit runs each session in its own thread, so pooled
+        # connections must be usable from whichever thread borrows them
+        return sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, returning it to the pool afterwards"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+
         try:
-            os.makedirs("data")
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def write_lock(self):
+        """
+        Queue for the shard's write lock. SQLite allows one writer at a time
+        and its busy handler polls with growing sleeps, so under load some
+        writers wait seconds while others get straight in. Waiting here, on
+        a thread lock and a file lock shared with other processes, hands
+        the lock over as soon as it is free.
+        """
+        with self._write_lock:
+            if fcntl is None:
+                yield
+                return
+
+            with open(f"{self.path}.write-lock", "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def close(self):
+        """Close every idle connection in the pool"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+def get_db_path(tenant=None):
+    """Route a tenant to the database file holding its responses"""
+    if tenant is None or tenant == DEFAULT_TENANT:
+        return DB_PATH
+
+    # Tenant names become file names, so only allow a safe character set
+    if not TENANT_NAME_PATTERN.match(tenant):
+        raise ValueError(f"Invalid tenant name: {tenant!r}")
+
+    return os.path.join(TENANT_DIR, f"{tenant}.db")
+
+def list_tenants():
+    """List every tenant that has a database shard"""
+    tenants = []
+
+    if os.path.exists(DB_PATH):
+        tenants.append(DEFAULT_TENANT)
+
+    if os.path.isdir(TENANT_DIR):
+        tenants += sorted(name[:-3] for name in os.listdir(TENANT_DIR) if name.endswith(".db"))
+
+    return tenants
+
+def tenant_exists(tenant=None):
+    """Whether a tenant already has a database shard, without creating one"""
+    return os.path.exists(get_db_path(tenant))
+
+def get_pool(tenant=None):
+    """Get the connection pool for a tenant, creating its shard on first use"""
+    path = get_db_path(tenant)
+    pool = _pools.get(path)
+
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                layout = init_db(tenant)
+                pool = ConnectionPool(path, layout)
+                _pools[path] = pool
+
+    return pool
+
+def close_pools():
+    """Close all pooled connections (e.g. before deleting shard files)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+    _forecast_weeks.clear()
+
+def init_db(tenant=None):
+    """
+    Initialize the database and create necessary tables if they don't exist.
+
+    This is called by get_pool the first time a process touches a shard, so
+    it runs once per process per shard rather than on import.
+
+    Question columns come from the survey definition. Questions added since
+    the shard was created are added with ALTER TABLE ... ADD COLUMN, which
+    only touches the schema and never rewrites existing rows.
+    Returns the shard's storage layout.
+    """
+    path = get_db_path(tenant)
+
+    # Make sure the shard's directory exists
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        try:
+            os.makedirs(directory)
         except FileExistsError:
             pass
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    # Create responses table with dynamic columns for all questions
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS responses (
-        response_id TEXT PRIMARY KEY,
-        timestamp TIMESTAMP,
-        department TEXT,
-        location TEXT,
-        q_1 INTEGER,
-        q_2 INTEGER,
-        q_3 INTEGER,
-        q_4 INTEGER,
-        q_5 INTEGER,
-        q_6 INTEGER,
-        q_7 INTEGER,
-        q_8 INTEGER,
-        q_9 TEXT,
-        q_10 TEXT
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        if JOURNAL_MODE not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode: {JOURNAL_MODE!r}")
+
+        # Persistent for WAL; can't be changed inside a transaction
+        conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}")
+
+        with conn:
+            layout = _init_layout(conn)
+
+            # Create responses table with dynamic columns for all questions
+            columns = ["response_id TEXT PRIMARY KEY", "timestamp INTEGER", "department TEXT", "location TEXT",
+                       SURVEY_VERSION_COLUMN_SQL]
+            if layout == "wide":
+                columns += [f"{col} {col_type}" for col, col_type in get_column_types().items()]
+
+            conn.execute(f"CREATE TABLE IF NOT EXISTS responses ({', '.join(columns)})")
+
+            if layout == "long":
+                conn.execute(ANSWERS_TABLE_SQL)
+
+            migrate_schema(conn, layout)
+
+            # Shards written before integer timestamps get theirs converted
+            # once, before anything below reads them
+            converted = conn.execute("SELECT 1 FROM schema_meta WHERE key = 'timestamp_unit'").fetchone()
+            if not converted:
+                _convert_timestamps(conn)
+                conn.execute("INSERT INTO schema_meta (key, value) VALUES ('timestamp_unit', ?)", (TIMESTAMP_UNIT,))
+            conn.execute(TIMESTAMP_INDEX_SQL)
+
+            # Shards created before the change feed start counting from
+            # their highest rowid, the fingerprint used until then
+            conn.execute(DATA_VERSION_SQL)
+            conn.execute(
+                "INSERT OR IGNORE INTO data_version (id, version) "
+                "SELECT 1, COALESCE(MAX(rowid), 0) FROM responses"
+            )
+            for trigger in DATA_VERSION_TRIGGERS:
+                conn.execute(trigger)
+
+            # Shards created before the cube existed get it built once
+            has_cube = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'response_cube'"
+            ).fetchone()
+            if not has_cube:
+                conn.execute(CUBE_TABLE_SQL)
+                _build_cube(conn, layout)
+
+            has_sketches = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'response_sketches'"
+            ).fetchone()
+            if not has_sketches:
+                conn.execute(SKETCH_TABLE_SQL)
+                _build_sketches(conn, layout)
+
+            has_text_counts = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'term_counts'"
+            ).fetchone()
+            if not has_text_counts:
+                conn.execute(TERM_COUNTS_SQL)
+                conn.execute(TOPIC_COUNTS_SQL)
+                _build_text_counts(conn, layout)
+
+            has_comment_index = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'comment_index'"
+            ).fetchone()
+            if not has_comment_index:
+                conn.execute(COMMENT_INDEX_SQL)
+                _build_comment_index(conn, layout)
+
+            # Existing comments are clustered by the first theme update
+            conn.execute(COMMENT_THEMES_SQL)
+            conn.execute(THEME_STATE_SQL)
+            conn.execute("INSERT OR IGNORE INTO theme_state (id, last_rowid) VALUES (1, 0)")
+
+            # Forecasts are fitted by their first update
+            conn.execute(FORECAST_STATE_SQL)
+            conn.executemany("INSERT OR IGNORE INTO forecast_state (metric) VALUES (?)",
+                             [(metric,) for metric in FORECAST_METRICS])
+    finally:
+        conn.close()
+
+    return layout
+
+def _init_layout(conn):
+    """Read the shard's storage layout, recording it for new shards"""
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    row = conn.execute("SELECT value FROM schema_meta WHERE key = 'layout'").fetchone()
+    if row:
+        return row[0]
+
+    # Shards created before layouts existed are always wide
+    existing = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'responses'"
+    ).fetchone()
+    layout = "wide" if existing else STORAGE_LAYOUT
+
+    if layout not in ("wide", "long"):
+        raise ValueError(f"Unknown storage layout: {layout!r}")
+
+    conn.execute("INSERT INTO schema_meta (key, value) VALUES ('layout', ?)", (layout,))
+    return layout
+
+def migrate_schema(conn, layout="wide"):
+    """Add columns for any survey questions missing from a wide responses table"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+    added = []
+
+    # A constant default, so old rows read as version 1 without a rewrite
+    if "survey_version" not in existing:
+        conn.execute(f"ALTER TABLE responses ADD COLUMN {SURVEY_VERSION_COLUMN_SQL}")
+        added.append("survey_version")
+
+    if layout != "wide":
+        # In the long layout a new question is just a new value in answers.question
+        return added
+
+    for col, col_type in get_column_types().items():
+        if col not in existing:
+            conn.execute(f"ALTER TABLE responses ADD COLUMN {col} {col_type}")
+            added.append(col)
+
+    return added
+
+def to_epoch(values):
+    """Timestamps (datetimes or ISO 8601 strings) as stored integers"""
+    return pd.to_datetime(values, format="ISO8601").to_numpy().astype(f"datetime64[{TIMESTAMP_UNIT}]").astype(np.int64)
+
+def from_epoch(values):
+    """Stored integer timestamps as datetime64, without parsing"""
+    return pd.to_datetime(values, unit=TIMESTAMP_UNIT)
+
+def _epoch_param(value):
+    """A datetime, date or string filter bound as a stored integer timestamp"""
+    return int(to_epoch([pd.Timestamp(value)])[0])
+
+def _convert_timestamps(conn, chunksize=100000):
+    """Rewrite text timestamps (as pandas wrote them) as integers"""
+    last = 0
+    while True:
+        rows = conn.execute(
+            "SELECT rowid, timestamp FROM responses WHERE rowid > ? ORDER BY rowid LIMIT ?", (last, chunksize)
+        ).fetchall()
+        if not rows:
+            break
+
+        rowids, timestamps = zip(*rows)
+        last = rowids[-1]
+        text = [i for i, value in enumerate(timestamps) if isinstance(value, str)]
+        if text:
+            stored = to_epoch([timestamps[i] for i in text]).tolist()
+            conn.executemany("UPDATE responses SET timestamp = ? WHERE rowid = ?",
+                             zip(stored, [rowids[i] for i in text]))
+
+def convert_to_long_layout(tenant=None):
+    """
+    Move a wide shard's answers into the long answers table.
+
+    This rewrites every row, so run it while the app is stopped.
+    """
+    pool = get_pool(tenant)
+    if pool.layout == "long":
+        return
+
+    numeric_columns = set(get_question_columns("scale"))
+
+    with pool.connection() as conn:
+        with conn:
+            conn.execute(ANSWERS_TABLE_SQL)
+            existing = [row[1] for row in conn.execute("PRAGMA table_info(responses)")]
+
+            for col in existing:
+                if col in BASE_COLUMNS:
+                    continue
+
+                target = "value_num" if col in numeric_columns else "value_text"
+                conn.execute(
+                    f"INSERT INTO answers (response_id, question, {target}) "
+                    f"SELECT response_id, ?, {col} FROM responses WHERE {col} IS NOT NULL",
+                    (col,)
+                )
+                conn.execute(f"ALTER TABLE responses DROP COLUMN {col}")
+
+            conn.execute("UPDATE schema_meta SET value = 'long' WHERE key = 'layout'")
+
+    pool.layout = "long"
+
+@traced("data")
+def save_response(response_data, tenant=None):
+    """Save a survey response to the tenant's database"""
+    with SAVE_RESPONSE_SECONDS.time():
+        # Convert the dictionary to a DataFrame with a single row
+        save_responses(pd.DataFrame([response_data]), tenant=tenant)
+
+    # Comments are clustered and closed weeks forecast off the request path
+    schedule_theme_update(tenant)
+    schedule_forecast_update(tenant)
+
+@traced("data")
+def save_responses(df, tenant=None):
+    """Save a DataFrame of survey responses to the tenant's database"""
+    pool = get_pool(tenant)
+
+    # Responses that don't say which survey they answered (bulk imports)
+    # are taken to be from the current one
+    if "survey_version" not in df.columns:
+        df = df.assign(survey_version=CURRENT_SURVEY_VERSION)
+
+    respondents = None
+    if RESPONDENT_COLUMN in df.columns:
+        respondents = df[RESPONDENT_COLUMN]
+        df = df.drop(columns=[RESPONDENT_COLUMN])
+
+    # Rows as stored, with integer timestamps
+    stored = df.assign(timestamp=to_epoch(df["timestamp"]))
+
+    def write(conn):
+        with conn:
+            # Take the write lock up front: a transaction that reads first
+            # and upgrades later can fail immediately instead of waiting
+            conn.execute("BEGIN IMMEDIATE")
+
+            # The cube cells, sketches, text counts and comment index are
+            # updated in the same transaction as the responses are inserted,
+            # so all commit or none do
+            _update_cube(conn, df)
+            _update_sketches(conn, df, respondents)
+            _update_text_counts(conn, df)
+            last_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM responses").fetchone()[0]
+
+            if pool.layout == "long":
+                _save_long_responses(conn, stored)
+            else:
+                _insert_rows(conn, "responses", stored)
+
+            _update_comment_index(conn, df, last_rowid)
+
+    _write_with_retry(pool, write)
+
+def _is_locked(error):
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+def _write_with_retry(pool, write):
+    """
+    Run write(conn) in a pooled connection, retrying when the database is
+    locked. Each attempt already waits up to BUSY_TIMEOUT_MS for the lock;
+    the backoff spreads out writers that all timed out together.
+    """
+    for attempt in range(WRITE_RETRIES + 1):
+        try:
+            with pool.write_lock(), pool.connection() as conn:
+                return write(conn)
+        except sqlite3.OperationalError as e:
+            if not _is_locked(e):
+                raise
+            if attempt == WRITE_RETRIES:
+                raise DatabaseBusyError(str(e)) from e
+
+        DB_WRITE_RETRIES.inc()
+        backoff = min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        time.sleep(backoff * random.uniform(0.5, 1.5))
+
+def _insert_rows(conn, table, df):
+    """
+    Insert a DataFrame's rows into a table within the caller's transaction
+    (DataFrame.to_sql commits, which would split a save in two)
+    """
+    columns = ", ".join(f'"{column}"' for column in df.columns)
+    placeholders = ", ".join("?" * len(df.columns))
+    # Missing values as NULL, numpy scalars as Python ones
+    rows = df.astype(object).where(df.notna(), None)
+    conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                     rows.itertuples(index=False, name=None))
+
+def _save_long_responses(conn, df):
+    """Save responses as one base row each plus one row per answer"""
+    numeric_columns = set(get_question_columns("scale"))
+    base = df[BASE_COLUMNS]
+
+    answers = df.melt(id_vars="response_id", value_vars=[c for c in df.columns if c not in BASE_COLUMNS],
+                      var_name="question", value_name="value").dropna(subset=["value"])
+    is_numeric = answers["question"].isin(numeric_columns)
+    answers["value_num"] = pd.to_numeric(answers["value"].where(is_numeric), errors="coerce")
+    answers["value_text"] = answers["value"].where(~is_numeric)
+
+    # Part of the caller's transaction, which commits or rolls back the whole save
+    _insert_rows(conn, "responses", base)
+    conn.executemany(
+        "INSERT INTO answers (response_id, question, value_num, value_text) VALUES (?, ?, ?, ?)",
+        (
+            (rid, q, None if pd.isna(num) else float(num), text if isinstance(text, str) else None)
+            for rid, q, num, text in answers[["response_id", "question", "value_num", "value_text"]]
+            .itertuples(index=False, name=None)
+        )
     )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-def save_response(response_data):
-    """Save a survey response to the database"""
-    conn = sqlite3.connect(DB_PATH)
-    
-    # Convert the dictionary to a DataFrame with a single row
-    df = pd.DataFrame([response_data])
-    
-    # Save to SQLite
-    df.to_sql('responses', conn, if_exists='append', index=False)
-    
-    conn.close()
-
-def get_responses():
-    """Get all responses from the database"""
-    # Check if database exists
-    if not os.path.exists(DB_PATH):
-        init_db()
+
+def _update_cube(conn, df):
+    """Add a batch of responses to the cube cells they fall into"""
+    questions = [col for col in get_question_columns("scale") if col in df.columns]
+    if not questions or df.empty:
+        return
+
+    # Plain numpy rather than melt/groupby: this runs on every submission,
+    # where pandas' per-call overhead would dominate a one-row batch
+    days = pd.to_datetime(df["timestamp"], format="ISO8601").to_numpy().astype("datetime64[D]")
+    # 1970-01-01 was a Thursday, so (days + 3) % 7 is the weekday with Monday = 0
+    weeks = np.datetime_as_string(days - (days.astype(np.int64) + 3) % 7)
+    departments = df["department"].fillna(UNKNOWN_DIMENSION).to_numpy(dtype=object)
+    locations = df["location"].fillna(UNKNOWN_DIMENSION).to_numpy(dtype=object)
+
+    # One cell per distinct (department, location, week); first holds a row of each
+    _, first, inverse = np.unique(departments + "\x1f" + locations + "\x1f" + weeks.astype(object),
+                                  return_index=True, return_inverse=True)
+
+    values = df[questions].to_numpy(dtype=float, na_value=np.nan)
+    answered = ~np.isnan(values)
+    values = np.where(answered, values, 0.0)
+
+    counts = np.zeros((len(first), len(questions)))
+    totals = np.zeros_like(counts)
+    totals_sq = np.zeros_like(counts)
+    np.add.at(counts, inverse, answered)
+    np.add.at(totals, inverse, values)
+    np.add.at(totals_sq, inverse, values ** 2)
+
+    deltas = [
+        (departments[row], locations[row], weeks[row], question,
+         int(counts[i, j]), float(totals[i, j]), float(totals_sq[i, j]))
+        for i, row in enumerate(first)
+        for j, question in enumerate(questions)
+        if counts[i, j]
+    ]
+
+    conn.executemany(
+        "INSERT INTO response_cube (department, location, week, question, n, total, total_sq) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (department, location, week, question) DO UPDATE SET "
+        "n = n + excluded.n, total = total + excluded.total, total_sq = total_sq + excluded.total_sq",
+        deltas
+    )
+
+def _build_cube(conn, layout="wide"):
+    """Aggregate every stored response into the (empty) cube"""
+    dimensions = (f"COALESCE(department, '{UNKNOWN_DIMENSION}'), "
+                  f"COALESCE(location, '{UNKNOWN_DIMENSION}'), {WEEK_EXPRESSION}")
+    insert = "INSERT INTO response_cube (department, location, week, question, n, total, total_sq) "
+
+    if layout == "long":
+        conn.execute(
+            insert + f"SELECT {dimensions}, question, COUNT(*), SUM(value_num), SUM(value_num * value_num) "
+            "FROM answers JOIN responses USING (response_id) WHERE value_num IS NOT NULL "
+            "GROUP BY 1, 2, 3, question"
+        )
+        return
+
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+    for col in get_question_columns("scale"):
+        if col not in existing:
+            continue
+        conn.execute(
+            insert + f"SELECT {dimensions}, ?, COUNT({col}), SUM({col}), SUM({col} * {col}) "
+            f"FROM responses WHERE {col} IS NOT NULL GROUP BY 1, 2, 3",
+            (col,)
+        )
+
+def _update_sketches(conn, df, respondents=None):
+    """Fold a batch of responses into the sketches of the cells they fall into"""
+    if df.empty:
+        return
+
+    departments = df["department"].fillna(UNKNOWN_DIMENSION).to_numpy(dtype=object)
+    locations = df["location"].fillna(UNKNOWN_DIMENSION).to_numpy(dtype=object)
+    days = pd.to_datetime(df["timestamp"], format="ISO8601").dt.strftime("%Y-%m-%d").to_numpy(dtype=object)
+
+    scale_columns = [col for col in get_question_columns("scale") if col in df.columns]
+    answers = df[scale_columns].to_numpy(dtype=float, na_value=np.nan)
+
+    values = {}
+    for metric in SKETCH_METRICS:
+        positions = [scale_columns.index(col) for col in get_metric_columns(metric) if col in scale_columns]
+        if positions:
+            # Per-response score: mean of the answered questions
+            metric_answers = answers[:, positions]
+            answered = (~np.isnan(metric_answers)).sum(axis=1)
+            values[metric] = np.nansum(metric_answers, axis=1) / np.where(answered > 0, answered, np.nan)
+
+    hashes = None
+    if respondents is not None:
+        # Responses without a session token are left out of the distinct count
+        answered_by = respondents.notna().to_numpy()
+        hashes = np.zeros(len(df), dtype=np.uint64)
+        hashes[answered_by] = hash_values(respondents.to_numpy(dtype=object))
+
+    # Sort responses by cell so each cell is a contiguous slice
+    _, first, inverse = np.unique(departments + "\x1f" + locations + "\x1f" + days,
+                                  return_index=True, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.searchsorted(inverse[order], np.arange(len(first) + 1))
+
+    # Read the existing sketches of every touched cell in one query
+    names = list(values) + ([RESPONDENTS_SKETCH] if hashes is not None else [])
+    cell_departments, cell_locations = sorted(set(departments[first])), sorted(set(locations[first]))
+    existing = {
+        (dept, loc, day, name): blob
+        for dept, loc, day, name, blob in conn.execute(
+            "SELECT department, location, day, name, sketch FROM response_sketches "
+            f"WHERE day BETWEEN ? AND ? AND department IN ({', '.join('?' for _ in cell_departments)}) "
+            f"AND location IN ({', '.join('?' for _ in cell_locations)})",
+            [min(days[first]), max(days[first])] + cell_departments + cell_locations
+        )
+    }
+
+    updated = []
+    for cell, row in enumerate(first):
+        rows = order[bounds[cell]:bounds[cell + 1]]
+        key = (departments[row], locations[row], days[row])
+
+        for name in names:
+            blob = existing.get(key + (name,))
+            if name == RESPONDENTS_SKETCH:
+                sketch = HyperLogLog.from_bytes(blob) if blob else HyperLogLog()
+                sketch.update_hashes(hashes[rows[answered_by[rows]]])
+            else:
+                sketch = KLLSketch.from_bytes(blob) if blob else KLLSketch()
+                sketch.update(values[name][rows])
+            updated.append(key + (name, sketch.to_bytes()))
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO response_sketches (department, location, day, name, sketch) VALUES (?, ?, ?, ?, ?)",
+        updated
+    )
+
+def _iter_stored_responses(conn, layout="wide", chunksize=100000):
+    """Every stored response, in DataFrame chunks of one row per response"""
+    last = 0
+    while True:
+        chunk = pd.read_sql_query(
+            "SELECT rowid AS row_number, * FROM responses WHERE rowid > ? ORDER BY rowid LIMIT ?",
+            conn, params=(last, chunksize)
+        )
+        if chunk.empty:
+            break
+
+        chunk["timestamp"] = from_epoch(chunk["timestamp"])
+        first, last = last, int(chunk["row_number"].iloc[-1])
+        chunk = chunk.drop(columns=["row_number"])
+
+        if layout == "long":
+            answers = pd.read_sql_query(
+                "SELECT answers.* FROM answers JOIN responses USING (response_id) "
+                "WHERE responses.rowid > ? AND responses.rowid <= ?", conn, params=(first, last)
+            )
+            chunk = _pivot_answers(chunk, answers)
+
+        yield chunk
+
+def _build_sketches(conn, layout="wide", chunksize=100000):
+    """Sketch every stored response (their sessions are unknown)"""
+    for chunk in _iter_stored_responses(conn, layout, chunksize):
+        _update_sketches(conn, chunk)
+
+def _update_text_counts(conn, df):
+    """Add the words and topic mentions of a batch of responses' comments to their cells"""
+    columns = [col for col in get_question_columns("text") if col in df.columns]
+    if df.empty or not columns:
+        return
+
+    days = pd.to_datetime(df["timestamp"], format="ISO8601").dt.strftime("%Y-%m-%d").tolist()
+    departments = df["department"].fillna(UNKNOWN_DIMENSION).tolist()
+    locations = df["location"].fillna(UNKNOWN_DIMENSION).tolist()
+
+    terms = {}
+    for col in columns:
+        for cell, text in zip(zip(days, departments, locations), df[col].tolist()):
+            if isinstance(text, str) and text.strip():
+                for word in tokenize(text):
+                    key = cell + (word,)
+                    terms[key] = terms.get(key, 0) + 1
+
+    topics = {}
+    for topic, words in TOPIC_LEXICON.items():
+        for key, n in terms.items():
+            if key[3] in words:
+                topic_key = key[:3] + (topic,)
+                topics[topic_key] = topics.get(topic_key, 0) + n
+
+    for table, column, counts in (("term_counts", "term", terms), ("topic_counts", "topic", topics)):
+        conn.executemany(
+            f"INSERT INTO {table} (day, department, location, {column}, n) VALUES (?, ?, ?, ?, ?) "
+            f"ON CONFLICT (day, department, location, {column}) DO UPDATE SET n = n + excluded.n",
+            (key + (n,) for key, n in counts.items())
+        )
+
+def _build_text_counts(conn, layout="wide", chunksize=100000):
+    """Count the words and topics of every stored comment into the (empty) tables"""
+    for chunk in _iter_stored_responses(conn, layout, chunksize):
+        _update_text_counts(conn, chunk)
+
+    # The lexicon the counts were made with; counts from another are stale
+    conn.execute("INSERT OR REPLACE INTO schema_meta (key, value) VALUES ('text_lexicon', ?)", (LEXICON_VERSION,))
+
+def rebuild_text_counts(tenant=None):
+    """Recount the tenant's words and topics (e.g. after changing the stop words or topic lexicon)"""
+    pool = get_pool(tenant)
+
+    def write(conn):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM term_counts")
+            conn.execute("DELETE FROM topic_counts")
+            _build_text_counts(conn, pool.layout)
+
+    _write_with_retry(pool, write)
+
+def _comment_slots():
+    """Position of each text question in its responses' comment rowids"""
+    text_columns = get_question_columns("text")
+    if len(text_columns) > COMMENT_SLOTS:
+        raise ValueError(f"At most {COMMENT_SLOTS} text questions can be indexed")
+    return {col: slot for slot, col in enumerate(text_columns)}
+
+def _update_comment_index(conn, df, last_rowid):
+    """Index the non-blank text answers of responses just inserted after last_rowid"""
+    slots = _comment_slots()
+    columns = [col for col in slots if col in df.columns]
+    if df.empty or not columns:
+        return
+
+    # The responses were appended in order with the write lock held, so
+    # they have the next rowids, unless SQLite had to pick others
+    rowids = range(last_rowid + 1, last_rowid + len(df) + 1)
+    if conn.execute("SELECT MAX(rowid) FROM responses").fetchone()[0] != rowids[-1]:
+        rowid_of = dict(conn.execute("SELECT response_id, rowid FROM responses WHERE rowid > ?", (last_rowid,)))
+        rowids = [rowid_of[response_id] for response_id in df["response_id"].tolist()]
+
+    conn.executemany(
+        "INSERT INTO comment_index (rowid, question, text) VALUES (?, ?, ?)",
+        ((rowid * COMMENT_SLOTS + slots[col], col, text)
+         for col in columns
+         for rowid, text in zip(rowids, df[col].tolist())
+         if isinstance(text, str) and text.strip())
+    )
+
+def _build_comment_index(conn, layout="wide"):
+    """Index every stored comment into the (empty) comment index"""
+    insert = "INSERT INTO comment_index (rowid, question, text) "
+
+    if layout == "long":
+        for col, slot in _comment_slots().items():
+            conn.execute(
+                insert + f"SELECT responses.rowid * {COMMENT_SLOTS} + ?, question, value_text "
+                "FROM answers JOIN responses USING (response_id) "
+                "WHERE question = ? AND TRIM(COALESCE(value_text, '')) != ''",
+                (slot, col)
+            )
+        return
+
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+    for col, slot in _comment_slots().items():
+        if col in existing:
+            conn.execute(
+                insert + f"SELECT rowid * {COMMENT_SLOTS} + ?, ?, {col} FROM responses "
+                f"WHERE TRIM(COALESCE({col}, '')) != ''",
+                (slot, col)
+            )
+
+def rebuild_comment_index(tenant=None):
+    """Re-index the tenant's comments from its responses (e.g. after manual edits)"""
+    pool = get_pool(tenant)
+
+    def write(conn):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM comment_index")
+            _build_comment_index(conn, pool.layout)
+
+    _write_with_retry(pool, write)
+
+def search_query(text):
+    """
+    An FTS5 query matching comments with every word of a search, as
+    prefixes of the comment's words. Returns None for a search without words.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    # Quoted, so FTS5 operators and punctuation are taken literally
+    return " ".join(f'"{word}"*' for word in words)
+
+@traced("data")
+def search_comments(text, start_date=None, end_date=None, department=None, location=None, tenant=None,
+                    limit=SEARCH_PAGE_SIZE, offset=0):
+    """
+    Search the tenant's comments, best matches (BM25) first, with the same
+    filters as get_filtered_responses.
+    Returns a page of results (response_id, question, timestamp,
+    department, location and snippet, with the matching words between
+    \x02 and \x03) and the total number of matching comments.
+    """
+    empty = pd.DataFrame(columns=["response_id", "question", "timestamp", "department", "location", "snippet"])
+    query = search_query(text)
+    if query is None:
+        return empty, 0
+
+    where, params = _filter_clause(start_date, end_date, department, location)
+    matches = (f"FROM comment_index JOIN responses ON responses.rowid = comment_index.rowid / {COMMENT_SLOTS} "
+               f"WHERE comment_index MATCH ? AND {where}")
+    params = [query] + params
+
+    try:
+        with get_pool(tenant).connection() as conn, span("search_comments", "data"):
+            total = conn.execute(f"SELECT COUNT(*) {matches}", params).fetchone()[0]
+            results = pd.read_sql_query(
+                "SELECT response_id, question, timestamp, department, location, "
+                "snippet(comment_index, 1, char(2), char(3), '…', 24) AS snippet "
+                f"{matches} ORDER BY rank LIMIT ? OFFSET ?",
+                conn, params=params + [limit, offset]
+            )
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return empty, 0
+
+    results["timestamp"] = from_epoch(results["timestamp"])
+    return results, total
+
+def rebuild_cube(tenant=None):
+    """Recompute the tenant's cube from its responses (e.g. after manual edits)"""
+    pool = get_pool(tenant)
+
+    def write(conn):
+        with conn:
+            # Check-ins arriving meanwhile wait for the rebuild, so none of
+            # them is added to the cube before it is cleared
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM response_cube")
+            _build_cube(conn, pool.layout)
+
+    _write_with_retry(pool, write)
+
+def _read_comments(conn, layout, after, limit):
+    """
+    Non-blank text answers of the next limit responses after a rowid.
+    Returns the rowid of the last response read and a DataFrame of
+    response_id, question and text.
+    """
+    text_columns = get_question_columns("text")
+    empty = pd.DataFrame(columns=["response_id", "question", "text"])
+
+    if layout == "long":
+        last = conn.execute(
+            "SELECT MAX(rowid) FROM (SELECT rowid FROM responses WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+            (after, limit)
+        ).fetchone()[0]
+        if last is None:
+            return after, empty
+        comments = pd.read_sql_query(
+            "SELECT answers.response_id, question, value_text AS text FROM answers JOIN responses USING (response_id) "
+            f"WHERE responses.rowid > ? AND responses.rowid <= ? AND question IN ({', '.join('?' for _ in text_columns)})",
+            conn, params=[after, last] + text_columns
+        )
+    else:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+        columns = [col for col in text_columns if col in existing]
+        rows = pd.read_sql_query(
+            f"SELECT rowid AS row_number, {', '.join(['response_id'] + columns)} FROM responses "
+            "WHERE rowid > ? ORDER BY rowid LIMIT ?", conn, params=(after, limit)
+        )
+        if rows.empty:
+            return after, empty
+        last = int(rows["row_number"].iloc[-1])
+        if not columns:
+            return last, empty
+        comments = rows.melt(id_vars=["response_id"], value_vars=columns, var_name="question", value_name="text")
+
+    comments = comments[comments["text"].fillna("").astype(str).str.strip() != ""]
+    return int(last), comments.reset_index(drop=True)
+
+def _theme_rows(comments, themes):
+    """(response_id, question, theme) rows for the comments that got a theme"""
+    clustered = themes >= 0
+    return list(zip(comments["response_id"][clustered].tolist(), comments["question"][clustered].tolist(),
+                    themes[clustered].tolist()))
+
+@traced("data")
+def update_themes(tenant=None, batch_size=THEME_BATCH_SIZE, max_batches=None):
+    """
+    Cluster the comments of responses saved since the last update into the
+    tenant's themes, one mini-batch at a time, and store each comment's
+    theme. Returns the number of comments assigned.
+
+    Several processes may run this at once: a batch is only stored if no
+    other one was stored since it was read.
+    """
+    pool = get_pool(tenant)
+    assigned = 0
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        with pool.connection() as conn:
+            after, blob = conn.execute("SELECT last_rowid, model FROM theme_state WHERE id = 1").fetchone()
+            last, comments = _read_comments(conn, pool.layout, after, batch_size)
+        if last == after:
+            break
+
+        model = ThemeModel.from_bytes(blob) if blob else ThemeModel()
+        with THEME_UPDATE_SECONDS.time(), span("cluster_comments", "data"):
+            themes = model.partial_fit(comments["text"].tolist())
+
+        if themes is None:
+            # Too few comments yet to start the model: read further, or
+            # wait for more responses
+            with pool.connection() as conn:
+                more = conn.execute("SELECT 1 FROM responses WHERE rowid > ? LIMIT 1", (last,)).fetchone()
+            if not more:
+                break
+            batch_size *= 2
+            continue
+
+        rows = _theme_rows(comments, themes)
+
+        def write(conn):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                stored = conn.execute(
+                    "UPDATE theme_state SET last_rowid = ?, model = ? WHERE id = 1 AND last_rowid = ?",
+                    (last, model.to_bytes(), after)
+                ).rowcount
+                if stored:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO comment_themes (response_id, question, theme) VALUES (?, ?, ?)", rows
+                    )
+                return stored
+
+        # Another process may have clustered these comments first; then
+        # carry on from where it stopped
+        if _write_with_retry(pool, write):
+            assigned += len(rows)
+            batches += 1
+
+    return assigned
+
+def _run_theme_update(tenant, path):
+    try:
+        update_themes(tenant)
+    except Exception:
+        # Nothing waits on the background thread, so failures are counted;
+        # the comments are picked up again by the next update
+        THEME_UPDATE_ERRORS.inc()
+    finally:
+        with _theme_lock:
+            _theme_jobs.discard(path)
+
+def schedule_theme_update(tenant=None):
+    """
+    Start clustering new comments in the background once at least a
+    mini-batch of responses is waiting. Returns whether an update started.
+    """
+    global _theme_executor
+
+    if not THEME_UPDATES:
+        return False
+
+    pool = get_pool(tenant)
+    if pool.path in _theme_jobs:
+        return False
+
+    with pool.connection() as conn:
+        pending = conn.execute(
+            "SELECT COALESCE(MAX(rowid), 0) - (SELECT last_rowid FROM theme_state WHERE id = 1) FROM responses"
+        ).fetchone()[0]
+    if pending < THEME_BATCH_SIZE:
+        return False
+
+    with _theme_lock:
+        if pool.path in _theme_jobs:
+            return False
+        _theme_jobs.add(pool.path)
+        if _theme_executor is None:
+            _theme_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hurdl-themes")
+
+    _theme_executor.submit(_run_theme_update, tenant, pool.path)
+    return True
+
+def rebuild_themes(tenant=None, batch_size=THEME_BATCH_SIZE * 8):
+    """
+    Re-cluster every comment with a new model (e.g. after changing
+    THEME_COUNT): fit it over all comments, then reassign each comment.
+    Reassigning holds the write lock throughout, so run it while the app
+    is quiet.
+    """
+    pool = get_pool(tenant)
+    model = ThemeModel()
+
+    with pool.connection() as conn:
+        after = 0
+        while True:
+            last, comments = _read_comments(conn, pool.layout, after, batch_size)
+            if last == after:
+                break
+            model.partial_fit(comments["text"].tolist())
+            after = last
+
+    def write(conn):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM comment_themes")
+
+            after = 0
+            while model.centroids is not None:
+                last, comments = _read_comments(conn, pool.layout, after, batch_size)
+                if last == after:
+                    break
+                conn.executemany(
+                    "INSERT INTO comment_themes (response_id, question, theme) VALUES (?, ?, ?)",
+                    _theme_rows(comments, model.predict(comments["text"].tolist()))
+                )
+                after = last
+
+            # A model that never started leaves every comment to the next update
+            conn.execute("UPDATE theme_state SET last_rowid = ?, model = ? WHERE id = 1",
+                         (after, model.to_bytes() if model.centroids is not None else None))
+
+    _write_with_retry(pool, write)
+
+@traced("data")
+def get_theme_summary(start_date=None, end_date=None, department=None, location=None, tenant=None,
+                      min_group_size=None):
+    """
+    Comments per discovered theme among the filtered responses, counted
+    from the stored assignments without reading any text.
+    Returns a DataFrame of theme, label and comments (themes with fewer
+    than min_group_size comments left out), and the number of matching
+    responses not clustered yet.
+    """
+    where, params = _filter_clause(start_date, end_date, department, location)
+    empty = pd.DataFrame(columns=["theme", "label", "comments"])
+
+    try:
+        with get_pool(tenant).connection() as conn:
+            themes = pd.read_sql_query(
+                "SELECT theme, COUNT(*) AS comments FROM comment_themes JOIN responses USING (response_id) "
+                f"WHERE {where} GROUP BY theme", conn, params=params
+            )
+            last_rowid, blob = conn.execute("SELECT last_rowid, model FROM theme_state WHERE id = 1").fetchone()
+            pending = conn.execute(f"SELECT COUNT(*) FROM responses WHERE rowid > ? AND {where}",
+                                   [last_rowid] + params).fetchone()[0]
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return empty, 0
+
+    if themes.empty:
+        return empty, pending
+
+    labels = ThemeModel.from_bytes(blob).labels() if blob else []
+    themes["label"] = [labels[t] if t < len(labels) else f"Theme {t + 1}" for t in themes["theme"]]
+    themes = themes[["theme", "label", "comments"]].sort_values("comments", ascending=False)
+    return protect(themes.reset_index(drop=True), ["theme"], count_column="comments", k=min_group_size), pending
+
+@traced("data")
+def get_cube(dimensions=(), start_date=None, end_date=None, department=None, location=None,
+             questions=None, tenant=None):
+    """
+    Roll the response cube up to the given dimensions (drill down by adding
+    dimensions or filters, roll up by removing them).
+
+    Returns one row per combination of the dimensions and question, with
+    the count, sum and sum of squares of the answers. The cost depends on
+    the number of cube cells, not on the number of responses. Dates select
+    whole ISO weeks: every week overlapping start_date..end_date is included.
+    """
+    dimensions = list(dimensions)
+    unknown = [d for d in dimensions if d not in CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions: {unknown}")
+
+    where = "1=1"
+    params = []
+
+    if start_date:
+        # Monday of the week containing start_date
+        where += " AND week >= ?"
+        params.append((pd.Timestamp(start_date) - pd.Timedelta(days=pd.Timestamp(start_date).dayofweek)).strftime("%Y-%m-%d"))
+
+    if end_date:
+        where += " AND week <= ?"
+        params.append(pd.Timestamp(end_date).strftime("%Y-%m-%d"))
+
+    if department and department != "All":
+        where += " AND department = ?"
+        params.append(department)
+
+    if location and location != "All":
+        where += " AND location = ?"
+        params.append(location)
+
+    if questions:
+        where += f" AND question IN ({', '.join('?' for _ in questions)})"
+        params += list(questions)
+
+    group_columns = ", ".join(dimensions + ["question"])
+    query = (
+        f"SELECT {group_columns}, SUM(n) AS n, SUM(total) AS total, SUM(total_sq) AS total_sq "
+        f"FROM response_cube WHERE {where} GROUP BY {group_columns} ORDER BY {group_columns}"
+    )
+
+    try:
+        with get_pool(tenant).connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return pd.DataFrame(columns=dimensions + ["question", "n", "total", "total_sq"])
+
+    if "week" in df.columns:
+        df["week"] = pd.to_datetime(df["week"])
+    return df
+
+def closed_week(now=None):
+    """Monday of the last week that has ended (weeks run Monday to Sunday)"""
+    today = pd.Timestamp(now if now is not None else pd.Timestamp.now()).normalize()
+    return today - pd.Timedelta(days=today.dayofweek + 7)
+
+@traced("data")
+def update_forecasts(tenant=None, now=None):
+    """
+    Fold the weeks closed since the last update into each metric's
+    department forecast model. Returns the number of weeks folded in,
+    summed over the metrics.
+
+    Each week is read from the cube and folded in once, when it closes, so
+    an update costs the new weeks whatever the length of the history.
+    Responses saved for a week already folded in only count after
+    rebuild_forecasts. Several processes may run this at once: a model is
+    only stored if no other one was stored since it was read.
+    """
+    pool = get_pool(tenant)
+    closed = closed_week(now)
+    added = 0
+
+    for metric in FORECAST_METRICS:
+        with pool.connection() as conn:
+            last_week, blob = conn.execute(
+                "SELECT last_week, model FROM forecast_state WHERE metric = ?", (metric,)
+            ).fetchone()
+
+        start = pd.Timestamp(last_week) + pd.Timedelta(weeks=1) if last_week else None
+        if start is not None and start > closed:
+            continue
+
+        cells = get_cube(["department", "week"], start_date=start, end_date=closed,
+                         questions=get_metric_columns(metric), tenant=tenant)
+        if start is None:
+            if cells.empty:
+                # No responses to start from yet
+                continue
+            start = cells["week"].min()
+
+        # Every closed week in order, including weeks without any scores
+        weeks = pd.date_range(start, closed, freq="7D")
+        scores = weekly_scores(cells).reindex(columns=weeks)
+        model = HoltModel.from_bytes(blob) if blob else HoltModel()
+        with span("fit_forecasts", "data"):
+            model.fit(scores.index.tolist(), scores.to_numpy())
+
+        def write(conn):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                return conn.execute(
+                    "UPDATE forecast_state SET last_week = ?, model = ? WHERE metric = ? AND last_week IS ?",
+                    (closed.strftime("%Y-%m-%d"), model.to_bytes(), metric, last_week)
+                ).rowcount
+
+        # Another process may have folded these weeks in first
+        if _write_with_retry(pool, write):
+            added += len(weeks)
+
+    return added
+
+def _run_forecast_update(tenant, path):
+    try:
+        update_forecasts(tenant)
+    except Exception:
+        # Counted like theme updates; the weeks are folded in by the next one
+        FORECAST_UPDATE_ERRORS.inc()
+    finally:
+        with _forecast_lock:
+            _forecast_jobs.discard(path)
+
+def schedule_forecast_update(tenant=None, now=None):
+    """
+    Start folding newly closed weeks into the forecasts in the background,
+    if any metric's model is behind. Returns whether an update started.
+    """
+    global _forecast_executor
+
+    if not FORECAST_UPDATES:
+        return False
+
+    pool = get_pool(tenant)
+    closed = closed_week(now).strftime("%Y-%m-%d")
+    if pool.path in _forecast_jobs or _forecast_weeks.get(pool.path) == closed:
+        return False
+
+    with pool.connection() as conn:
+        behind = conn.execute(
+            "SELECT 1 FROM forecast_state WHERE last_week IS NULL OR last_week < ? LIMIT 1", (closed,)
+        ).fetchone()
+    if not behind:
+        _forecast_weeks[pool.path] = closed
+        return False
+
+    with _forecast_lock:
+        if pool.path in _forecast_jobs:
+            return False
+        _forecast_jobs.add(pool.path)
+        if _forecast_executor is None:
+            _forecast_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hurdl-forecasts")
+
+    _forecast_executor.submit(_run_forecast_update, tenant, pool.path)
+    return True
+
+def rebuild_forecasts(tenant=None):
+    """Refit the tenant's forecasts over every closed week (e.g. after changing the smoothing or editing responses)"""
+    pool = get_pool(tenant)
+
+    def write(conn):
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE forecast_state SET last_week = NULL, model = NULL")
+
+    _write_with_retry(pool, write)
+    update_forecasts(tenant)
+
+def get_forecast_week(metric, tenant=None):
+    """Monday of the last week folded into a metric's forecasts, or None before the first update"""
+    try:
+        with get_pool(tenant).connection() as conn:
+            row = conn.execute("SELECT last_week FROM forecast_state WHERE metric = ?", (metric,)).fetchone()
+    except sqlite3.Error:
+        return None
+
+    return pd.Timestamp(row[0]) if row and row[0] else None
+
+@traced("data")
+def get_forecasts(metric, department=None, tenant=None, horizon=FORECAST_WEEKS):
+    """
+    Forecasts of a metric's weekly department scores from its stored model
+    (see update_forecasts). Returns a DataFrame of department, week
+    (Monday), weeks_ahead, forecast, lower and upper; weeks_ahead 0 is the
+    smoothed score of the last closed week.
+    """
+    columns = ["department", "week", "weeks_ahead", "forecast", "lower", "upper"]
+    empty = pd.DataFrame(columns=columns)
+
+    try:
+        with get_pool(tenant).connection() as conn:
+            row = conn.execute("SELECT last_week, model FROM forecast_state WHERE metric = ?", (metric,)).fetchone()
+    except sqlite3.Error:
+        return empty
+
+    if not row or row[1] is None:
+        return empty
+
+    forecasts = HoltModel.from_bytes(row[1]).forecast(horizon).rename(columns={"key": "department"})
+    if department and department != "All":
+        forecasts = forecasts[forecasts["department"] == department]
+
+    forecasts = forecasts.assign(week=pd.Timestamp(row[0]) + pd.to_timedelta(forecasts["weeks_ahead"] * 7, unit="D"))
+    return forecasts[columns].reset_index(drop=True)
+
+def _cell_filter_clause(start_date=None, end_date=None, department=None, location=None):
+    """The filters of get_filtered_responses for tables of per-day cells"""
+    where = "1=1"
+    params = []
+
+    if start_date:
+        where += " AND day >= ?"
+        params.append(pd.Timestamp(start_date).strftime("%Y-%m-%d"))
+
+    if end_date:
+        where += " AND day <= ?"
+        params.append(pd.Timestamp(end_date).strftime("%Y-%m-%d"))
+
+    if department and department != "All":
+        where += " AND department = ?"
+        params.append(department)
+
+    if location and location != "All":
+        where += " AND location = ?"
+        params.append(location)
+
+    return where, params
+
+@traced("data")
+def get_text_summary(start_date=None, end_date=None, department=None, location=None, tenant=None, top=10):
+    """
+    The most common words and the topic mentions in the comments of the
+    filtered responses, summed from the per-day counts.
+    Returns a dict with common_words and topics, as in analyze_sentiment,
+    or None if the counts were made with another lexicon and need
+    rebuilding (see rebuild_text_counts).
+    """
+    where, params = _cell_filter_clause(start_date, end_date, department, location)
+
+    try:
+        with get_pool(tenant).connection() as conn:
+            lexicon = conn.execute("SELECT value FROM schema_meta WHERE key = 'text_lexicon'").fetchone()
+            if lexicon is None or lexicon[0] != LEXICON_VERSION:
+                return None
+
+            words = conn.execute(
+                f"SELECT term, SUM(n) AS total FROM term_counts WHERE {where} "
+                "GROUP BY term ORDER BY total DESC, term LIMIT ?", params + [top]
+            ).fetchall()
+            topics = dict(conn.execute(
+                f"SELECT topic, SUM(n) FROM topic_counts WHERE {where} GROUP BY topic", params
+            ).fetchall())
+    except sqlite3.Error:
+        return None
+
+    return {
+        "common_words": dict(words),
+        "topics": {topic: topics.get(topic, 0) for topic in TOPIC_LEXICON}
+    }
+
+@traced("data")
+def get_sketch_summary(by=None, start_date=None, end_date=None, department=None, location=None,
+                       quantiles=(0.1, 0.5, 0.9), tenant=None, min_group_size=None):
+    """
+    Approximate quantiles of each metric and distinct check-in sessions,
+    merged from the per-day sketches over the filter range.
+
+    Returns one row per value of by ("department" or "location"), or a
+    single row without it, with <metric>_p<q> columns (e.g. wellbeing_p50),
+    <metric>_count and sessions (see RESPONDENT_COLUMN). The cost grows with the number of
+    department/location/day cells in range, not with the number of responses.
+    For min_group_size see privacy.protect.
+    """
+    if by not in (None, "department", "location"):
+        raise ValueError(f"Cannot group by {by!r}")
+
+    where, params = _cell_filter_clause(start_date, end_date, department, location)
+    group_column = by or "'All'"
+
+    try:
+        with get_pool(tenant).connection() as conn:
+            rows = conn.execute(
+                f"SELECT {group_column}, name, sketch FROM response_sketches WHERE {where}", params
+            ).fetchall()
+    except sqlite3.Error:
         return pd.DataFrame()
-    
-    conn = sqlite3.connect(DB_PATH)
-    
+
+    groups = {}
+    for group, name, blob in rows:
+        groups.setdefault(group, {}).setdefault(name, []).append(blob)
+
+    summary = []
+    for group, sketches in sorted(groups.items()):
+        row = {by or "group": group}
+
+        for metric in SKETCH_METRICS:
+            merged = KLLSketch.merge_bytes(sketches.get(metric, []))
+            for q, value in zip(quantiles, merged.quantiles(quantiles)):
+                row[f"{metric}_p{round(q * 100)}"] = value
+            row[f"{metric}_count"] = merged.n
+
+        sessions = sketches.get(RESPONDENTS_SKETCH)
+        row["sessions"] = round(HyperLogLog.merge_bytes(sessions).estimate()) if sessions else None
+        summary.append(row)
+
+    summary = pd.DataFrame(summary)
+    if min_group_size and not summary.empty:
+        # A group's responses: those counted by its most answered metric
+        counts = summary[[f"{metric}_count" for metric in SKETCH_METRICS]].max(axis=1).to_numpy()
+        keys = [summary[by].to_numpy()] if by else []
+        summary = summary[~suppression_mask(counts, keys, min_group_size)].reset_index(drop=True)
+
+    return summary
+
+def _query_responses(tenant, where="1=1", params=()):
+    """Read responses matching a WHERE clause as one row per response"""
+    pool = get_pool(tenant)
+
     try:
-        # Read all responses
-        df = pd.read_sql_query("SELECT * FROM responses", conn, parse_dates=["timestamp"])
-        conn.close()
-        return df
-    except:
-        conn.close()
-        # If table doesn't exist, initialize DB and return empty DataFrame
-        init_db()
+        with pool.connection() as conn, span("read_sql", "data"):
+            df = pd.read_sql_query(f"SELECT * FROM responses WHERE {where}", conn, params=params)
+            df["timestamp"] = from_epoch(df["timestamp"])
+
+            if pool.layout == "long":
+                answers = pd.read_sql_query(
+                    "SELECT answers.* FROM answers JOIN responses USING (response_id) "
+                    f"WHERE {where}", conn, params=params
+                )
+                df = _pivot_answers(df, answers)
+    except (sqlite3.Error, pd.errors.DatabaseError):
         return pd.DataFrame()
 
-def get_filtered_responses(start_date=None, end_date=None, department=None, location=None):
+    return df
+
+def _pivot_answers(df, answers):
+    """Join long-layout answers onto their responses as q_<id> columns"""
+    numeric_columns = set(get_question_columns("scale"))
+
+    answers["value"] = answers["value_text"].where(answers["value_num"].isna(), answers["value_num"])
+    wide = answers.pivot(index="response_id", columns="question", values="value")
+    wide = wide.reindex(columns=get_question_columns())
+
+    for col in numeric_columns:
+        wide[col] = pd.to_numeric(wide[col])
+
+    return df.merge(wide, left_on="response_id", right_index=True, how="left")
+
+@traced("data")
+def get_responses(tenant=None):
+    """Get all responses from the tenant's database"""
+    return _query_responses(tenant)
+
+@traced("data")
+def get_filtered_responses(start_date=None, end_date=None, department=None, location=None, tenant=None):
     """Get filtered responses based on criteria"""
-    conn = sqlite3.connect(DB_PATH)
-    
-    query = "SELECT * FROM responses WHERE 1=1"
+    query, params = _filter_clause(start_date, end_date, department, location)
+    return _query_responses(tenant, query, params)
+
+def _filter_clause(start_date=None, end_date=None, department=None, location=None):
+    """Build the WHERE clause and parameters shared by the filtered queries"""
+    query = "1=1"
     params = []
-    
+
     if start_date:
         query += " AND timestamp >= ?"
-        params.append(start_date)
-    
+        params.append(_epoch_param(start_date))
+
     if end_date:
         query += " AND timestamp <= ?"
-        params.append(end_date)
-    
+        params.append(_epoch_param(end_date))
+
     if department and department != "All":
         query += " AND department = ?"
         params.append(department)
-    
+
     if location and location != "All":
         query += " AND location = ?"
         params.append(location)
-    
+
+    return query, params
+
+# SQL expressions that map a timestamp to the start of its bin
+PERIOD_EXPRESSIONS = {
+    "day": f"date({TIMESTAMP_SECONDS}, 'unixepoch')",
+    # 'weekday 0' moves forward to Sunday, so -6 days is that week's Monday
+    "week": WEEK_EXPRESSION,
+    "month": f"strftime('%Y-%m-01', {TIMESTAMP_SECONDS}, 'unixepoch')"
+}
+
+@traced("data")
+def get_binned_scores(metrics, freq="day", start_date=None, end_date=None, department=None,
+                      location=None, by=None, tenant=None, min_group_size=None):
+    """
+    Get average metric scores per time bin, aggregated in SQL.
+
+    Each response's metric score is the mean of its answered questions for
+    that metric (as in data_analysis), then averaged per bin and optionally
+    per department or location (by). Only one row per bin and group leaves
+    the database, however many responses fall into it.
+    Returns columns period, [by], <metric>_score and responses.
+    min_group_size is applied per bin (see privacy.protect).
+    """
+    if freq not in PERIOD_EXPRESSIONS:
+        raise ValueError(f"Unknown bin size: {freq!r}")
+    if by not in (None, "department", "location"):
+        raise ValueError(f"Cannot group by {by!r}")
+
+    where, params = _filter_clause(start_date, end_date, department, location)
+    group_columns = ["period"] + ([by] if by else [])
+    pool = get_pool(tenant)
+
+    # Per-response metric scores, skipping unanswered questions like pandas' mean
+    score_expressions = []
+    for metric in metrics:
+        columns = get_metric_columns(metric)
+        if not columns:
+            continue
+        if pool.layout == "long":
+            in_list = ", ".join(f"'{col}'" for col in columns)
+            expression = f"AVG(CASE WHEN question IN ({in_list}) THEN value_num END)"
+        else:
+            total = " + ".join(f"COALESCE({col}, 0)" for col in columns)
+            answered = " + ".join(f"({col} IS NOT NULL)" for col in columns)
+            expression = f"({total}) * 1.0 / NULLIF({answered}, 0)"
+        score_expressions.append(f"{expression} AS {metric}_score")
+
+    per_response = f"SELECT {PERIOD_EXPRESSIONS[freq]} AS period{', ' + by if by else ''}"
+    if score_expressions:
+        per_response += ", " + ", ".join(score_expressions)
+    if pool.layout == "long":
+        per_response += f" FROM responses JOIN answers USING (response_id) WHERE {where} GROUP BY response_id"
+    else:
+        per_response += f" FROM responses WHERE {where}"
+
+    averages = "".join(f", AVG({metric}_score) AS {metric}_score" for metric in metrics if get_metric_columns(metric))
+    query = (
+        f"SELECT {', '.join(group_columns)}{averages}, COUNT(*) AS responses "
+        f"FROM ({per_response}) GROUP BY {', '.join(group_columns)} ORDER BY {', '.join(group_columns)}"
+    )
+
     try:
-        df = pd.read_sql_query(query, conn, params=params, parse_dates=["timestamp"])
-        conn.close()
-        return df
-    except:
-        conn.close()
+        with pool.connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return pd.DataFrame()
+
+    df["period"] = pd.to_datetime(df["period"])
+    return protect(df, group_columns, k=min_group_size)
+
+def get_response_counts(by, start_date=None, end_date=None, tenant=None):
+    """Number of responses per combination of the by columns (department, location)"""
+    by = list(by)
+    if any(column not in ("department", "location") for column in by):
+        raise ValueError(f"Cannot group by {by!r}")
+
+    where, params = _filter_clause(start_date, end_date)
+    group_columns = ", ".join(by)
+
+    try:
+        with get_pool(tenant).connection() as conn:
+            return pd.read_sql_query(
+                f"SELECT {group_columns}, COUNT(*) AS responses FROM responses "
+                f"WHERE {where} GROUP BY {group_columns}", conn, params=params
+            )
+    except (sqlite3.Error, pd.errors.DatabaseError):
+        return pd.DataFrame(columns=by + ["responses"])
+
+def get_data_version(tenant=None):
+    """
+    Get the tenant's data version, which increases with every write.
+
+    It is a single-row read, cheap enough to check on every rerun. Results
+    cached under one version stay valid until it changes.
+    """
+    try:
+        with get_pool(tenant).connection() as conn:
+            return conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+    except sqlite3.Error:
+        return 0
+
+def _get_tenant_totals(tenant):
+    """Get response counts and per-question sums/counts for one tenant"""
+    score_columns = get_question_columns("scale")
+    pool = get_pool(tenant)
+
+    with pool.connection() as conn:
+        responses = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+        if pool.layout == "long":
+            sums = {
+                question: (total, count) for question, total, count in conn.execute(
+                    "SELECT question, SUM(value_num), COUNT(value_num) FROM answers GROUP BY question"
+                )
+            }
+        else:
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            present = [q for q in score_columns if q in existing]
+            columns = ", ".join(f"SUM({q}), COUNT({q})" for q in present) or "NULL"
+            row = conn.execute(f"SELECT {columns} FROM responses").fetchone()
+            sums = {q: (row[2 * i], row[2 * i + 1]) for i, q in enumerate(present)}
+
+    totals = {"tenant": tenant, "responses": responses}
+    for q in score_columns:
+        total, count = sums.get(q, (0, 0))
+        totals[f"{q}_sum"] = total or 0
+        totals[f"{q}_count"] = count
+
+    return totals
+
+@traced("data")
+def get_cross_tenant_summary(tenants=None):
+    """
+    Aggregate response counts and question averages across tenant shards.
+
+    Each shard is queried in parallel for sums and counts only, so the
+    combined averages are exact without moving any rows between shards.
+    Returns one row per tenant plus an "All" row.
+    """
+    if tenants is None:
+        tenants = list_tenants()
+
+    if not tenants:
         return pd.DataFrame()
 
-# Initialize database on import
-init_db()
\ No newline at end of file
+    # SQLite releases the GIL while executing, so shards are scanned concurrently
+    with ThreadPoolExecutor(max_workers=min(8, len(tenants))) as executor:
+        totals = pd.DataFrame(list(executor.map(_get_tenant_totals, tenants)))
+
+    all_row = totals.drop(columns="tenant").sum()
+    all_row["tenant"] = "All"
+    totals = pd.concat([totals, all_row.to_frame().T], ignore_index=True)
+
+    # Turn sums and counts into averages. Counts stay integers in both
+    # layouts (the long layout's sums come back as floats).
+    summary = totals[["tenant"]].assign(responses=totals["responses"].astype(int))
+    for q in get_question_columns("scale"):
+        counts = totals[f"{q}_count"].astype(float)
+        summary[q] = (totals[f"{q}_sum"].astype(float) / counts.where(counts > 0)).round(3)
+
+    return summary.set_index("tenant")
+
+# Tables derived from the responses, by the name used on the command line
+REBUILDS = {
+    "cube": rebuild_cube,
+    "text-counts": rebuild_text_counts,
+    "comment-index": rebuild_comment_index,
+    "themes": rebuild_themes,
+    "forecasts": rebuild_forecasts
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild tables derived from the stored responses.")
+    parser.add_argument("table", choices=list(REBUILDS),
+                        help="text-counts after changing the stop words or topic lexicon, themes to "
+                             "re-cluster comments, cube, comment-index and forecasts after editing responses")
+    parser.add_argument("--tenant", action="append", help="Tenant to rebuild (repeatable; default: all)")
+    args = parser.parse_args()
+
+    for tenant in args.tenant or list_tenants():
+        start = time.perf_counter()
+        REBUILDS[args.table](tenant)
+        print(f"Rebuilt {args.table} for {tenant} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Vectorized synthetic survey responses, for demo data and the benchmarks.
+
+Generates realistic-looking check-ins at any scale without per-row Python:
+
+- departments follow a Zipf-like size distribution, so a few large
+  departments dominate, and locations have fixed skewed shares
+- timestamps follow weekly and yearly seasonality: most check-ins land on
+  Thursdays and Fridays in working hours, with fewer in August and December
+- scores come from a latent wellbeing level per response, made of a
+  department baseline, a winter dip and noise, so questions correlate
+- free text is built from sentiment-matched phrase banks, with many blank
+  answers and one to three sentences otherwise
+
+Use ``generate_responses`` for a single DataFrame, or ``iter_responses`` to
+stream tens of millions of rows in fixed-size chunks.
+"""
+import numpy as np
+import pandas as pd
+
+from survey_questions import get_question_columns
+
+DEFAULT_DEPARTMENTS = [
+    "Engineering", "Sales", "Operations", "Customer Success", "Marketing", "Product",
+    "Finance", "HR", "Legal", "Data", "Design", "IT", "Facilities", "Research",
+    "Procurement", "Security", "Partnerships", "Communications", "Quality", "Strategy"
+]
+DEFAULT_LOCATIONS = ["Remote", "HQ", "Regional Office", "Other"]
+LOCATION_WEIGHTS = [0.45, 0.35, 0.15, 0.05]
+
+# Share of check-ins per weekday (Monday first)
+WEEKDAY_WEIGHTS = [0.12, 0.13, 0.15, 0.25, 0.30, 0.03, 0.02]
+
+# Relative check-in volume per month (January first)
+MONTH_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 1.0, 0.95, 0.85, 0.6, 1.0, 1.0, 0.95, 0.7]
+
+# Probability that an open text answer is left blank
+BLANK_TEXT_PROBABILITY = {0: 0.4, 1: 0.7}
+
+PHRASES = {
+    "negative": [
+        "There's too much work and not enough time.",
+        "Deadlines keep moving and the team is stressed.",
+        "I feel burned out after another busy week.",
+        "Communication from management has been poor.",
+        "I'm concerned about the project timeline.",
+        "Meetings take up most of my day.",
+        "I don't feel my work is recognised.",
+        "Workload has been overwhelming lately."
+    ],
+    "neutral": [
+        "It was a normal week.",
+        "Some days were busy, others were quiet.",
+        "Communication could be improved in our team.",
+        "We could use clearer priorities.",
+        "More focus time would help.",
+        "The new process is taking time to settle in.",
+        "Nothing major to report this week."
+    ],
+    "positive": [
+        "I'm feeling great about our team's progress.",
+        "My manager has been very supportive.",
+        "The workplace environment is positive and productive.",
+        "I learned a lot this week and enjoyed the challenge.",
+        "Collaboration with my colleagues was excellent.",
+        "Good balance between work and life this week.",
+        "Proud of what the team delivered together.",
+        "Career development conversations were really helpful."
+    ]
+}
+
+def _department_weights(count, exponent=1.1):
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+def _phrase_combinations(phrases):
+    """Every one-, two- and three-sentence combination of a phrase bank"""
+    combos = list(phrases)
+    combos += [f"{a} {b}" for a in phrases for b in phrases if a != b]
+    combos += [f"{a} {b} {c}" for a, b, c in zip(phrases, phrases[1:], phrases[2:])]
+    return np.array(combos, dtype=object)
+
+_COMBINATIONS = {mood: _phrase_combinations(phrases) for mood, phrases in PHRASES.items()}
+
+def _timestamps(rng, n, start, end):
+    """Sample timestamps with weekday, hour and month seasonality"""
+    days = pd.date_range(start.normalize(), end.normalize(), freq="D")
+    weights = (np.array(WEEKDAY_WEIGHTS)[days.dayofweek.to_numpy()]
+               * np.array(MONTH_WEIGHTS)[days.month.to_numpy() - 1])
+    day_index = rng.choice(len(days), size=n, p=weights / weights.sum())
+
+    # Working-hours peak around 11:00 and 15:00
+    hours = np.clip(np.where(rng.random(n) < 0.5, rng.normal(11, 1.5, n), rng.normal(15, 1.5, n)), 0, 23.99)
+    seconds = (hours * 3600).astype(np.int64)
+
+    return days.to_numpy()[day_index] + seconds.astype("timedelta64[s]")
+
+def generate_responses(n, seed=0, start=None, end=None, departments=None, locations=None, chunk=0, id_offset=0,
+                       respondents=0):
+    """
+    Generate n synthetic survey responses as a DataFrame.
+
+    Department baselines depend only on seed, so chunks generated with the
+    same seed and different chunk numbers form one consistent dataset.
+    With respondents > 0 a respondent column assigns each response to one
+    of that many people, each belonging to a single department.
+    """
+    rng = np.random.default_rng([seed, chunk])
+    departments = np.array(departments or DEFAULT_DEPARTMENTS, dtype=object)
+    locations = np.array(locations or DEFAULT_LOCATIONS, dtype=object)
+
+    if end is None:
+        end = pd.Timestamp.now().floor("D")
+    if start is None:
+        start = end - pd.Timedelta(days=365)
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+
+    dept_index = rng.choice(len(departments), size=n, p=_department_weights(len(departments)))
+    location_weights = np.resize(LOCATION_WEIGHTS, len(locations))
+    location_index = rng.choice(len(locations), size=n, p=location_weights / location_weights.sum())
+    timestamps = _timestamps(rng, n, start, end)
+
+    # Latent wellbeing: department baseline + winter dip + individual noise
+    dept_baseline = np.random.default_rng(seed).normal(0, 0.35, len(departments))
+    month = pd.DatetimeIndex(timestamps).month.to_numpy()
+    seasonal = -0.25 * np.cos((month - 1) / 12 * 2 * np.pi)
+    latent = dept_baseline[dept_index] + seasonal + rng.normal(0, 0.8, n)
+
+    df = pd.DataFrame({
+        "response_id": np.char.add(f"syn-{seed}-", np.arange(id_offset, id_offset + n).astype(str)),
+        "timestamp": timestamps,
+        "department": departments[dept_index],
+        "location": locations[location_index]
+    })
+
+    if respondents:
+        # People are numbered within their department, so a respondent's
+        # check-ins never span departments
+        person = rng.integers(0, max(1, respondents // len(departments)), n)
+        df["respondent"] = np.char.add(np.char.add(dept_index.astype(str), "-"), person.astype(str))
+
+    for col in get_question_columns("scale"):
+        df[col] = np.clip(np.rint(3.2 + latent + rng.normal(0, 0.6, n)), 1, 5).astype(np.int64)
+
+    # Mood of the free text follows the latent wellbeing
+    mood = np.digitize(latent + rng.normal(0, 0.5, n), [-0.5, 0.5])
+    for i, col in enumerate(get_question_columns("text")):
+        text = np.full(n, "", dtype=object)
+        for mood_index, name in enumerate(["negative", "neutral", "positive"]):
+            mask = mood == mood_index
+            combos = _COMBINATIONS[name]
+            text[mask] = combos[rng.integers(0, len(combos), mask.sum())]
+        text[rng.random(n) < BLANK_TEXT_PROBABILITY.get(i, 0.7)] = ""
+        df[col] = text
+
+    return df
+
+def iter_responses(n, chunk_size=500000, seed=0, **kwargs):
+    """Yield n synthetic responses in DataFrame chunks of at most chunk_size"""
+    for chunk_index, offset in enumerate(range(0, n, chunk_size)):
+        yield generate_responses(
+            min(chunk_size, n - offset), seed=seed, chunk=chunk_index, id_offset=offset, **kwargs
+        )
@@ -0,0 +1,219 @@
+"""
+Forecasts of the departments' weekly scores.
+
+Each series (a department's weekly score of a metric) is smoothed with
+damped Holt exponential smoothing: a level and a trend, the trend fading
+by DAMPING every week so forecasts flatten out instead of running off the
+1-5 scale. Every series is smoothed with each pair of smoothing
+parameters in a small grid at once, as (parameters x series) numpy
+arrays updated one closed week at a time. Adding a week costs the same
+however long the history is, so models are updated as weeks close
+instead of refit from the start. Forecasts use, per series, the pair with
+the smallest one-step-ahead squared error so far.
+
+Weeks without a score (no answers, or fewer than MIN_GROUP_SIZE
+responses) are skipped: the level moves on by the trend and nothing is
+learned from them.
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+from privacy import MIN_GROUP_SIZE
+
+FORECAST_METRICS = ["wellbeing", "safety", "workload"]
+
+# Weeks forecast ahead
+FORECAST_WEEKS = int(os.environ.get("HURDL_FORECAST_WEEKS", "4"))
+
+# Smoothing parameters tried for every series: level (alpha) and trend (beta)
+ALPHAS = (0.1, 0.2, 0.3, 0.5, 0.7)
+BETAS = (0.05, 0.1, 0.2, 0.4)
+DAMPING = 0.9
+
+# Weeks with a score a series needs before it is forecast, and weeks
+# without one after which it is no longer forecast (e.g. a closed department)
+MIN_WEEKS = 4
+STALE_WEEKS = 8
+
+# Scores a department should stay on the right side of, and the side that
+# is at risk (workload is at risk when high)
+RISK_THRESHOLDS = {
+    "wellbeing": ("below", 3.0),
+    "safety": ("below", 3.0),
+    "workload": ("above", 3.5)
+}
+
+# z for the forecast bands (about 80%)
+BAND_Z = 1.28
+
+def weekly_scores(cells, min_group_size=MIN_GROUP_SIZE):
+    """
+    Department x week scores from cube cells of one metric's questions
+    rolled up to department and week (see database.get_cube). Weeks with
+    fewer than min_group_size responses are left out.
+    """
+    grouped = cells.groupby(["department", "week"])
+    totals = grouped[["n", "total"]].sum()
+    # A cell's responses are those to its most answered question
+    responses = grouped["n"].max()
+    scores = (totals["total"] / totals["n"]).where(responses >= min_group_size)
+    return scores.unstack("week")
+
+class HoltModel:
+    """Damped Holt smoothing of many weekly series, updated a week at a time"""
+
+    def __init__(self, alphas=ALPHAS, betas=BETAS, damping=DAMPING):
+        grid = np.array([(a, b) for a in alphas for b in betas], dtype=float).reshape(-1, 2)
+        self.alphas = grid[:, :1]
+        self.betas = grid[:, 1:]
+        self.damping = damping
+        self.keys = []
+        self._index = {}
+        # (parameters x series) state; levels are NaN until a series' first score
+        self.level = np.empty((len(grid), 0))
+        self.trend = np.empty((len(grid), 0))
+        self.sse = np.empty((len(grid), 0))
+        # Per series: one-step errors counted, weeks with a score, and
+        # weeks since the last one
+        self.errors = np.zeros(0, dtype=np.int64)
+        self.weeks = np.zeros(0, dtype=np.int64)
+        self.missed = np.zeros(0, dtype=np.int64)
+
+    def _add(self, keys):
+        for key in keys:
+            self._index[key] = len(self.keys)
+            self.keys.append(key)
+
+        pad = ((0, 0), (0, len(keys)))
+        self.level = np.pad(self.level, pad, constant_values=np.nan)
+        self.trend = np.pad(self.trend, pad)
+        self.sse = np.pad(self.sse, pad)
+        self.errors = np.pad(self.errors, (0, len(keys)))
+        self.weeks = np.pad(self.weeks, (0, len(keys)))
+        self.missed = np.pad(self.missed, (0, len(keys)))
+
+    def update(self, keys, values):
+        """
+        Fold one week into every series: values[i] is the week's score of
+        series keys[i] (NaN if it has none). Series not seen before are
+        added; series not in keys have no score this week.
+        """
+        new = [key for key in dict.fromkeys(keys) if key not in self._index]
+        if new:
+            self._add(new)
+
+        y = np.full(len(self.keys), np.nan)
+        y[[self._index[key] for key in keys]] = values
+        observed = ~np.isnan(y)
+        started = self.weeks > 0
+
+        # This week's forecast from last week's state
+        predicted = self.level + self.damping * self.trend
+        learn = observed & started
+        error = y - predicted
+        self.sse[:, learn] += error[:, learn] ** 2
+        self.errors += learn
+
+        level = np.where(learn, self.alphas * y + (1 - self.alphas) * predicted, predicted)
+        trend = np.where(learn, self.betas * (level - self.level) + (1 - self.betas) * self.damping * self.trend,
+                         self.damping * self.trend)
+
+        # A series' first score starts its level, without a trend
+        first = observed & ~started
+        level[:, first] = y[first]
+        trend[:, first] = 0
+
+        self.level, self.trend = level, trend
+        self.weeks += observed
+        self.missed = np.where(observed, 0, self.missed + 1)
+
+    def fit(self, keys, matrix):
+        """Fold weeks in order: matrix is series (keys) x weeks"""
+        matrix = np.asarray(matrix, dtype=float)
+        for week in range(matrix.shape[1]):
+            self.update(keys, matrix[:, week])
+        return self
+
+    def forecast(self, horizon=FORECAST_WEEKS):
+        """
+        Forecast every series that has enough recent weeks, with its best
+        parameters. Returns a DataFrame of key, weeks_ahead (0 is the
+        current smoothed level), forecast, lower and upper.
+        """
+        columns = ["key", "weeks_ahead", "forecast", "lower", "upper"]
+        ready = np.flatnonzero((self.weeks >= MIN_WEEKS) & (self.missed < STALE_WEEKS))
+        if not len(ready):
+            return pd.DataFrame(columns=columns)
+
+        best = np.argmin(self.sse[:, ready], axis=0)
+        level = self.level[best, ready]
+        trend = self.trend[best, ready]
+        sigma = np.sqrt(self.sse[best, ready] / np.maximum(self.errors[ready], 1))
+
+        # Damped trend: h weeks ahead adds (phi + phi^2 + ... + phi^h) trends
+        ahead = np.arange(horizon + 1)
+        steps = np.concatenate([[0], np.cumsum(self.damping ** ahead[1:])])
+        forecasts = level[:, None] + trend[:, None] * steps
+        # Bands widen with the square root of the weeks ahead (approximate)
+        spread = BAND_Z * sigma[:, None] * np.sqrt(ahead)
+
+        return pd.DataFrame({
+            "key": np.repeat(np.array(self.keys, dtype=object)[ready], horizon + 1),
+            "weeks_ahead": np.tile(ahead, len(ready)),
+            "forecast": np.clip(forecasts, 1, 5).ravel(),
+            "lower": np.clip(forecasts - spread, 1, 5).ravel(),
+            "upper": np.clip(forecasts + spread, 1, 5).ravel()
+        })
+
+    def to_bytes(self):
+        header = {"alphas": self.alphas.ravel().tolist(), "betas": self.betas.ravel().tolist(),
+                  "damping": self.damping, "keys": self.keys, "errors": self.errors.tolist(),
+                  "weeks": self.weeks.tolist(), "missed": self.missed.tolist()}
+        body = np.concatenate([self.level, self.trend, self.sse]).astype(np.float64).tobytes()
+        # Not compressed: smoothed states hardly compress, and zlib would
+        # cost most of a weekly update
+        return json.dumps(header).encode() + b"\n" + body
+
+    @classmethod
+    def from_bytes(cls, data):
+        header, body = bytes(data).split(b"\n", 1)
+        header = json.loads(header)
+
+        model = cls(damping=header["damping"])
+        model.alphas = np.array(header["alphas"])[:, None]
+        model.betas = np.array(header["betas"])[:, None]
+        model.keys = header["keys"]
+        model._index = {key: i for i, key in enumerate(model.keys)}
+        model.errors = np.array(header["errors"], dtype=np.int64)
+        model.weeks = np.array(header["weeks"], dtype=np.int64)
+        model.missed = np.array(header["missed"], dtype=np.int64)
+
+        state = np.frombuffer(body, dtype=np.float64).reshape(3, len(model.alphas), len(model.keys))
+        model.level, model.trend, model.sse = (part.copy() for part in state)
+        return model
+
+def risk_flags(forecasts, metric):
+    """
+    Departments whose score is past the metric's risk threshold, or
+    forecast to cross it, within the forecast. Returns department,
+    current (smoothed level), projected (the last week's forecast) and
+    weeks_to_threshold (0 if already past), soonest first.
+    """
+    columns = ["department", "current", "projected", "weeks_to_threshold"]
+    if forecasts.empty:
+        return pd.DataFrame(columns=columns)
+
+    side, threshold = RISK_THRESHOLDS[metric]
+    values = forecasts.pivot(index="department", columns="weeks_ahead", values="forecast")
+    past = (values < threshold) if side == "below" else (values > threshold)
+
+    flagged = past.any(axis=1).to_numpy()
+    flags = pd.DataFrame({
+        "department": values.index,
+        "current": values[0].to_numpy(),
+        "projected": values[values.columns[-1]].to_numpy(),
+        "weeks_to_threshold": past.to_numpy().argmax(axis=1)
+    })[flagged]
+    return flags.sort_values(["weeks_to_threshold", "projected"], ascending=[True, side == "below"],
+                             ignore_index=True)[columns]
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# The trace being recorded for the current script run, if profiling is on.
+# Streamlit runs every session's script in its own thread, and context
+# variables keep each run's spans separate.
+_current_trace = contextvars.ContextVar("hurdl_current_trace", default=None)
+
+class Trace:
+    """Timing spans recorded during one script run"""
+
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self._stack = []
+
+    def record(self, name, category, start, end, depth, nested):
+        self.spans.append({
+            "name": name,
+            "category": category,
+            "start_ms": (start - self.start) * 1000,
+            "duration_ms": (end - start) * 1000,
+            "depth": depth,
+            "nested": nested,
+            "thread": threading.get_ident()
+        })
+
+    def totals_by_category(self):
+        """Sum span time per category, counting nested same-category spans once"""
+        totals = {}
+        for s in self.spans:
+            if not s["nested"]:
+                totals[s["category"]] = totals.get(s["category"], 0) + s["duration_ms"]
+        return totals
+
+def start_trace(name="rerun"):
+    """Start recording spans for the current script run"""
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    return trace, token
+
+def end_trace(trace, token):
+    """Stop recording spans and return the finished trace"""
+    trace.duration = (time.perf_counter() - trace.start) * 1000
+    _current_trace.reset(token)
+    return trace
+
+@contextmanager
+def profile_run(name="rerun", enabled=True):
+    """Record a trace for the enclosed block, yielding the trace (or None)"""
+    if not enabled:
+        yield None
+        return
+
+    trace, token = start_trace(name)
+    try:
+        yield trace
+    finally:
+        end_trace(trace, token)
+
+@contextmanager
+def span(name, category="app"):
+    """Time a block of code as a span in the current trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        # Profiling is off, so cost is a single context variable lookup
+        yield
+        return
+
+    nested = category in trace._stack
+    depth = len(trace._stack)
+    trace._stack.append(category)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace._stack.pop()
+        trace.record(name, category, start, time.perf_counter(), depth, nested)
+
+def traced(category, name=None):
+    """Decorator that records each call of a function as a span"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+def to_chrome_trace(traces):
+    """
+    Convert traces to the Chrome Trace Event format.
+
+    The result can be opened in chrome://tracing, Perfetto or speedscope.
+    """
+    events = []
+    for trace in traces:
+        for s in trace.spans:
+            events.append({
+                "name": s["name"],
+                "cat": s["category"],
+                "ph": "X",
+                "ts": round(trace.wall_start * 1e6 + s["start_ms"] * 1000),
+                "dur": round(s["duration_ms"] * 1000),
+                "pid": os.getpid(),
+                "tid": s["thread"],
+                "args": {"run": trace.name}
+            })
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def export_chrome_trace(traces, path):
+    """Write traces to a local file in Chrome Trace Event format"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, "w") as f:
+        json.dump(to_chrome_trace(traces), f)
+
+    return path
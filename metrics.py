@@ -0,0 +1,247 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """Base class for metrics collected in-process"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _init_unlabelled(self, state):
+        # Unlabelled metrics are exported as zero before the first update
+        if not self.labelnames:
+            self._values[()] = state
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, label values, extra label, value) tuples"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, values, extra, value in self.samples():
+            labels = _format_labels(self.labelnames, values, extra)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    """A monotonically increasing count"""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._init_unlabelled(0)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "", key, None, value
+
+class Gauge(Metric):
+    """A value that can go up and down, e.g. a current size"""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._init_unlabelled(0)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "", key, None, value
+
+class Histogram(Metric):
+    """Counts observations (e.g. latencies) into cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._init_unlabelled([[0] * (len(self.buckets) + 1), 0.0, 0])
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Index of the first bucket whose upper bound is >= value
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the enclosed block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                yield "_bucket", key, ("le", _format_value(bound)), cumulative
+            yield "_sum", key, None, total
+            yield "_count", key, None, count
+
+class Registry:
+    """The set of metrics exposed by this process"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Register a metric, returning the existing one if the name is taken"""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name, documentation, labelnames=()):
+    """Get or create a counter in the default registry"""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name, documentation, labelnames=()):
+    """Get or create a gauge in the default registry"""
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Get or create a histogram in the default registry"""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+# Metrics shared across the app's code paths
+SUBMISSIONS = counter("hurdl_survey_submissions_total", "Completed survey submissions", ["status"])
+SAVE_RESPONSE_SECONDS = histogram("hurdl_save_response_seconds", "Latency of saving responses to the database")
+DB_WRITE_RETRIES = counter("hurdl_db_write_retries_total", "Database writes retried after finding the database locked")
+LOAD_RESPONSES_REQUESTS = counter("hurdl_load_responses_requests_total", "Calls to the cached load_responses")
+LOAD_RESPONSES_MISSES = counter("hurdl_load_responses_cache_misses_total", "load_responses calls that hit the database")
+OPENAI_REQUEST_SECONDS = histogram("hurdl_openai_request_seconds", "Latency of OpenAI chat completion calls", ["call"])
+OPENAI_ERRORS = counter("hurdl_openai_errors_total", "Failed OpenAI chat completion calls", ["call"])
+SCRIPT_RUNS = counter("hurdl_script_runs_total", "Script executions, each a server round trip", ["page"])
+DASHBOARD_RENDER_SECONDS = histogram("hurdl_dashboard_render_seconds", "Time to render the HR dashboard")
+THEME_UPDATE_SECONDS = histogram("hurdl_theme_update_seconds", "Time to cluster a mini-batch of comments into themes")
+THEME_UPDATE_ERRORS = counter("hurdl_theme_update_errors_total", "Background comment clustering runs that failed")
+FORECAST_UPDATE_ERRORS = counter("hurdl_forecast_update_errors_total", "Background forecast updates that failed")
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the registry at /metrics"""
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the Streamlit log
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port, addr="127.0.0.1"):
+    """
+    Serve /metrics from a background thread, once per process.
+
+    Returns the server; with port 0 the OS picks a free port, available
+    as server.server_address[1].
+    """
+    global _server
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((addr, port), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="hurdl-metrics", daemon=True).start()
+
+    return _server
@@ -0,0 +1,129 @@
+"""
+Minimum group sizes for everything the HR dashboard shows.
+
+The check-in promises anonymity, so no chart or metric may describe fewer
+than MIN_GROUP_SIZE respondents (k). Aggregates keep the number of
+responses in each group next to its values, and groups are suppressed from
+those counts, vectorized over all groups at once, in two rounds:
+
+- primary: groups with fewer than k responses
+- complementary: a total over groups (the overall line above a per
+  department series, the dashboard's totals) minus the groups still shown
+  would give away a lone suppressed group, so the smallest other group in
+  that total is suppressed too. This is repeated along every dimension
+  until no total is left with exactly one suppressed group.
+
+Suppressed groups are dropped from the results, so charts never receive
+them.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+# k: the fewest responses a shown group may contain
+MIN_GROUP_SIZE = int(os.environ.get("HURDL_MIN_GROUP_SIZE", "5"))
+
+def _group_ids(codes, size):
+    """One integer per distinct combination of the given dimension codes"""
+    if not codes:
+        return np.zeros(size, dtype=np.int64)
+    combined = np.ravel_multi_index(codes, [c.max() + 1 for c in codes])
+    return pd.factorize(combined)[0]
+
+def _lone(suppressed, groups):
+    """Cells in a total (group) that has exactly one suppressed cell"""
+    return (np.bincount(groups, weights=suppressed) == 1)[groups]
+
+def _protect_totals(counts, suppressed, totals, axis):
+    """
+    Suppress one more cell in every total along an axis that has exactly
+    one suppressed cell. Returns whether anything changed.
+
+    Cells are preferred that also sit in such a total along another axis,
+    as they protect both; then cells in the same crossing totals as other
+    totals' candidates (e.g. the same column for several rows), so the
+    totals pick matching cells instead of spreading suppression across
+    the grid; then the smallest.
+    """
+    groups = totals[axis]
+    candidates = np.flatnonzero(_lone(suppressed, groups) & ~suppressed & (counts > 0))
+    if not len(candidates):
+        return False
+
+    shared = np.zeros(len(candidates))
+    popularity = np.zeros(len(candidates))
+    mass = np.zeros(len(candidates))
+    for other, other_groups in enumerate(totals):
+        if other == axis:
+            continue
+        crossing = other_groups[candidates]
+        shared += _lone(suppressed, other_groups)[candidates]
+        popularity += np.bincount(crossing)[crossing]
+        mass += np.bincount(crossing, weights=counts[candidates])[crossing]
+
+    # Sort by total, then preference, and take the first cell of each total
+    order = np.lexsort((counts[candidates], mass, -popularity, -shared, groups[candidates]))
+    candidates = candidates[order]
+    _, first = np.unique(groups[candidates], return_index=True)
+    suppressed[candidates[first]] = True
+    return True
+
+def suppression_mask(counts, keys=(), k=MIN_GROUP_SIZE):
+    """
+    Which cells of an aggregate to hide.
+
+    counts holds each cell's number of responses and keys one array per
+    dimension labelling the cells (e.g. period and department). Totals are
+    taken along each dimension; with no keys the only total is the grand
+    total. Returns a boolean array, True for cells to hide.
+    """
+    counts = np.nan_to_num(np.asarray(counts, dtype=float))
+    suppressed = (counts > 0) & (counts < k)
+    if not suppressed.any():
+        return suppressed
+
+    codes = [pd.factorize(np.asarray(key))[0] for key in keys]
+    if codes:
+        # Totals along a dimension: one per combination of the others
+        totals = [_group_ids(codes[:i] + codes[i + 1:], len(counts)) for i in range(len(codes))]
+    else:
+        totals = [_group_ids([], len(counts))]
+
+    changed = True
+    while changed:
+        changed = False
+        for axis in range(len(totals)):
+            changed |= _protect_totals(counts, suppressed, totals, axis)
+
+    return suppressed
+
+def protect(df, dimensions, count_column="responses", k=MIN_GROUP_SIZE):
+    """
+    Drop the cells of an aggregate that would identify fewer than k respondents.
+
+    The dashboard's aggregates take this as min_group_size: groups (or time
+    bins) with fewer than k responses are left out, along with the groups
+    suppressed alongside them so that no total gives a left-out group away.
+    """
+    if df.empty or not k or k <= 1:
+        return df
+
+    mask = suppression_mask(df[count_column].to_numpy(), [df[d].to_numpy() for d in dimensions], k)
+    if not mask.any():
+        return df
+    return df[~mask].reset_index(drop=True)
+
+def group_means(df, by, columns, k=MIN_GROUP_SIZE):
+    """
+    Mean of each column per group, with the group's number of responses,
+    keeping only groups that can be shown.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    grouped = df.groupby(by, observed=True)
+    result = grouped[columns].mean()
+    result["responses"] = grouped.size()
+    return protect(result.reset_index(), by, k=k)
+
+def is_reportable(count, k=MIN_GROUP_SIZE):
+    """Whether a single group of count responses may be shown"""
+    return not k or count >= k
@@ -0,0 +1,287 @@
+"""
+Compact per-session state for employee check-ins.
+
+Streamlit keeps a session's st.session_state for as long as its browser
+tab stays open, so whatever a session puts there is held per employee
+however long the tab sits idle. Sessions keep only small flags and widget
+values in st.session_state; the chatbot conversation and the survey
+answers it refers to live in this process-wide store instead, keyed by a
+random session id:
+
+- Only the last CHAT_MEMORY_TURNS exchanges are kept in memory, and sent to
+  the model. Older messages are offloaded to a local SQLite file, private
+  to this process and deleted when it exits, and only read back to show
+  the whole conversation.
+- Each session's size is measured whenever it changes, so the store knows
+  the memory per session and in total (hurdl_session_store_bytes).
+- Sessions untouched for SESSION_IDLE_SECONDS are evicted together with
+  their offloaded messages; an employee returning to an old tab starts a
+  new conversation.
+"""
+import os
+import sys
+import time
+import atexit
+import sqlite3
+import tempfile
+import threading
+from metrics import counter, gauge
+
+# Chat exchanges (a message and its reply) kept in memory per session
+CHAT_MEMORY_TURNS = int(os.environ.get("HURDL_CHAT_MEMORY_TURNS", "5"))
+
+# Sessions not used for this long are evicted
+SESSION_IDLE_SECONDS = float(os.environ.get("HURDL_SESSION_IDLE_SECONDS", "1800"))
+
+# Where each process keeps its file of offloaded chat messages
+CHAT_STORE_DIR = os.environ.get("HURDL_CHAT_STORE_DIR") or tempfile.gettempdir()
+
+# Idle sessions are looked for at most this often
+SWEEP_INTERVAL_SECONDS = 60
+
+SESSIONS_ACTIVE = gauge("hurdl_sessions_active", "Sessions with state in the session store")
+SESSION_STORE_BYTES = gauge("hurdl_session_store_bytes", "Approximate memory held by the session store")
+SESSIONS_EVICTED = counter("hurdl_sessions_evicted_total", "Sessions evicted after being idle")
+CHAT_MESSAGES_OFFLOADED = counter("hurdl_chat_messages_offloaded_total", "Chat messages moved out of memory")
+
+def deep_size(value, seen=None):
+    """Approximate bytes held by a value and everything it refers to"""
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in value)
+    elif hasattr(value, "__slots__"):
+        size += sum(deep_size(getattr(value, name), seen) for name in value.__slots__ if hasattr(value, name))
+    return size
+
+class ChatSession:
+    """One session's conversation: the newest messages, as (role, content)"""
+
+    __slots__ = ("survey_responses", "messages", "offloaded", "last_seen", "size")
+
+    def __init__(self, survey_responses, now):
+        self.survey_responses = dict(survey_responses or {})
+        self.messages = []
+        # Number of older messages moved to the archive
+        self.offloaded = 0
+        self.last_seen = now
+        self.size = 0
+
+    @property
+    def message_count(self):
+        return self.offloaded + len(self.messages)
+
+class ChatArchive:
+    """Offloaded chat messages, in a SQLite file created on first use"""
+
+    def __init__(self, directory=CHAT_STORE_DIR):
+        self.directory = directory
+        self.path = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, self.path = tempfile.mkstemp(prefix="hurdl-chat-", suffix=".db", dir=self.directory)
+            os.close(fd)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE chat_messages (session_id TEXT, seq INTEGER, role TEXT, content TEXT, "
+                "PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+            )
+            # Messages never outlive the process that held the sessions
+            atexit.register(self.close)
+        return self._conn
+
+    def append(self, session_id, first_seq, messages):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO chat_messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                    [(session_id, first_seq + i, role, content) for i, (role, content) in enumerate(messages)]
+                )
+
+    def load(self, session_id):
+        with self._lock:
+            if self._conn is None:
+                return []
+            return self._conn.execute(
+                "SELECT role, content FROM chat_messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+
+    def delete(self, session_ids):
+        with self._lock:
+            if self._conn is None or not session_ids:
+                return
+            with self._conn:
+                self._conn.executemany("DELETE FROM chat_messages WHERE session_id = ?",
+                                       [(session_id,) for session_id in session_ids])
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.close()
+            self._conn = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+class SessionStore:
+    """Chat sessions by session id, bounded in memory and evicted when idle"""
+
+    def __init__(self, memory_turns=CHAT_MEMORY_TURNS, idle_seconds=SESSION_IDLE_SECONDS,
+                 archive=None, clock=time.monotonic):
+        self.memory_messages = 2 * memory_turns
+        self.idle_seconds = idle_seconds
+        self.archive = archive or ChatArchive()
+        self.clock = clock
+        self._sessions = {}
+        self._total_size = 0
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+
+    def _resize(self, chat):
+        # Caller holds the lock
+        size = deep_size(chat)
+        self._total_size += size - chat.size
+        chat.size = size
+        SESSION_STORE_BYTES.set(self._total_size)
+
+    def _remove(self, session_id):
+        # Caller holds the lock
+        chat = self._sessions.pop(session_id)
+        self._total_size -= chat.size
+        SESSION_STORE_BYTES.set(self._total_size)
+        SESSIONS_ACTIVE.set(len(self._sessions))
+        return chat
+
+    def start_chat(self, session_id, survey_responses):
+        """Begin a conversation about a completed check-in, replacing any earlier one"""
+        self.end(session_id)
+        now = self.clock()
+        chat = ChatSession(survey_responses, now)
+
+        with self._lock:
+            self._sessions[session_id] = chat
+            self._resize(chat)
+            SESSIONS_ACTIVE.set(len(self._sessions))
+
+        self.evict_idle(now, only_if_due=True)
+        return chat
+
+    def get(self, session_id):
+        """A session's conversation, or None if it never started or was evicted"""
+        now = self.clock()
+        with self._lock:
+            chat = self._sessions.get(session_id)
+            if chat is not None:
+                chat.last_seen = now
+
+        self.evict_idle(now, only_if_due=True)
+        return chat
+
+    def add_message(self, session_id, role, content):
+        """Add a message, offloading the oldest beyond the in-memory limit"""
+        with self._lock:
+            chat = self._sessions.get(session_id)
+            if chat is None:
+                return
+            chat.last_seen = self.clock()
+            chat.messages.append((role, content))
+
+            overflow = chat.messages[:-self.memory_messages] if self.memory_messages else chat.messages[:]
+            first_seq = chat.offloaded
+            if overflow:
+                del chat.messages[:len(overflow)]
+                chat.offloaded += len(overflow)
+            self._resize(chat)
+
+        if overflow:
+            self.archive.append(session_id, first_seq, overflow)
+            CHAT_MESSAGES_OFFLOADED.inc(len(overflow))
+
+    def _snapshot(self, session_id):
+        """A copy of a session's in-memory messages and its offloaded count"""
+        with self._lock:
+            chat = self._sessions.get(session_id)
+            if chat is None:
+                return [], 0
+            return list(chat.messages), chat.offloaded
+
+    def recent_messages(self, session_id):
+        """The messages kept in memory, oldest first, as chat message dicts"""
+        messages, _ = self._snapshot(session_id)
+        return [{"role": role, "content": content} for role, content in messages]
+
+    def history(self, session_id):
+        """The whole conversation, reading offloaded messages back if needed"""
+        messages, offloaded = self._snapshot(session_id)
+        # Messages offloaded after the snapshot are still in its copy
+        older = self.archive.load(session_id)[:offloaded] if offloaded else []
+        return [{"role": role, "content": content} for role, content in older + messages]
+
+    def end(self, session_id):
+        """Forget a session's conversation"""
+        with self._lock:
+            chat = self._sessions.get(session_id)
+            if chat is not None:
+                self._remove(session_id)
+
+        if chat is not None and chat.offloaded:
+            self.archive.delete([session_id])
+
+    def evict_idle(self, now=None, only_if_due=False):
+        """Evict sessions idle for longer than idle_seconds; returns how many"""
+        now = self.clock() if now is None else now
+
+        with self._lock:
+            if only_if_due and now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+                return 0
+            self._last_sweep = now
+
+            idle = [sid for sid, chat in self._sessions.items() if now - chat.last_seen > self.idle_seconds]
+            offloaded = []
+            for session_id in idle:
+                if self._remove(session_id).offloaded:
+                    offloaded.append(session_id)
+
+        self.archive.delete(offloaded)
+        SESSIONS_EVICTED.inc(len(idle))
+        return len(idle)
+
+    def stats(self):
+        """Sessions held and their approximate memory in bytes"""
+        with self._lock:
+            sizes = [chat.size for chat in self._sessions.values()]
+            offloaded = sum(chat.offloaded for chat in self._sessions.values())
+
+        return {
+            "sessions": len(sizes),
+            "total_bytes": self._total_size,
+            "mean_bytes": round(self._total_size / len(sizes)) if sizes else 0,
+            "max_bytes": max(sizes, default=0),
+            "offloaded_messages": offloaded
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store():
+    """The process's session store, created on first use"""
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+        return _store
@@ -0,0 +1,265 @@
+"""
+Cache shared by every Streamlit worker serving the app.
+
+st.cache_data is per process, so replicas behind a load balancer would each
+load and analyse the same data. Entries here are keyed by a namespace, a
+key and a data version (see database.get_data_version): every worker asks
+for the same versioned key, one of them computes it while the others wait,
+and the rest read the stored result. A new version simply misses, so
+workers never serve a result older than the data they were asked about.
+
+Backends:
+- DiskCache: pickled entries in a directory all workers on the host can
+  read (HURDL_SHARED_CACHE_DIR), with file locks so each entry is computed
+  once per version across processes.
+- MemoryCache: an in-process stand-in for a networked cache such as Redis
+  or memcached, storing serialized values the way a remote store would.
+
+Set HURDL_SHARED_CACHE to "disk", "memory" or "off" (default). The cache is
+opt-in, like the shared dataset: a single worker gains nothing from it, and
+the disk backend writes every tenant's responses, comments included, to
+HURDL_SHARED_CACHE_DIR. When it is off, each worker keeps to its own
+st.cache_data.
+"""
+import os
+import glob
+import pickle
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from metrics import counter
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process file locks (Windows); entries may then be computed
+    # once per worker instead of once per host
+    fcntl = None
+
+SHARED_CACHE = os.environ.get("HURDL_SHARED_CACHE", "off")
+SHARED_CACHE_DIR = os.environ.get("HURDL_SHARED_CACHE_DIR", "data/cache")
+
+# Entries kept before the least recently written are removed
+MAX_ENTRIES = int(os.environ.get("HURDL_SHARED_CACHE_ENTRIES", "256"))
+
+SHARED_CACHE_REQUESTS = counter("hurdl_shared_cache_requests_total", "Shared cache lookups", ["namespace", "result"])
+
+def _digest(namespace, key):
+    """Stable name for a namespace and key, the same in every process"""
+    return hashlib.sha256(repr((namespace, key)).encode("utf-8")).hexdigest()[:32]
+
+class SharedCache:
+    """Versioned get-or-compute on top of a backend's get, set and lock"""
+
+    def get(self, namespace, key, version):
+        """Return (True, value) for a stored entry, else (False, None)"""
+        raise NotImplementedError
+
+    def set(self, namespace, key, version, value):
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, namespace, key):
+        """Hold the lock for computing one entry"""
+        raise NotImplementedError
+
+    def get_or_compute(self, namespace, key, version, compute):
+        """
+        Return the entry for (namespace, key, version), calling compute() to
+        create it if no worker has yet. Concurrent callers wait for the one
+        computing it instead of repeating the work.
+        """
+        found, value = self.get(namespace, key, version)
+        if found:
+            SHARED_CACHE_REQUESTS.inc(namespace=namespace, result="hit")
+            return value
+
+        with self.lock(namespace, key):
+            # Another worker may have stored it while we waited for the lock
+            found, value = self.get(namespace, key, version)
+            if found:
+                SHARED_CACHE_REQUESTS.inc(namespace=namespace, result="hit")
+                return value
+
+            SHARED_CACHE_REQUESTS.inc(namespace=namespace, result="miss")
+            value = compute()
+            self.set(namespace, key, version, value)
+            return value
+
+class DiskCache(SharedCache):
+    """Pickled entries in a directory shared by the workers on one host"""
+
+    def __init__(self, directory=SHARED_CACHE_DIR, max_entries=MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._thread_locks = {}
+        self._thread_locks_guard = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, namespace, key, version):
+        return os.path.join(self.directory, f"{namespace}-{_digest(namespace, key)}-{version}.pkl")
+
+    def get(self, namespace, key, version):
+        try:
+            with open(self._path(namespace, key, version), "rb") as f:
+                return True, pickle.load(f)
+        except FileNotFoundError:
+            return False, None
+        except (EOFError, pickle.UnpicklingError):
+            # A damaged entry is recomputed and overwritten
+            return False, None
+
+    def set(self, namespace, key, version, value):
+        path = self._path(namespace, key, version)
+
+        # Write to a temporary file and rename it into place, so readers in
+        # other processes never see a partly written entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        # Older versions of this entry can never be asked for again
+        for stale in glob.glob(os.path.join(self.directory, f"{namespace}-{_digest(namespace, key)}-*.pkl")):
+            if stale != path:
+                self._remove(stale)
+
+        self._prune()
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            # Removed by another worker
+            pass
+
+    def _prune(self):
+        entries = glob.glob(os.path.join(self.directory, "*.pkl"))
+        if len(entries) <= self.max_entries:
+            return
+
+        def written(path):
+            try:
+                return os.path.getmtime(path)
+            except FileNotFoundError:
+                return 0
+
+        for path in sorted(entries, key=written)[:len(entries) - self.max_entries]:
+            self._remove(path)
+
+    @contextmanager
+    def lock(self, namespace, key):
+        name = f"{namespace}-{_digest(namespace, key)}"
+
+        with self._thread_locks_guard:
+            thread_lock = self._thread_locks.setdefault(name, threading.Lock())
+
+        # The thread lock serialises sessions within this worker, the file
+        # lock serialises workers
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+
+            with open(os.path.join(self.directory, f"{name}.lock"), "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.directory, "*.pkl")):
+            self._remove(path)
+
+class MemoryCache(SharedCache):
+    """
+    Local stand-in for a networked cache. Values are stored pickled, as a
+    remote store would hold them, so every hit returns an independent copy
+    and pays the same deserialization cost.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, namespace, key, version):
+        with self._guard:
+            entry = self._entries.get((namespace, _digest(namespace, key)))
+
+        if entry is None or entry[0] != version:
+            return False, None
+        return True, pickle.loads(entry[1])
+
+    def set(self, namespace, key, version, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._guard:
+            # Storing under the unversioned name replaces older versions
+            name = (namespace, _digest(namespace, key))
+            self._entries.pop(name, None)
+            self._entries[name] = (version, data)
+
+            # Dicts keep insertion order, so the first entries are the oldest
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    @contextmanager
+    def lock(self, namespace, key):
+        with self._guard:
+            lock = self._locks.setdefault((namespace, _digest(namespace, key)), threading.Lock())
+        with lock:
+            yield
+
+    def clear(self):
+        with self._guard:
+            self._entries.clear()
+
+class NoCache(SharedCache):
+    """Always computes; used when the shared cache is turned off"""
+
+    def get(self, namespace, key, version):
+        return False, None
+
+    def set(self, namespace, key, version, value):
+        pass
+
+    @contextmanager
+    def lock(self, namespace, key):
+        yield
+
+    def clear(self):
+        pass
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_shared_cache():
+    """The process's shared cache backend, created on first use"""
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            if SHARED_CACHE == "disk":
+                _cache = DiskCache()
+            elif SHARED_CACHE == "memory":
+                _cache = MemoryCache()
+            elif SHARED_CACHE == "off":
+                _cache = NoCache()
+            else:
+                raise ValueError(f"Unknown shared cache backend: {SHARED_CACHE!r}")
+        return _cache
+
+def set_shared_cache(cache):
+    """Replace the process's shared cache backend (e.g. in benchmarks)"""
+    global _cache
+
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,138 @@
+"""
+Responses published once into shared memory for every worker on the host.
+
+A loader process reads each tenant's responses and writes them as an Arrow
+IPC file under HURDL_DATASET_DIR (/dev/shm/hurdl by default, which is
+memory-backed on Linux). Workers memory-map the file and get DataFrames
+whose columns point straight into the mapping, so the responses are held
+once per host rather than once per worker, and attaching costs a few
+milliseconds instead of a full read.
+
+The frames are read-only views: analysis code can filter, group and add
+columns to its own copy, but cannot change values in place.
+
+Refreshes write a new file and rename it over the old one, so a worker
+sees either the old or the new dataset, never a partial one. Frames
+attached to the old file stay valid until the last one is released.
+
+Run the loader next to the app and set HURDL_SHARED_DATASET=1 for workers:
+
+    python -m shared_dataset --interval 2
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+import pyarrow as pa
+
+import database
+
+DATASET_DIR = os.environ.get("HURDL_DATASET_DIR") or (
+    "/dev/shm/hurdl" if os.path.isdir("/dev/shm") else "data/dataset"
+)
+
+# Workers only attach when asked to, since a loader must be running
+SHARED_DATASET = os.environ.get("HURDL_SHARED_DATASET") == "1"
+
+# Files attached by this process: path -> (file identity, data version, frame)
+_attached = {}
+_attached_lock = threading.Lock()
+
+def get_dataset_path(tenant=None, directory=DATASET_DIR):
+    """Where a tenant's published responses live"""
+    tenant = tenant or database.DEFAULT_TENANT
+    # Validates the tenant name, which becomes part of a file name
+    database.get_db_path(tenant)
+    return os.path.join(directory, f"{tenant}.arrow")
+
+def _to_table(df, version):
+    arrays = {}
+    for column in df.columns:
+        values = df[column]
+        if values.dtype.kind == "f":
+            # Keep NaN as a value rather than a null, so the column maps
+            # back to float64 without a copy
+            arrays[column] = pa.array(values.to_numpy())
+        else:
+            arrays[column] = pa.Array.from_pandas(values)
+
+    table = pa.table(arrays)
+    return table.replace_schema_metadata({b"data_version": str(version).encode()})
+
+def publish_responses(tenant=None, directory=DATASET_DIR):
+    """Write a tenant's responses to shared memory, returning their data version"""
+    # Read the version first: if a response arrives meanwhile, the file is
+    # labelled older than its contents and simply republished next time
+    version = database.get_data_version(tenant)
+    table = _to_table(database.get_responses(tenant), version)
+
+    path = get_dataset_path(tenant, directory)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return version
+
+def attach_responses(tenant=None, directory=DATASET_DIR):
+    """
+    Get (data version, DataFrame) for a tenant's published responses, or
+    (None, None) if the loader hasn't published them.
+
+    The mapping is reused until the loader swaps in a new file. Each call
+    returns a shallow copy, so columns added by one caller are not seen by
+    another.
+    """
+    path = get_dataset_path(tenant, directory)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None, None
+    identity = (stat.st_ino, stat.st_mtime_ns)
+
+    with _attached_lock:
+        entry = _attached.get(path)
+        if entry is None or entry[0] != identity:
+            table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+            version = int(table.schema.metadata[b"data_version"])
+            # split_blocks keeps one array per column, so no columns are
+            # consolidated (copied) into 2D blocks
+            entry = (identity, version, table.to_pandas(split_blocks=True, use_threads=False))
+            _attached[path] = entry
+
+    return entry[1], entry[2].copy(deep=False)
+
+def run_loader(tenants=None, interval=2.0, directory=DATASET_DIR, once=False):
+    """Republish each tenant's responses whenever its data version changes"""
+    published = {}
+
+    while True:
+        for tenant in tenants or database.list_tenants():
+            version = database.get_data_version(tenant)
+            if published.get(tenant) != version:
+                published[tenant] = publish_responses(tenant, directory)
+
+        if once:
+            return published
+        time.sleep(interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish responses to shared memory for the app's workers")
+    parser.add_argument("--tenant", action="append", help="Tenant to publish (default: every tenant)")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between checks for new responses")
+    parser.add_argument("--dir", default=DATASET_DIR, help="Directory to publish to")
+    parser.add_argument("--once", action="store_true", help="Publish once and exit")
+    args = parser.parse_args()
+
+    run_loader(args.tenant, args.interval, args.dir, args.once)
+
+if __name__ == "__main__":
+    main()
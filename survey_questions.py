@@ -1,14 +1,33 @@
-def get_survey_questions():
-    """
-    Returns the survey questions for the weekly check-in.
-    
-    Each question has:
-    - id: unique identifier for the question
-    - text: the question text
-    - type: type of question (scale, text, radio, header)
-    - options: for radio questions, a list of possible options
-    """
-    return [
+"""
+The survey definitions and their compiled, read-only form.
+
+Each survey version is a list of question dicts:
+- id: unique identifier for the question
+- text: the question text
+- type: type of question (scale, text, radio, header)
+- options: for radio questions, a list of possible options
+- label: short name used in charts
+- metrics: the aggregate metrics (wellbeing, safety, workload, sentiment)
+  the question contributes to
+
+The rest of the app derives the database schema, metric groupings and
+chart labels from these lists, so adding a question only means adding it
+here. Change a live survey by adding a new version rather than editing one
+in place: sessions that started on the old version finish on it, and each
+saved response records the version it answered.
+
+Every version is validated and compiled once, on import, into a Survey
+whose step -> question and step -> section header lookups are plain tuple
+indexing.
+"""
+import os
+import re
+import copy
+from types import MappingProxyType
+
+# Survey versions, oldest first
+SURVEY_DEFINITIONS = {
+    1: [
         {
             "id": "wellbeing_header",
             "text": "Personal Wellbeing",
@@ -17,22 +36,30 @@ def get_survey_questions():
         {
             "id": 1,
             "text": "Overall, how would you rate your wellbeing at work this week?",
-            "type": "scale"
+            "type": "scale",
+            "label": "Overall Wellbeing",
+            "metrics": ["wellbeing"]
         },
         {
             "id": 2,
             "text": "I felt a good work-life balance this week.",
-            "type": "scale"
+            "type": "scale",
+            "label": "Work-Life Balance",
+            "metrics": ["wellbeing"]
         },
         {
             "id": 3,
             "text": "My workload felt manageable this week.",
-            "type": "scale"
+            "type": "scale",
+            "label": "Stress Level",
+            "metrics": ["wellbeing", "workload"]
         },
         {
             "id": 4,
             "text": "I felt satisfied with my work this week.",
-            "type": "scale"
+            "type": "scale",
+            "label": "Job Satisfaction",
+            "metrics": ["wellbeing"]
         },
         {
             "id": "safety_header",
@@ -42,22 +69,30 @@ def get_survey_questions():
         {
             "id": 5,
             "text": "I felt psychologically safe in my team this week.",
-            "type": "scale"
+            "type": "scale",
+            "label": "Team Psychological Safety",
+            "metrics": ["safety"]
         },
         {
             "id": 6,
             "text": "I felt comfortable speaking up and sharing ideas this week.",
-            "type": "scale"
+            "type": "scale",
+            "label": "Speaking Up Comfort",
+            "metrics": ["safety"]
         },
         {
             "id": 7,
             "text": "I felt supported by my manager/team when I needed help.",
-            "type": "scale"
+            "type": "scale",
+            "label": "Management Support",
+            "metrics": ["safety", "workload"]
         },
         {
             "id": 8,
             "text": "Mistakes are treated as opportunities to learn in my team.",
-            "type": "scale"
+            "type": "scale",
+            "label": "Mistake Tolerance",
+            "metrics": ["safety"]
         },
         {
             "id": "feedback_header",
@@ -67,11 +102,195 @@ def get_survey_questions():
         {
             "id": 9,
             "text": "How are you feeling about work this week? Any specific highs or lows?",
-            "type": "text"
+            "type": "text",
+            "label": "How are you feeling about work?",
+            "metrics": ["sentiment"]
         },
         {
             "id": 10,
             "text": "Do you have any suggestions for improving our workplace or team environment?",
-            "type": "text"
+            "type": "text",
+            "label": "Any additional feedback?",
+            "metrics": ["sentiment"]
         }
     ]
+}
+
+# Database column type for each answerable question type
+COLUMN_TYPES = {
+    "scale": "INTEGER",
+    "text": "TEXT",
+    "radio": "TEXT"
+}
+
+METRICS = ("wellbeing", "safety", "workload", "sentiment")
+
+# Question ids become column names in SQL, so keep them to a safe set
+QUESTION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_]{1,48}$")
+
+class Question:
+    """One answerable survey question. Read-only once compiled."""
+
+    __slots__ = ("id", "column", "step", "text", "type", "options", "label", "metrics")
+
+    def __init__(self, id, step, text, type, options=(), label=None, metrics=()):
+        values = {
+            "id": id,
+            "column": f"q_{id}",
+            "step": step,
+            "text": text,
+            "type": type,
+            "options": tuple(options),
+            "label": label or text,
+            "metrics": tuple(metrics)
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Survey questions are read-only")
+
+    def __repr__(self):
+        return f"Question({self.column}, step={self.step}, type={self.type!r})"
+
+class Survey:
+    """
+    A compiled survey version. Steps are numbered from 1, one per
+    answerable question; headers are shown before the first question of
+    their section.
+    """
+
+    __slots__ = ("version", "questions", "headers", "total_questions", "columns")
+
+    def __init__(self, version, questions, headers):
+        values = {
+            "version": version,
+            "questions": tuple(questions),
+            # headers[i]: texts of the headers shown before step i + 1
+            "headers": tuple(headers),
+            "total_questions": len(questions),
+            "columns": tuple(q.column for q in questions)
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Compiled surveys are read-only")
+
+    def question(self, step):
+        """The question asked at a step (1 to total_questions)"""
+        return self.questions[step - 1]
+
+    def headers_before(self, step):
+        """Section headers to show above a step's question"""
+        return self.headers[step - 1]
+
+def compile_survey(version, definition):
+    """Validate a survey definition and index it by step"""
+    questions = []
+    headers = []
+    pending_headers = []
+    seen_ids = set()
+
+    for item in definition:
+        item_id = item.get("id")
+        item_type = item.get("type")
+        where = f"Survey version {version}, question {item_id!r}"
+
+        if item_id in seen_ids:
+            raise ValueError(f"{where}: duplicate id")
+        seen_ids.add(item_id)
+
+        if not item.get("text"):
+            raise ValueError(f"{where}: missing text")
+
+        if item_type == "header":
+            pending_headers.append(item["text"])
+            continue
+
+        if item_type not in COLUMN_TYPES:
+            raise ValueError(f"{where}: unknown type {item_type!r}")
+        if not QUESTION_ID_PATTERN.match(str(item_id)):
+            raise ValueError(f"{where}: ids may only contain letters, digits and underscores")
+        if item_type == "radio" and not item.get("options"):
+            raise ValueError(f"{where}: radio questions need options")
+
+        unknown = set(item.get("metrics", [])) - set(METRICS)
+        if unknown:
+            raise ValueError(f"{where}: unknown metrics {sorted(unknown)}")
+
+        questions.append(Question(
+            item_id, len(questions) + 1, item["text"], item_type,
+            options=item.get("options", ()), label=item.get("label"), metrics=item.get("metrics", ())
+        ))
+        headers.append(tuple(pending_headers))
+        pending_headers = []
+
+    if pending_headers:
+        raise ValueError(f"Survey version {version}: ends with a header")
+    if not questions:
+        raise ValueError(f"Survey version {version}: no questions")
+
+    return Survey(version, questions, headers)
+
+SURVEYS = {version: compile_survey(version, definition) for version, definition in SURVEY_DEFINITIONS.items()}
+
+# The version new check-ins are given
+CURRENT_SURVEY_VERSION = int(os.environ.get("HURDL_SURVEY_VERSION", max(SURVEYS)))
+
+def get_survey(version=None):
+    """Get a compiled survey version (the current one by default)"""
+    try:
+        return SURVEYS[CURRENT_SURVEY_VERSION if version is None else version]
+    except KeyError:
+        raise ValueError(f"Unknown survey version: {version!r}") from None
+
+def get_survey_questions(version=None):
+    """
+    The question dicts of a survey version (the current one by default),
+    headers included, as in SURVEY_DEFINITIONS. Returns a copy, so changing
+    it doesn't change the survey.
+    """
+    return copy.deepcopy(SURVEY_DEFINITIONS[get_survey(version).version])
+
+def _index_columns():
+    """
+    Index every column any survey version writes. Stored responses may come
+    from any version, so the schema and the analysis cover them all; where
+    versions share a question, the newest version's wording is used.
+    """
+    questions = {}
+    for version in sorted(SURVEYS, reverse=True):
+        for q in SURVEYS[version].questions:
+            newest = questions.setdefault(q.column, q)
+            if newest.type != q.type:
+                raise ValueError(f"Question {q.column} changes type between survey versions")
+
+    by_type = {None: tuple(questions)}
+    for question_type in COLUMN_TYPES:
+        by_type[question_type] = tuple(col for col, q in questions.items() if q.type == question_type)
+
+    by_metric = {metric: tuple(col for col, q in questions.items() if metric in q.metrics) for metric in METRICS}
+
+    column_types = MappingProxyType({col: COLUMN_TYPES[q.type] for col, q in questions.items()})
+    labels = MappingProxyType({col: q.label for col, q in questions.items()})
+
+    return by_type, by_metric, column_types, labels
+
+_COLUMNS_BY_TYPE, _COLUMNS_BY_METRIC, _COLUMN_TYPES, _QUESTION_LABELS = _index_columns()
+
+def get_question_columns(question_type=None):
+    """Get the response column names (q_<id>) for all questions, or one type"""
+    return list(_COLUMNS_BY_TYPE.get(question_type, ()))
+
+def get_column_types():
+    """Get the database column type for each question column"""
+    return dict(_COLUMN_TYPES)
+
+def get_metric_columns(metric):
+    """Get the question columns that make up a metric, e.g. "wellbeing" """
+    return list(_COLUMNS_BY_METRIC.get(metric, ()))
+
+def get_question_labels():
+    """Map question columns to the short labels used in charts"""
+    return dict(_QUESTION_LABELS)
@@ -0,0 +1,12 @@
+import pytest
+
+import database
+
+@pytest.fixture
+def isolated_db(tmp_path, monkeypatch):
+    """Point the database module at a throwaway directory for one test"""
+    database.close_pools()
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "responses.db"))
+    monkeypatch.setattr(database, "TENANT_DIR", str(tmp_path / "tenants"))
+    yield tmp_path
+    database.close_pools()
@@ -0,0 +1,94 @@
+import re
+import uuid
+import datetime
+import urllib.error
+import urllib.request
+import pytest
+
+import database
+import metrics
+from demo_data import generate_responses
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+def parse(body):
+    """Parse a text exposition into {(name, labels): value}, failing on any other line"""
+    samples = {}
+    for line in body.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE_LINE.match(line)
+        assert match, f"Unparseable exposition line: {line!r}"
+        name, labels, value = match.groups()
+        samples[(name, labels or "")] = float(value.replace("+Inf", "inf"))
+    return samples
+
+def test_counter_and_gauge_exposition():
+    registry = metrics.Registry()
+    requests = registry.register(metrics.Counter("test_requests_total", "Requests", ["status"]))
+    size = registry.register(metrics.Gauge("test_size", "Size"))
+    requests.inc(status="ok")
+    requests.inc(2, status='say "hi"\n')
+    size.set(2.5)
+
+    body = registry.render()
+    assert "# HELP test_requests_total Requests\n# TYPE test_requests_total counter\n" in body
+    assert "# TYPE test_size gauge\n" in body
+    assert body.endswith("\n")
+    assert parse(body) == {
+        ("test_requests_total", '{status="ok"}'): 1,
+        ("test_requests_total", '{status="say \\"hi\\"\\n"}'): 2,
+        ("test_size", ""): 2.5
+    }
+
+def test_histogram_buckets_are_cumulative():
+    registry = metrics.Registry()
+    latency = registry.register(metrics.Histogram("test_seconds", "Latency", buckets=(0.1, 1.0)))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    samples = parse(registry.render())
+    assert samples[("test_seconds_bucket", '{le="0.1"}')] == 2
+    assert samples[("test_seconds_bucket", '{le="1"}')] == 3
+    assert samples[("test_seconds_bucket", '{le="+Inf"}')] == 4
+    assert samples[("test_seconds_count", "")] == 4
+    assert samples[("test_seconds_sum", "")] == pytest.approx(3.65)
+
+def test_labels_must_match():
+    requests = metrics.Counter("test_requests_total", "Requests", ["status"])
+    with pytest.raises(ValueError):
+        requests.inc()
+
+def test_registering_a_taken_name_returns_the_existing_metric():
+    registry = metrics.Registry()
+    first = registry.register(metrics.Counter("test_total", "First"))
+    assert registry.register(metrics.Counter("test_total", "Second")) is first
+
+def test_endpoint_counts_saved_responses(isolated_db, monkeypatch):
+    # Only the save itself is measured; skip the background updates
+    monkeypatch.setattr(database, "schedule_theme_update", lambda tenant: None)
+    monkeypatch.setattr(database, "schedule_forecast_update", lambda tenant: None)
+
+    port = metrics.start_metrics_server(0).server_address[1]
+    before = metrics.SAVE_RESPONSE_SECONDS.count()
+
+    response = generate_responses(1).iloc[0].to_dict()
+    for _ in range(5):
+        response["response_id"] = str(uuid.uuid4())
+        response["timestamp"] = datetime.datetime.now()
+        database.save_response(response)
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as scraped:
+        assert scraped.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        samples = parse(scraped.read().decode("utf-8"))
+
+    count = samples[("hurdl_save_response_seconds_count", "")]
+    assert count - before == 5
+    assert samples[("hurdl_save_response_seconds_bucket", '{le="+Inf"}')] == count
+
+def test_endpoint_serves_only_metrics():
+    port = metrics.start_metrics_server(0).server_address[1]
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5)
+    assert error.value.code == 404
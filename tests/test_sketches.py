@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import database
+from demo_data import generate_responses
+from sketches import HyperLogLog, KLLSketch
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+# KLL (k=200) rank error and HyperLogLog (p=10, ~3% standard error) bounds,
+# as in benchmarks/bench_sketches.py
+MAX_RANK_ERROR = 0.03
+MAX_DISTINCT_ERROR = 0.10
+
+def rank_error(values, estimate, q):
+    """How far q is from the range of ranks the estimated value occupies"""
+    below = np.mean(values < estimate)
+    at_or_below = np.mean(values <= estimate)
+    return max(0.0, below - q, q - at_or_below)
+
+def assert_quantiles(values, sketch):
+    for q, estimate in zip(QUANTILES, sketch.quantiles(QUANTILES)):
+        assert rank_error(values, estimate, q) <= MAX_RANK_ERROR
+
+@pytest.fixture
+def values():
+    return np.random.default_rng(0).normal(3.5, 0.8, 100000)
+
+def test_kll_quantiles(values):
+    sketch = KLLSketch().update(values)
+
+    assert sketch.n == len(values)
+    assert_quantiles(values, sketch)
+
+def test_kll_merged_quantiles(values):
+    parts = [KLLSketch().update(part) for part in np.array_split(values, 50)]
+
+    assert_quantiles(values, KLLSketch.merge_all(parts))
+    assert_quantiles(values, KLLSketch.merge_bytes([part.to_bytes() for part in parts]))
+
+def test_kll_round_trip(values):
+    sketch = KLLSketch().update(values)
+    restored = KLLSketch.from_bytes(sketch.to_bytes())
+
+    assert restored.n == sketch.n
+    assert restored.quantiles(QUANTILES) == pytest.approx(sketch.quantiles(QUANTILES), abs=1e-6)
+
+def test_kll_ignores_missing_values():
+    sketch = KLLSketch().update([1.0, np.nan, 3.0])
+
+    assert sketch.n == 2
+    assert np.isnan(KLLSketch().quantiles([0.5])[0])
+
+@pytest.mark.parametrize("distinct", [50, 5000, 200000])
+def test_hll_estimate(distinct):
+    tokens = np.array([f"respondent-{i}" for i in range(distinct)], dtype=object)
+    sketch = HyperLogLog().update(np.concatenate([tokens, tokens[:distinct // 2]]))
+
+    assert abs(sketch.estimate() - distinct) / distinct <= MAX_DISTINCT_ERROR
+
+def test_hll_merge_is_a_union():
+    tokens = np.array([f"respondent-{i}" for i in range(20000)], dtype=object)
+    parts = [HyperLogLog().update(tokens[i:i + 12000]) for i in range(0, 20000, 4000)]
+
+    merged = HyperLogLog.merge_bytes([part.to_bytes() for part in parts])
+    assert np.array_equal(merged.registers, HyperLogLog.merge_all(parts).registers)
+    assert np.array_equal(merged.registers, HyperLogLog().update(tokens).registers)
+    assert abs(merged.estimate() - 20000) / 20000 <= MAX_DISTINCT_ERROR
+
+def test_sketch_summary_matches_the_responses(isolated_db):
+    df = generate_responses(50000, seed=0, respondents=5000)
+    database.save_responses(df)
+    df["wellbeing"] = df[database.get_metric_columns("wellbeing")].mean(axis=1)
+
+    summary = database.get_sketch_summary(by="department").set_index("department")
+
+    assert set(summary.index) == set(df["department"])
+    for department, group in df.groupby("department"):
+        row = summary.loc[department]
+        values = group["wellbeing"].to_numpy()
+        for q in QUANTILES:
+            assert rank_error(values, row[f"wellbeing_p{round(q * 100)}"], q) <= MAX_RANK_ERROR
+
+        exact = group["respondent"].nunique()
+        assert abs(row["sessions"] - exact) / exact <= MAX_DISTINCT_ERROR
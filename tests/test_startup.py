@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the HR dashboard or the chatbot need (see benchmarks/bench_startup.py),
+# and shared_dataset, which is only used when HURDL_SHARED_DATASET is on
+DEFERRED_MODULES = ["data_analysis", "visualization", "ai_assistant", "textblob", "openai", "plotly.express",
+                    "shared_dataset"]
+
+def imported_modules(statement, cwd):
+    """The modules a fresh interpreter has loaded after running a statement"""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    output = subprocess.run(
+        [sys.executable, "-c", f"{statement}; import sys, json; print(json.dumps(sorted(sys.modules)))"],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return set(json.loads(output.splitlines()[-1]))
+
+def test_checkin_startup_defers_dashboard_and_chatbot_imports(tmp_path):
+    # Run from an empty directory so the app's data/ is created there
+    modules = imported_modules("import app", tmp_path)
+
+    assert "app" in modules
+    assert [name for name in DEFERRED_MODULES if name in modules] == []
+
+def test_deferred_modules_still_import(tmp_path):
+    modules = imported_modules("import app, data_analysis, visualization, ai_assistant", tmp_path)
+
+    assert {"data_analysis", "visualization", "ai_assistant"} <= modules
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+import pytest
+
+import database
+import utils
+from demo_data import generate_responses
+
+@pytest.fixture
+def session(monkeypatch):
+    """A stand-in for streamlit's query parameters and session state"""
+    st = SimpleNamespace(query_params={}, session_state=SimpleNamespace(authenticated=False, admin_tenant=None))
+    monkeypatch.setattr(utils, "st", st)
+    monkeypatch.delenv("HURDL_TENANT", raising=False)
+    monkeypatch.delenv("HURDL_TENANTS", raising=False)
+    return st
+
+def test_tenants_only_see_their_own_responses(isolated_db):
+    acme = generate_responses(20, seed=1)
+    globex = generate_responses(30, seed=2, id_offset=20)
+    database.save_responses(acme, tenant="acme")
+    database.save_responses(globex, tenant="globex")
+
+    assert set(database.get_responses(tenant="acme")["response_id"]) == set(acme["response_id"])
+    assert set(database.get_responses(tenant="globex")["response_id"]) == set(globex["response_id"])
+    assert database.get_responses().empty
+    assert database.get_db_path("acme") != database.get_db_path("globex")
+
+def test_filtered_reads_stay_in_the_tenant(isolated_db):
+    database.save_responses(generate_responses(20, seed=1), tenant="acme")
+
+    assert database.get_filtered_responses(tenant="globex").empty
+    assert database.search_comments("the", tenant="globex")[1] == 0
+
+def test_invalid_tenant_names_are_rejected(isolated_db):
+    with pytest.raises(ValueError):
+        database.get_db_path("../default")
+
+def test_current_tenant_must_be_listed(isolated_db, session, monkeypatch):
+    monkeypatch.setenv("HURDL_TENANTS", "acme, globex")
+
+    session.query_params["tenant"] = "globex"
+    assert utils.get_current_tenant() == "globex"
+
+    session.query_params["tenant"] = "initech"
+    with pytest.raises(ValueError):
+        utils.get_current_tenant()
+    assert not database.tenant_exists("initech")
+
+def test_current_tenant_without_a_list_needs_a_shard(isolated_db, session):
+    session.query_params["tenant"] = "initech"
+    with pytest.raises(ValueError):
+        utils.get_current_tenant()
+
+    database.save_responses(generate_responses(5), tenant="initech")
+    assert utils.get_current_tenant() == "initech"
+
+def test_default_tenant_is_none(isolated_db, session):
+    assert utils.get_current_tenant() is None
+
+    session.query_params["tenant"] = database.DEFAULT_TENANT
+    assert utils.get_current_tenant() is None
+
+def test_admin_login_is_scoped_to_one_tenant(session):
+    session.session_state.authenticated = True
+    session.session_state.admin_tenant = database.DEFAULT_TENANT
+
+    assert utils.is_admin()
+    assert utils.is_admin(database.DEFAULT_TENANT)
+    assert not utils.is_admin("other")
+
+def test_logged_out_session_is_not_admin(session):
+    session.session_state.admin_tenant = database.DEFAULT_TENANT
+
+    assert not utils.is_admin()
+
+def test_tenant_without_credentials_has_no_admin(session, monkeypatch):
+    monkeypatch.setattr(utils, "ADMIN_CREDENTIALS_PATH", None)
+
+    assert utils.get_admin_credentials() == utils.DEMO_ADMIN
+    assert utils.get_admin_credentials("other") is None
+
+@pytest.mark.parametrize("layout", ["wide", "long"])
+def test_cross_tenant_summary_counts_are_integers(isolated_db, monkeypatch, layout):
+    monkeypatch.setattr(database, "STORAGE_LAYOUT", layout)
+    database.save_responses(generate_responses(20, seed=1), tenant="acme")
+    database.save_responses(generate_responses(30, seed=2, id_offset=20), tenant="globex")
+
+    summary = database.get_cross_tenant_summary()
+
+    assert summary["responses"].to_dict() == {"acme": 20, "globex": 30, "All": 50}
+    assert summary["responses"].dtype.kind == "i"
@@ -0,0 +1,245 @@
+"""
+Tokenizing, counting and clustering the free-text answers.
+
+Words and topic mentions are counted with the lexicon below; the database
+keeps those counts per department/location/day, so changing STOP_WORDS,
+MIN_WORD_LENGTH or TOPIC_LEXICON needs the counts rebuilt
+(python -m database text-counts).
+
+Comments are turned into hashed bag-of-words vectors (unigrams and
+bigrams, hashed into a fixed number of features, so there is no
+vocabulary to build or keep) and grouped into themes by spherical
+mini-batch k-means (Sculley, 2010): each batch of new comments is
+assigned to its most similar centroid, and every centroid moves towards
+the mean of its new comments with a step of n / (comments seen so far).
+Memory stays at the centroids plus one batch however many comments have
+been seen, and a model is a few hundred kB when serialized.
+
+Hashing loses the words behind each feature, so a model keeps the word
+seen for each of its centroids' strongest features, to label themes.
+"""
+import os
+import re
+import json
+import zlib
+import hashlib
+import numpy as np
+import pandas as pd
+
+TOKEN_PATTERN = re.compile(r"\b\w+\b")
+
+# Words too common to say anything about a comment
+STOP_WORDS = frozenset(["the", "and", "i", "to", "a", "is", "in", "that", "it", "of", "for", "this", "with",
+                        "on", "be", "are"])
+MIN_WORD_LENGTH = 3
+
+# Words that count as a mention of each topic
+TOPIC_LEXICON = {
+    "workload": ["work", "workload", "busy", "overwork", "stress", "deadline", "time"],
+    "team": ["team", "colleague", "coworker", "collaboration", "together"],
+    "management": ["manager", "management", "leadership", "supervisor", "boss"],
+    "growth": ["growth", "learning", "development", "progress", "career"]
+}
+
+# Changes whenever the lexicon does, so stored counts can be checked
+LEXICON_VERSION = hashlib.sha1(
+    json.dumps([sorted(STOP_WORDS), MIN_WORD_LENGTH, TOPIC_LEXICON], sort_keys=True).encode()
+).hexdigest()[:12]
+
+# Number of themes comments are grouped into
+THEME_COUNT = int(os.environ.get("HURDL_THEME_COUNT", "8"))
+
+# Hashed features per comment vector
+THEME_FEATURES = 2 ** 14
+
+# Strongest features per centroid kept with their words, and shown as labels
+LABEL_FEATURES = 10
+LABEL_TERMS = 3
+
+# Comments the first centroids are picked from
+SEED_SAMPLE = 512
+
+def tokenize(text):
+    """Lowercase words of a comment, without stop words and very short words"""
+    return [word for word in TOKEN_PATTERN.findall(text.lower())
+            if word not in STOP_WORDS and len(word) >= MIN_WORD_LENGTH]
+
+def count_topics(words):
+    """Mentions of each topic among a list of words"""
+    return {topic: sum(1 for word in words if word in terms) for topic, terms in TOPIC_LEXICON.items()}
+
+def vectorize(texts, n_features=THEME_FEATURES):
+    """
+    Hashed term vectors of a batch of comments.
+
+    Returns (rows, features, values, words): a sparse matrix as parallel
+    arrays sorted by row, each row's values scaled to unit length, and the
+    word or bigram behind each feature seen in the batch. Comments without
+    any words have no entries.
+    """
+    rows, terms = [], []
+    for i, text in enumerate(texts):
+        words = tokenize(text) if isinstance(text, str) else []
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        rows.extend([i] * len(grams))
+        terms.extend(grams)
+
+    if not terms:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32), {}
+
+    # Hash each distinct term once
+    distinct = {}
+    term_index = np.array([distinct.setdefault(term, len(distinct)) for term in terms], dtype=np.int64)
+    unique_terms = np.array(list(distinct), dtype=object)
+    term_features = (pd.util.hash_array(unique_terms) % np.uint64(n_features)).astype(np.int64)
+
+    # Count each (comment, feature) once, with sublinear term frequency
+    cells, counts = np.unique(np.array(rows, dtype=np.int64) * n_features + term_features[term_index],
+                              return_counts=True)
+    rows, features = np.divmod(cells, n_features)
+    values = (1 + np.log(counts)).astype(np.float32)
+
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(texts)))
+    values /= norms[rows].astype(np.float32)
+
+    words = dict(zip(term_features.tolist(), unique_terms.tolist()))
+    return rows, features, values, words
+
+class ThemeModel:
+    """Centroids of comment themes, updated a mini-batch at a time"""
+
+    def __init__(self, k=THEME_COUNT, n_features=THEME_FEATURES):
+        self.k = k
+        self.n_features = n_features
+        # None until the first batch with at least k comments
+        self.centroids = None
+        self.counts = np.zeros(k)
+        # Word behind each labelling feature, by feature
+        self.words = {}
+
+    def _similarity(self, rows, features, values, n_rows):
+        """Cosine similarity of every comment to every centroid"""
+        norms = np.linalg.norm(self.centroids, axis=1)
+        norms[norms == 0] = 1
+        scaled = self.centroids / norms[:, None]
+
+        similarity = np.zeros((n_rows, self.k), dtype=np.float32)
+        if len(rows):
+            # Rows are sorted, so each comment's products are a contiguous run
+            present, starts = np.unique(rows, return_index=True)
+            similarity[present] = np.add.reduceat(values[:, None] * scaled[:, features].T, starts)
+        return similarity
+
+    def _seed(self, rows, features, values, present, rng):
+        """k-means++ initial centroids from (a sample of) the comments of a batch"""
+        sample = np.sort(rng.choice(present, min(len(present), SEED_SAMPLE), replace=False))
+        in_sample = np.isin(rows, sample)
+        dense = np.zeros((len(sample), self.n_features), dtype=np.float32)
+        dense[np.searchsorted(sample, rows[in_sample]), features[in_sample]] = values[in_sample]
+
+        chosen = [rng.integers(len(sample))]
+        distance = 2 - 2 * dense @ dense[chosen[0]]
+        for _ in range(1, self.k):
+            weights = np.clip(distance, 0, None)
+            total = weights.sum()
+            pick = rng.choice(len(sample), p=weights / total) if total > 0 else rng.integers(len(sample))
+            chosen.append(pick)
+            distance = np.minimum(distance, 2 - 2 * dense @ dense[pick])
+
+        self.centroids = dense[chosen]
+
+    def partial_fit(self, texts, seed=0):
+        """
+        Assign a batch of comments to themes and move the centroids towards
+        them. Returns one theme per comment (-1 for comments without words),
+        or None if the model has not started yet and the batch has fewer
+        than k comments to start it from.
+        """
+        rows, features, values, words = vectorize(texts, self.n_features)
+        present = np.unique(rows)
+
+        if self.centroids is None:
+            if len(present) < self.k:
+                return None
+            self._seed(rows, features, values, present, np.random.default_rng(seed))
+
+        themes = self.assign(rows, features, values, len(texts))
+        assigned = themes[rows]
+
+        # Mean of each theme's new comments, blended in by their share of
+        # everything the theme has seen
+        batch_counts = np.bincount(themes[present], minlength=self.k)
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, (assigned, features), values)
+
+        updated = batch_counts > 0
+        self.counts += batch_counts
+        rate = (batch_counts[updated] / self.counts[updated])[:, None]
+        self.centroids[updated] = ((1 - rate) * self.centroids[updated]
+                                   + rate * sums[updated] / batch_counts[updated][:, None])
+
+        self._update_words(words)
+        return themes
+
+    def assign(self, rows, features, values, n_rows):
+        """Most similar theme of each vectorized comment (-1 for empty ones)"""
+        themes = np.argmax(self._similarity(rows, features, values, n_rows), axis=1)
+        themes[np.setdiff1d(np.arange(n_rows), rows)] = -1
+        return themes
+
+    def predict(self, texts):
+        """Themes of comments, without updating the model"""
+        if self.centroids is None:
+            return np.full(len(texts), -1)
+        rows, features, values, _ = vectorize(texts, self.n_features)
+        return self.assign(rows, features, values, len(texts))
+
+    def _top_features(self):
+        # Weight above the average centroid, so words every theme shares
+        # ("was", "week") don't label any of them
+        distinct = self.centroids - self.centroids.mean(axis=0)
+        top = np.argpartition(-distinct, LABEL_FEATURES, axis=1)[:, :LABEL_FEATURES]
+        order = np.argsort(-np.take_along_axis(distinct, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+    def _update_words(self, batch_words):
+        # Only the words of features that currently label a theme are kept
+        top = set(self._top_features().ravel().tolist())
+        self.words = {f: batch_words.get(f, self.words.get(f)) for f in top
+                      if f in batch_words or f in self.words}
+
+    def labels(self):
+        """A short label per theme: its strongest words"""
+        if self.centroids is None:
+            return []
+
+        labels = []
+        for theme, features in enumerate(self._top_features()):
+            terms = []
+            for feature in features:
+                word = self.words.get(int(feature))
+                if word and self.centroids[theme, feature] > 0 and not any(word in t or t in word for t in terms):
+                    terms.append(word)
+                if len(terms) == LABEL_TERMS:
+                    break
+            labels.append(", ".join(terms) or f"Theme {theme + 1}")
+        return labels
+
+    def to_bytes(self):
+        header = {"k": self.k, "n_features": self.n_features, "counts": self.counts.tolist(),
+                  "words": {str(f): w for f, w in self.words.items()}, "started": self.centroids is not None}
+        body = self.centroids.astype(np.float32).tobytes() if self.centroids is not None else b""
+        return zlib.compress(json.dumps(header).encode() + b"\n" + body)
+
+    @classmethod
+    def from_bytes(cls, data):
+        header, body = zlib.decompress(data).split(b"\n", 1)
+        header = json.loads(header)
+
+        model = cls(header["k"], header["n_features"])
+        model.counts = np.array(header["counts"])
+        model.words = {int(f): w for f, w in header["words"].items()}
+        if header["started"]:
+            model.centroids = np.frombuffer(body, dtype=np.float32).reshape(model.k, model.n_features).copy()
+        return model
@@ -1,45 +1,108 @@
 import streamlit as st
 import hashlib
 import base64
+import json
 import os
-import pandas as pd
+import uuid
 import numpy as np
+from database import DEFAULT_TENANT, tenant_exists
+
+# Admin accounts per organisation: a JSON file mapping each tenant name to
+# {"username": ..., "password_hash": ...}. Without it, only the default
+# tenant can be administered, with the built-in demo account.
+ADMIN_CREDENTIALS_PATH = os.environ.get("HURDL_ADMIN_CREDENTIALS")
+
+# Password: hurdl2023
+DEMO_ADMIN = {"username": "admin", "password_hash": "5f4dcc3b5aa765d61d8327deb882cf99"}
 
 def initialize_session_state():
     """Initialize session state variables"""
     if "authenticated" not in st.session_state:
         st.session_state.authenticated = False
     
+    # The organisation the admin logged in to; the login is only valid there
+    if "admin_tenant" not in st.session_state:
+        st.session_state.admin_tenant = None
+    
     if "auth_attempts" not in st.session_state:
         st.session_state.auth_attempts = 0
         
-    # Chat related session state
-    if "chat_messages" not in st.session_state:
-        st.session_state.chat_messages = []
-    
-    if "current_survey_responses" not in st.session_state:
-        st.session_state.current_survey_responses = {}
+    # Chat related session state. The conversation itself is kept in the
+    # session store (see session_store.py), keyed by this id, so the
+    # session only holds small values.
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
         
     if "show_chatbot" not in st.session_state:
         st.session_state.show_chatbot = False
+    
+    # Profiler (admin only). Its traces and the dashboard's panel cache are
+    # created when an admin first needs them, not for every employee.
+    if "show_profiler" not in st.session_state:
+        st.session_state.show_profiler = False
+    
+    # Random token per browser session, only used (hashed) to estimate the
+    # number of distinct check-in sessions; it is never stored with a response
+    if "respondent_token" not in st.session_state:
+        st.session_state.respondent_token = uuid.uuid4().hex
+
+def get_current_tenant():
+    """
+    Resolve which organisation (tenant) this session belongs to.
 
-def admin_login():
-    """Handle admin login functionality"""
+    The tenant comes from the ``?tenant=`` query parameter, falling back to the
+    HURDL_TENANT environment variable. When HURDL_TENANTS (comma separated) is
+    set, only those tenants are accepted; otherwise only HURDL_TENANT and
+    tenants that already have a database shard are. Unknown tenants are
+    rejected before any shard is created for them. Returns None for the
+    default tenant.
+    """
+    tenant = st.query_params.get("tenant") or os.environ.get("HURDL_TENANT")
+    
+    if not tenant or tenant == DEFAULT_TENANT:
+        return None
+    
+    allowed = os.environ.get("HURDL_TENANTS")
+    if allowed:
+        known = tenant in [t.strip() for t in allowed.split(",")]
+    else:
+        known = tenant == os.environ.get("HURDL_TENANT") or tenant_exists(tenant)
+    
+    if not known:
+        raise ValueError(f"Unknown organisation: {tenant}")
+    
+    return tenant
+
+def get_admin_credentials(tenant=None):
+    """The admin account of a tenant, or None if it has none"""
+    tenant = tenant or DEFAULT_TENANT
+    
+    if ADMIN_CREDENTIALS_PATH:
+        with open(ADMIN_CREDENTIALS_PATH) as f:
+            return json.load(f).get(tenant)
+    
+    return DEMO_ADMIN if tenant == DEFAULT_TENANT else None
+
+def is_admin(tenant=None):
+    """Whether this session is logged in as an admin of the tenant"""
+    return bool(st.session_state.authenticated) and st.session_state.admin_tenant == (tenant or DEFAULT_TENANT)
+
+def admin_login(tenant=None):
+    """Handle admin login functionality for the tenant's admin account"""
     st.subheader("Admin Login")
     
-    # Simple authentication - in a real app, use proper authentication
-    # For demo purposes, we're using a hardcoded password hash
-    # In production, get credentials from environment variables/database
-    admin_username = "admin"
-    # Password: hurdl2023
-    admin_password_hash = "5f4dcc3b5aa765d61d8327deb882cf99"  
+    account = get_admin_credentials(tenant)
+    if account is None:
+        st.info("No admin account is set up for this organisation.")
+        return
     
     username = st.text_input("Username")
     password = st.text_input("Password", type="password")
     
     if st.button("Login"):
-        if username == admin_username and check_password(password, admin_password_hash):
+        if username == account["username"] and check_password(password, account["password_hash"]):
             st.session_state.authenticated = True
+            st.session_state.admin_tenant = tenant or DEFAULT_TENANT
             st.session_state.auth_attempts = 0
             st.success("Login successful!")
             st.rerun()
@@ -70,39 +133,13 @@ def get_color_scale(values, colorscale='RdYlGn'):
         # Default blues
         return ['#f7fbff', '#deebf7', '#c6dbef', '#9ecae1', '#6baed6', '#4292c6', '#2171b5', '#084594']
 
-def generate_demo_data():
+def generate_demo_data(n=50, seed=None):
     """Generate sample data for testing"""
     # NOTE: This function is only used for development/testing
     # In the real app, we only use actual user data
+    from demo_data import generate_responses
     
-    departments = ["Engineering", "Marketing", "Sales", "Product", "HR", "Finance"]
-    locations = ["Remote", "HQ", "Regional Office"]
-    
-    # Generate 50 sample responses
-    data = []
-    for i in range(50):
-        response = {
-            "response_id": f"test-{i}",
-            "timestamp": pd.Timestamp.now() - pd.Timedelta(days=np.random.randint(0, 30)),
-            "department": np.random.choice(departments),
-            "location": np.random.choice(locations)
-        }
-        
-        # Generate answers for 10 questions
-        for j in range(1, 11):
-            if j <= 8:  # Scale questions
-                response[f"q_{j}"] = np.random.randint(1, 6)
-            else:  # Text questions
-                sentiments = [
-                    "I'm feeling great about our team's progress.",
-                    "There's too much work and not enough time.",
-                    "My manager has been very supportive.",
-                    "I'm concerned about the project timeline.",
-                    "The workplace environment is positive and productive.",
-                    "Communication could be improved in our team."
-                ]
-                response[f"q_{j}"] = np.random.choice(sentiments)
-                
-        data.append(response)
+    if seed is None:
+        seed = int(np.random.randint(0, 2**31))
     
-    return pd.DataFrame(data)
+    return generate_responses(n, seed=seed)
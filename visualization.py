@@ -1,43 +1,95 @@
+import os
+import json
+import time
 import streamlit as st
 import pandas as pd
-import numpy as np
 import altair as alt
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from survey_questions import get_metric_columns, get_question_labels
+from instrumentation import traced, to_chrome_trace, export_chrome_trace
+from data_analysis import bin_scores, choose_time_bin, cube_scores, downsample_series
+from privacy import MIN_GROUP_SIZE, group_means
+from forecasting import RISK_THRESHOLDS
 
-def render_wellbeing_chart(df):
-    """Render the wellbeing index chart"""
-    st.subheader("Wellbeing Index Trends")
-    
-    # Ensure we have timestamp column
-    if 'timestamp' not in df.columns:
-        st.warning("No timestamp data available for trend visualization.")
-        return
-    
-    # Get wellbeing questions
-    wellbeing_questions = ["q_1", "q_2", "q_3", "q_4"]
-    available_questions = [q for q in wellbeing_questions if q in df.columns]
+# Trend metrics binned by the data layer for the dashboard charts
+TREND_METRICS = ["wellbeing", "safety", "workload"]
+
+# Axis titles for each time bin
+BIN_TITLES = {"day": "Date", "week": "Week", "month": "Month"}
+
+# Metrics offered in the department x location view
+METRIC_TITLES = {"wellbeing": "Wellbeing", "safety": "Psychological Safety", "workload": "Workload"}
+
+# Chart spec sets kept in memory, across sessions
+SPEC_CACHE_ENTRIES = 128
+
+# Flagged departments drawn on the forecast chart (the table lists them all)
+FORECAST_CHART_DEPARTMENTS = 6
+
+def build_trend_series(df, freq=None):
+    """
+    Bin trend metrics from raw responses, in the same shape the dashboard
+    gets from database.get_binned_scores (bins too small to show anonymously
+    left out).
+    """
+    if freq is None:
+        freq = choose_time_bin(df['timestamp'].min(), df['timestamp'].max())
+    
+    return {
+        "freq": freq,
+        "overall": bin_scores(df, TREND_METRICS, freq, min_group_size=MIN_GROUP_SIZE),
+        "by_department": bin_scores(df, ["wellbeing"], freq, by="department", min_group_size=MIN_GROUP_SIZE)
+    }
+
+def _trend_points(series, metric, key="overall", by=None):
+    """Take a metric's binned series, capped at MAX_CHART_POINTS points"""
+    binned = series[key]
+    score = f"{metric}_score"
     
-    if not available_questions:
-        st.warning("No wellbeing data available for visualization.")
-        return
+    if binned.empty or score not in binned.columns:
+        return pd.DataFrame(columns=["date", score] + ([by] if by else []))
     
-    # Calculate wellbeing score for each response
-    df['wellbeing_score'] = df[available_questions].mean(axis=1)
+    columns = ["period", score] + ([by] if by else [])
+    points = downsample_series(binned[columns], "period", score, by=by)
+    return points.rename(columns={"period": "date"})
+
+def _to_spec(chart):
+    """Serialize an altair chart to the Vega-Lite spec st.vega_lite_chart draws"""
+    spec = chart.to_dict()
+    # Streamlit applies its own theme, like st.altair_chart does
+    spec.pop("config", None)
+    return spec
+
+@st.cache_resource(max_entries=SPEC_CACHE_ENTRIES, show_spinner=False)
+def _cached_specs(name, key, _build, _args):
+    # Arguments starting with an underscore are not hashed, so only the
+    # builder name and key identify an entry
+    return _build(*_args)
+
+def get_chart_specs(build, key, *args):
+    """
+    Build a set of chart specs, memoized by key.
+    key must fingerprint everything the specs depend on (e.g. the filters
+    and the data version); without a key the specs are rebuilt every time.
+    """
+    if key is None:
+        return build(*args)
+    
+    return _cached_specs(build.__name__, key, build, args)
+
+def build_wellbeing_specs(df, series=None):
+    """Build the wellbeing chart specs"""
+    available_questions = [q for q in get_metric_columns("wellbeing") if q in df.columns]
     
-    # Group by date
-    df['date'] = df['timestamp'].dt.date
-    daily_wellbeing = df.groupby('date')['wellbeing_score'].mean().reset_index()
-    daily_wellbeing['date'] = pd.to_datetime(daily_wellbeing['date'])
+    if series is None:
+        series = build_trend_series(df)
     
-    # Create department breakdown
-    dept_wellbeing = df.groupby(['department', 'date'])['wellbeing_score'].mean().reset_index()
-    dept_wellbeing['date'] = pd.to_datetime(dept_wellbeing['date'])
+    # Binned, downsampled trend lines
+    daily_wellbeing = _trend_points(series, "wellbeing")
+    dept_wellbeing = _trend_points(series, "wellbeing", key="by_department", by="department")
     
     # Create overall trend chart
     trend_chart = alt.Chart(daily_wellbeing).mark_line(point=True).encode(
-        x=alt.X('date:T', title='Date'),
+        x=alt.X('date:T', title=BIN_TITLES[series["freq"]]),
         y=alt.Y('wellbeing_score:Q', scale=alt.Scale(domain=[1, 5]), title='Wellbeing Score'),
         tooltip=['date:T', 'wellbeing_score:Q']
     ).properties(
@@ -46,14 +98,12 @@ def render_wellbeing_chart(df):
         height=300
     )
     
-    st.altair_chart(trend_chart, use_container_width=True)
+    specs = {"trend": _to_spec(trend_chart), "by_department": None}
     
     # Create department comparison chart
     if len(df['department'].unique()) > 1:
-        st.subheader("Wellbeing by Department")
-        
         dept_chart = alt.Chart(dept_wellbeing).mark_line().encode(
-            x=alt.X('date:T', title='Date'),
+            x=alt.X('date:T', title=BIN_TITLES[series["freq"]]),
             y=alt.Y('wellbeing_score:Q', scale=alt.Scale(domain=[1, 5]), title='Wellbeing Score'),
             color=alt.Color('department:N', title='Department'),
             tooltip=['date:T', 'department:N', 'wellbeing_score:Q']
@@ -62,10 +112,7 @@ def render_wellbeing_chart(df):
             height=300
         )
         
-        st.altair_chart(dept_chart, use_container_width=True)
-    
-    # Show individual question breakdown
-    st.subheader("Wellbeing Questions Breakdown")
+        specs["by_department"] = _to_spec(dept_chart)
     
     # Calculate average for each question
     question_scores = {}
@@ -79,12 +126,7 @@ def render_wellbeing_chart(df):
     })
     
     # Map question IDs to more readable names
-    question_map = {
-        'q_1': 'Overall Wellbeing',
-        'q_2': 'Work-Life Balance',
-        'q_3': 'Stress Level',
-        'q_4': 'Job Satisfaction'
-    }
+    question_map = get_question_labels()
     
     question_df['Question'] = question_df['Question'].map(lambda q: question_map.get(q, q))
     
@@ -99,36 +141,60 @@ def render_wellbeing_chart(df):
         height=200
     )
     
-    st.altair_chart(bar_chart, use_container_width=True)
+    specs["questions"] = _to_spec(bar_chart)
+    return specs
 
-def render_safety_chart(df):
-    """Render the psychological safety chart"""
-    st.subheader("Psychological Safety Analysis")
+@traced("chart")
+def render_wellbeing_chart(df, series=None, key=None):
+    """
+    Render the wellbeing index chart.
+    series holds binned trend data from the data layer (see build_trend_series);
+    it is computed from df when not given. key fingerprints df and series so
+    the chart specs are only built once per filter and data version.
+    """
+    st.subheader("Wellbeing Index Trends")
     
     # Ensure we have timestamp column
     if 'timestamp' not in df.columns:
         st.warning("No timestamp data available for trend visualization.")
         return
     
-    # Get safety questions
-    safety_questions = ["q_5", "q_6", "q_7", "q_8"]
-    available_questions = [q for q in safety_questions if q in df.columns]
+    # Get wellbeing questions
+    wellbeing_questions = get_metric_columns("wellbeing")
+    available_questions = [q for q in wellbeing_questions if q in df.columns]
     
     if not available_questions:
-        st.warning("No psychological safety data available for visualization.")
+        st.warning("No wellbeing data available for visualization.")
         return
     
+    specs = get_chart_specs(build_wellbeing_specs, key, df, series)
+    
+    st.vega_lite_chart(specs["trend"], use_container_width=True)
+    
+    if specs["by_department"] is not None:
+        st.subheader("Wellbeing by Department")
+        st.vega_lite_chart(specs["by_department"], use_container_width=True)
+    
+    # Show individual question breakdown
+    st.subheader("Wellbeing Questions Breakdown")
+    st.vega_lite_chart(specs["questions"], use_container_width=True)
+
+def build_safety_specs(df, series=None):
+    """Build the psychological safety chart specs"""
+    available_questions = [q for q in get_metric_columns("safety") if q in df.columns]
+    
     # Calculate safety score for each response
-    df['safety_score'] = df[available_questions].mean(axis=1)
+    safety_scores = df[available_questions].mean(axis=1)
     
-    # Group by date
-    df['date'] = df['timestamp'].dt.date
-    daily_safety = df.groupby('date')['safety_score'].mean().reset_index()
-    daily_safety['date'] = pd.to_datetime(daily_safety['date'])
+    if series is None:
+        series = build_trend_series(df)
+    
+    # Binned, downsampled trend line
+    daily_safety = _trend_points(series, "safety")
     
     # Create overall trend chart
     trend_chart = alt.Chart(daily_safety).mark_line(point=True).encode(
-        x=alt.X('date:T', title='Date'),
+        x=alt.X('date:T', title=BIN_TITLES[series["freq"]]),
         y=alt.Y('safety_score:Q', scale=alt.Scale(domain=[1, 5]), title='Safety Score'),
         tooltip=['date:T', 'safety_score:Q']
     ).properties(
@@ -137,11 +203,6 @@ def render_safety_chart(df):
         height=300
     )
     
-    st.altair_chart(trend_chart, use_container_width=True)
-    
-    # Show individual question breakdown
-    st.subheader("Psychological Safety Questions Breakdown")
-    
     # Calculate average for each question
     question_scores = {}
     for q in available_questions:
@@ -154,12 +215,7 @@ def render_safety_chart(df):
     })
     
     # Map question IDs to more readable names
-    question_map = {
-        'q_5': 'Team Psychological Safety',
-        'q_6': 'Speaking Up Comfort',
-        'q_7': 'Management Support',
-        'q_8': 'Mistake Tolerance'
-    }
+    question_map = get_question_labels()
     
     question_df['Question'] = question_df['Question'].map(lambda q: question_map.get(q, q))
     
@@ -174,13 +230,12 @@ def render_safety_chart(df):
         height=200
     )
     
-    st.altair_chart(bar_chart, use_container_width=True)
+    specs = {"trend": _to_spec(trend_chart), "questions": _to_spec(bar_chart), "by_department": None}
     
     # Department comparison
     if len(df['department'].unique()) > 1:
-        st.subheader("Psychological Safety by Department")
-        
-        dept_safety = df.groupby('department')['safety_score'].mean().reset_index()
+        dept_safety = group_means(pd.DataFrame({'department': df['department'], 'safety_score': safety_scores}),
+                                  'department', ['safety_score'])
         dept_safety = dept_safety.sort_values('safety_score', ascending=False)
         
         dept_chart = alt.Chart(dept_safety).mark_bar().encode(
@@ -193,17 +248,46 @@ def render_safety_chart(df):
             height=250
         )
         
-        st.altair_chart(dept_chart, use_container_width=True)
+        specs["by_department"] = _to_spec(dept_chart)
+    
+    return specs
 
-def render_workload_heatmap(df, workload_scores):
-    """Render the workload heatmap"""
-    st.subheader("Workload Heatmap")
+@traced("chart")
+def render_safety_chart(df, series=None, key=None):
+    """Render the psychological safety chart"""
+    st.subheader("Psychological Safety Analysis")
     
-    # Check if workload data is available
-    if workload_scores["by_department"].empty:
-        st.warning("No workload data available for visualization.")
+    # Ensure we have timestamp column
+    if 'timestamp' not in df.columns:
+        st.warning("No timestamp data available for trend visualization.")
         return
     
+    # Get safety questions
+    safety_questions = get_metric_columns("safety")
+    available_questions = [q for q in safety_questions if q in df.columns]
+    
+    if not available_questions:
+        st.warning("No psychological safety data available for visualization.")
+        return
+    
+    specs = get_chart_specs(build_safety_specs, key, df, series)
+    
+    st.vega_lite_chart(specs["trend"], use_container_width=True)
+    
+    # Show individual question breakdown
+    st.subheader("Psychological Safety Questions Breakdown")
+    st.vega_lite_chart(specs["questions"], use_container_width=True)
+    
+    # Department comparison
+    if specs["by_department"] is not None:
+        st.subheader("Psychological Safety by Department")
+        st.vega_lite_chart(specs["by_department"], use_container_width=True)
+
+def build_workload_specs(df, workload_scores, series=None):
+    """Build the workload heatmap figure and trend chart spec"""
+    # plotly is only needed for this chart, so import it on first use
+    import plotly.express as px
+    
     # Combine department and location data
     combined_data = pd.concat([workload_scores["by_department"], workload_scores["by_location"]])
     
@@ -227,54 +311,59 @@ def render_workload_heatmap(df, workload_scores):
         margin=dict(l=40, r=20, t=40, b=20)
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    specs = {"heatmap": fig, "trend": None}
     
     # Additional workload analysis - time trend
-    if 'timestamp' in df.columns:
-        st.subheader("Workload Trend Over Time")
+    available_questions = [q for q in get_metric_columns("workload") if q in df.columns]
+    
+    if 'timestamp' in df.columns and available_questions:
+        if series is None:
+            series = build_trend_series(df)
         
-        # Get workload questions
-        workload_questions = ["q_3", "q_7"]
-        available_questions = [q for q in workload_questions if q in df.columns]
+        # Binned, downsampled trend line
+        daily_workload = _trend_points(series, "workload")
         
-        if available_questions:
-            # Calculate workload score for each response
-            df['workload_score'] = df[available_questions].mean(axis=1)
-            
-            # Group by date
-            df['date'] = df['timestamp'].dt.date
-            daily_workload = df.groupby('date')['workload_score'].mean().reset_index()
-            daily_workload['date'] = pd.to_datetime(daily_workload['date'])
-            
-            # Create line chart
-            workload_chart = alt.Chart(daily_workload).mark_line(point=True).encode(
-                x=alt.X('date:T', title='Date'),
-                y=alt.Y('workload_score:Q', scale=alt.Scale(domain=[1, 5]), title='Workload Score'),
-                tooltip=['date:T', 'workload_score:Q']
-            ).properties(
-                width='container',
-                height=300
-            )
-            
-            st.altair_chart(workload_chart, use_container_width=True)
-            st.caption("Higher workload scores indicate higher perceived workload")
+        # Create line chart
+        workload_chart = alt.Chart(daily_workload).mark_line(point=True).encode(
+            x=alt.X('date:T', title=BIN_TITLES[series["freq"]]),
+            y=alt.Y('workload_score:Q', scale=alt.Scale(domain=[1, 5]), title='Workload Score'),
+            tooltip=['date:T', 'workload_score:Q']
+        ).properties(
+            width='container',
+            height=300
+        )
+        
+        specs["trend"] = _to_spec(workload_chart)
+    
+    return specs
 
-def render_sentiment_chart(df, sentiment_scores):
-    """Render the sentiment analysis chart"""
-    st.subheader("Sentiment Analysis")
+@traced("chart")
+def render_workload_heatmap(df, workload_scores, series=None, key=None):
+    """Render the workload heatmap"""
+    st.subheader("Workload Heatmap")
     
-    # Check if sentiment data is available
-    if sentiment_scores["overall"] == 0:
-        st.warning("No sentiment data available for visualization.")
+    # Check if workload data is available
+    if workload_scores["by_department"].empty:
+        st.warning("No workload data available for visualization.")
         return
     
-    # Display overall sentiment
-    st.metric("Overall Sentiment Score", f"{sentiment_scores['overall']:.2f}/5")
+    specs = get_chart_specs(build_workload_specs, key, df, workload_scores, series)
+    
+    st.plotly_chart(specs["heatmap"], use_container_width=True)
+    
+    if 'timestamp' in df.columns:
+        st.subheader("Workload Trend Over Time")
+        
+        if specs["trend"] is not None:
+            st.vega_lite_chart(specs["trend"], use_container_width=True)
+            st.caption("Higher workload scores indicate higher perceived workload")
+
+def build_sentiment_specs(sentiment_scores):
+    """Build the sentiment chart specs; charts without data are None"""
+    specs = {"questions": None, "words": None, "topics": None}
     
     # Question-specific sentiment
     if sentiment_scores["questions"]:
-        st.subheader("Sentiment by Question")
-        
         # Create DataFrame for question sentiments
         question_df = pd.DataFrame({
             'Question': list(sentiment_scores["questions"].keys()),
@@ -282,10 +371,7 @@ def render_sentiment_chart(df, sentiment_scores):
         })
         
         # Map question IDs to more readable names
-        question_map = {
-            'q_9': 'How are you feeling about work?',
-            'q_10': 'Any additional feedback?'
-        }
+        question_map = get_question_labels()
         
         question_df['Question'] = question_df['Question'].map(lambda q: question_map.get(q, q))
         
@@ -300,12 +386,10 @@ def render_sentiment_chart(df, sentiment_scores):
             height=150
         )
         
-        st.altair_chart(bar_chart, use_container_width=True)
+        specs["questions"] = _to_spec(bar_chart)
     
     # Common words visualization
     if sentiment_scores["common_words"]:
-        st.subheader("Common Words in Feedback")
-        
         # Create DataFrame for word counts
         words_df = pd.DataFrame({
             'Word': list(sentiment_scores["common_words"].keys()),
@@ -322,12 +406,10 @@ def render_sentiment_chart(df, sentiment_scores):
             height=300
         )
         
-        st.altair_chart(word_chart, use_container_width=True)
+        specs["words"] = _to_spec(word_chart)
     
     # Topic analysis
     if sentiment_scores["topics"]:
-        st.subheader("Common Topics in Feedback")
-        
         # Create DataFrame for topics
         topics_df = pd.DataFrame({
             'Topic': list(sentiment_scores["topics"].keys()),
@@ -344,8 +426,267 @@ def render_sentiment_chart(df, sentiment_scores):
             height=200
         )
         
-        st.altair_chart(topic_chart, use_container_width=True)
+        specs["topics"] = _to_spec(topic_chart)
+    
+    return specs
+
+@traced("chart")
+def render_sentiment_chart(df, sentiment_scores, key=None):
+    """Render the sentiment analysis chart"""
+    st.subheader("Sentiment Analysis")
+    
+    # Check if sentiment data is available
+    if sentiment_scores["overall"] == 0:
+        st.warning("No sentiment data available for visualization.")
+        return
+    
+    # Display overall sentiment
+    st.metric("Overall Sentiment Score", f"{sentiment_scores['overall']:.2f}/5")
+    
+    specs = get_chart_specs(build_sentiment_specs, key, sentiment_scores)
+    
+    if specs["questions"] is not None:
+        st.subheader("Sentiment by Question")
+        st.vega_lite_chart(specs["questions"], use_container_width=True)
+    
+    if specs["words"] is not None:
+        st.subheader("Common Words in Feedback")
+        st.vega_lite_chart(specs["words"], use_container_width=True)
+    
+    if specs["topics"] is not None:
+        st.subheader("Common Topics in Feedback")
+        st.vega_lite_chart(specs["topics"], use_container_width=True)
+
+def build_theme_specs(themes):
+    """Build the discovered themes bar chart spec"""
+    theme_chart = alt.Chart(themes).mark_bar().encode(
+        x=alt.X('comments:Q', title='Comments'),
+        y=alt.Y('label:N', sort='-x', title='Theme'),
+        tooltip=[alt.Tooltip('label:N', title='Theme'), alt.Tooltip('comments:Q', title='Comments')]
+    ).properties(
+        width='container',
+        height=max(150, 30 * len(themes))
+    )
+    
+    return {"themes": _to_spec(theme_chart)}
+
+@traced("chart")
+def render_theme_chart(themes, pending, key=None):
+    """Render the themes discovered by clustering the comments"""
+    st.subheader("Discovered Themes")
+    
+    if themes.empty:
+        st.info("No themes discovered yet. Comments are grouped into themes as check-ins arrive.")
+        return
+    
+    specs = get_chart_specs(build_theme_specs, key, themes)
+    st.vega_lite_chart(specs["themes"], use_container_width=True)
+    
+    caption = "Themes are found by clustering similar comments and labelled with their most distinctive words."
+    if pending:
+        caption += f" {pending} recent responses are not grouped yet."
+    st.caption(caption)
+
+def build_cube_heatmap_specs(cells, metric, drill_cells=None):
+    """Build the department x location heatmap (and drill-down) from cube cells"""
+    score = f"{metric}_score"
+    scores = cube_scores(cells, metric, ["department", "location"], min_group_size=MIN_GROUP_SIZE)
+    
+    # High workload is bad, so its colour scale is reversed
+    color_scale = alt.Scale(domain=[1, 5], scheme='redyellowgreen', reverse=(metric == "workload"))
+    
+    base = alt.Chart(scores).encode(
+        x=alt.X('location:N', title='Location'),
+        y=alt.Y('department:N', title='Department')
+    )
+    
+    heatmap = base.mark_rect().encode(
+        color=alt.Color(f'{score}:Q', scale=color_scale, title=METRIC_TITLES[metric]),
+        tooltip=['department:N', 'location:N',
+                 alt.Tooltip(f'{score}:Q', format='.2f', title='Score'),
+                 alt.Tooltip(f'{metric}_std:Q', format='.2f', title='Std dev'),
+                 alt.Tooltip('answers:Q', title='Answers')]
+    )
+    labels = base.mark_text(baseline='middle').encode(text=alt.Text(f'{score}:Q', format='.1f'))
+    
+    specs = {
+        "heatmap": _to_spec((heatmap + labels).properties(width='container', height=40 + 28 * scores['department'].nunique())),
+        "drill": None
+    }
+    
+    # Drill-down: the selected department's weekly score at each location
+    if drill_cells is not None and not drill_cells.empty:
+        weekly = cube_scores(drill_cells, metric, ["location", "week"], min_group_size=MIN_GROUP_SIZE)
+        
+        drill_chart = alt.Chart(weekly).mark_line(point=True).encode(
+            x=alt.X('week:T', title='Week'),
+            y=alt.Y(f'{score}:Q', scale=alt.Scale(domain=[1, 5]), title=f'{METRIC_TITLES[metric]} Score'),
+            color=alt.Color('location:N', title='Location'),
+            tooltip=['week:T', 'location:N', alt.Tooltip(f'{score}:Q', format='.2f'), 'answers:Q']
+        ).properties(
+            width='container',
+            height=300
+        )
+        
+        specs["drill"] = _to_spec(drill_chart)
+    
+    return specs
+
+@traced("chart")
+def render_department_location_heatmap(cells, metric, drill_cells=None, department=None, key=None):
+    """Render every department against every location, answered from the response cube"""
+    st.subheader(f"{METRIC_TITLES[metric]} by Department and Location")
+    
+    if cells.empty:
+        st.warning("No data available for the selected weeks.")
+        return
+    
+    specs = get_chart_specs(build_cube_heatmap_specs, key, cells, metric, drill_cells)
+    
+    st.vega_lite_chart(specs["heatmap"], use_container_width=True)
+    st.caption("Whole weeks overlapping the selected date range; the department and location filters do not apply.")
+    
+    if specs["drill"] is not None:
+        st.subheader(f"{department}: Weekly Score by Location")
+        st.vega_lite_chart(specs["drill"], use_container_width=True)
+
+def build_cohort_specs(cohorts, metric, value="change"):
+    """Build the department x week heatmap of scores or week-over-week changes"""
+    score = f"{metric}_score"
+    # High workload is bad, so its colour scales are reversed
+    reverse = metric == "workload"
+    
+    if value == "change":
+        field, title = "change", "Change"
+        # Diverging around no change, drops in red; moves of more than a
+        # point saturate
+        color_scale = alt.Scale(domain=[-1, 1], scheme='redblue', reverse=reverse, clamp=True)
+    else:
+        field, title = score, METRIC_TITLES[metric]
+        color_scale = alt.Scale(domain=[1, 5], scheme='redyellowgreen', reverse=reverse)
+    
+    # The spec carries every cell, so only what is drawn, rounded
+    cells = cohorts.assign(week=cohorts['week'].dt.strftime('%Y-%m-%d')).round({score: 2, 'change': 2})
+    departments = cells['department'].nunique()
+    
+    heatmap = alt.Chart(cells).mark_rect().encode(
+        x=alt.X('week:O', title='Week starting'),
+        y=alt.Y('department:N', title='Department', sort='ascending'),
+        color=alt.Color(f'{field}:Q', scale=color_scale, title=title),
+        tooltip=['department:N',
+                 alt.Tooltip('week:O', title='Week starting'),
+                 alt.Tooltip(f'{score}:Q', format='.2f', title='Score'),
+                 alt.Tooltip('change:Q', format='+.2f', title='Change'),
+                 alt.Tooltip('answers:Q', title='Answers')]
+    ).properties(
+        width='container',
+        # Rows get thinner as departments are added, down to 12px
+        height=40 + max(12, min(28, 2400 // max(departments, 1))) * departments
+    )
+    
+    # 52 weeks of 200 departments is past altair's 5000 row guard
+    with alt.data_transformers.enable(max_rows=None):
+        return {"heatmap": _to_spec(heatmap)}
+
+@traced("chart")
+def render_cohort_matrix(cohorts, metric, value="change", key=None):
+    """Render every department's weekly score, or its change on the week before"""
+    st.subheader(f"{METRIC_TITLES[metric]} Week over Week")
+    
+    if cohorts.empty:
+        st.warning("No data available for the selected weeks.")
+        return
+    
+    specs = get_chart_specs(build_cohort_specs, key, cohorts, metric, value)
+    st.vega_lite_chart(specs["heatmap"], use_container_width=True)
+    st.caption("Whole weeks up to the end of the selected date range. Change is the score minus the "
+               "department's score the week before; blank cells had no answers or too few to show.")
+    
+    with st.expander("Table"):
+        column = "change" if value == "change" else f"{metric}_score"
+        table = cohorts.pivot(index="department", columns="week", values=column)
+        table.columns = table.columns.strftime("%Y-%m-%d")
+        st.dataframe(table.round(2), use_container_width=True)
+
+def build_distribution_specs(summary, metric):
+    """Build the per-department p10/median/p90 chart from a sketch summary"""
+    ranges = summary.rename(columns={
+        f"{metric}_p10": "p10",
+        f"{metric}_p50": "median",
+        f"{metric}_p90": "p90",
+        f"{metric}_count": "responses"
+    })
+    ranges = ranges[ranges["responses"] > 0]
+    
+    base = alt.Chart(ranges).encode(
+        y=alt.Y('department:N', sort=alt.EncodingSortField('median', order='descending'), title='Department'),
+        tooltip=['department:N', 'p10:Q', 'median:Q', 'p90:Q', 'responses:Q', 'sessions:Q']
+    )
+    
+    # Bar from p10 to p90 with a tick at the median
+    spread = base.mark_rule(size=6, opacity=0.4).encode(
+        x=alt.X('p10:Q', scale=alt.Scale(domain=[1, 5]), title=f'{METRIC_TITLES[metric]} Score'),
+        x2='p90:Q'
+    )
+    median = base.mark_tick(thickness=3, size=18).encode(
+        x='median:Q',
+        color=alt.Color('median:Q', scale=alt.Scale(domain=[1, 5], scheme='redyellowgreen',
+                                                     reverse=(metric == "workload")), legend=None)
+    )
+    
+    chart = (spread + median).properties(width='container', height=40 + 24 * len(ranges))
+    return {"ranges": _to_spec(chart)}
+
+@traced("chart")
+def render_distribution_chart(overall, by_department, metric, key=None):
+    """Render approximate medians, percentiles and check-in session counts from the sketches"""
+    st.subheader(f"{METRIC_TITLES[metric]} Distribution")
+    
+    if by_department.empty or overall.empty:
+        st.warning("No data available for the selected filters.")
+        return
+    
+    total = overall.iloc[0]
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Median", f"{total[f'{metric}_p50']:.2f}")
+    
+    with col2:
+        st.metric("P10 – P90", f"{total[f'{metric}_p10']:.2f} – {total[f'{metric}_p90']:.2f}")
+    
+    with col3:
+        sessions = total["sessions"]
+        st.metric("Check-in sessions (est.)", "–" if pd.isna(sessions) else f"{int(sessions):,}")
+    
+    specs = get_chart_specs(build_distribution_specs, key, by_department, metric)
+    st.vega_lite_chart(specs["ranges"], use_container_width=True)
+    st.caption("Percentiles and session counts are estimated from mergeable sketches "
+               "(about 1–2% rank error, about 3% error in session counts). Sessions are not "
+               "people: an employee who checks in on several visits is counted once per visit.")
+
+def _highlight(snippet):
+    """Markdown for a search snippet: its text escaped, the matched words in bold"""
+    escaped = "".join("\\" + c if c in "\\`*_{}[]()#+-.!|<>~$" else c for c in snippet)
+    return escaped.replace("\x02", "**").replace("\x03", "**")
+
+@traced("chart")
+def render_search_results(results, total, offset):
+    """Render a page of comment search results"""
+    if total == 0:
+        st.info("No comments match this search.")
+        return
+    
+    st.caption(f"Showing {offset + 1}–{offset + len(results)} of {total} matching comments, best matches first")
+    
+    question_map = get_question_labels()
+    for result in results.itertuples():
+        st.markdown(_highlight(result.snippet))
+        # Only the month: an exact day within a small department or location
+        # could be enough to tell who wrote a comment
+        st.caption(f"{question_map.get(result.question, result.question)} · {result.timestamp:%B %Y}")
 
+@traced("chart")
 def render_trend_alerts(trends):
     """Render trend alerts"""
     st.subheader("Trend Alerts")
@@ -409,3 +750,145 @@ def render_trend_alerts(trends):
                 # Add severity indicator
                 if trend['severity'] == 'high':
                     st.markdown("<span style='color:red;'>High Severity</span>", unsafe_allow_html=True)
+
+def build_forecast_specs(history, forecasts, metric):
+    """Build the chart of departments' recent weekly scores and their forecasts"""
+    side, threshold = RISK_THRESHOLDS[metric]
+    score = f"{metric}_score"
+    
+    # Dates as strings keep the spec small
+    history = history.assign(week=history['week'].dt.strftime('%Y-%m-%d')).round({score: 2})
+    forecasts = forecasts.assign(week=forecasts['week'].dt.strftime('%Y-%m-%d')).round(
+        {'forecast': 2, 'lower': 2, 'upper': 2})
+    
+    y_scale = alt.Scale(domain=[1, 5])
+    color = alt.Color('department:N', title='Department')
+    
+    actual = alt.Chart(history).mark_line(point=True).encode(
+        x=alt.X('week:T', title='Week starting'),
+        y=alt.Y(f'{score}:Q', scale=y_scale, title=f'{METRIC_TITLES[metric]} Score'),
+        color=color,
+        tooltip=['department:N', alt.Tooltip('week:T', title='Week starting'),
+                 alt.Tooltip(f'{score}:Q', format='.2f', title='Score')]
+    )
+    
+    forecast_base = alt.Chart(forecasts).encode(x='week:T', color=color)
+    band = forecast_base.mark_area(opacity=0.15).encode(y=alt.Y('lower:Q', scale=y_scale), y2='upper:Q')
+    forecast = forecast_base.mark_line(strokeDash=[6, 4]).encode(
+        y=alt.Y('forecast:Q', scale=y_scale),
+        tooltip=['department:N', alt.Tooltip('week:T', title='Week starting'),
+                 alt.Tooltip('forecast:Q', format='.2f', title='Forecast'),
+                 alt.Tooltip('lower:Q', format='.2f', title='Low'),
+                 alt.Tooltip('upper:Q', format='.2f', title='High')]
+    )
+    
+    # The risk threshold
+    rule = alt.Chart(pd.DataFrame({'threshold': [threshold]})).mark_rule(color='red', strokeDash=[2, 2]).encode(
+        y='threshold:Q'
+    )
+    
+    chart = (band + actual + forecast + rule).properties(width='container', height=360)
+    return {"forecast": _to_spec(chart)}
+
+@traced("chart")
+def render_forecast(history, forecasts, flags, metric, department=None, key=None):
+    """Render departments at risk of crossing the metric's threshold, with their forecasts"""
+    st.subheader(f"{METRIC_TITLES[metric]} Forecast")
+    side, threshold = RISK_THRESHOLDS[metric]
+    
+    if forecasts.empty:
+        st.info("No forecasts yet. They are updated as check-ins arrive, once departments have a few "
+                "closed weeks with enough answers.")
+        return
+    
+    horizon = int(forecasts["weeks_ahead"].max())
+    
+    if department is None:
+        if flags.empty:
+            st.success(f"No department is {side} {threshold:.1f} or forecast to go {side} it "
+                       f"in the next {horizon} weeks.")
+            return
+        
+        st.write(f"**{len(flags)}** departments are {side} {threshold:.1f} or forecast to go {side} it "
+                 f"in the next {horizon} weeks.")
+        table = flags.rename(columns={
+            "department": "Department",
+            "current": "Current",
+            "projected": f"In {horizon} weeks",
+            "weeks_to_threshold": "Weeks to threshold"
+        })
+        st.dataframe(table.round(2), use_container_width=True, hide_index=True)
+        shown = flags["department"].head(FORECAST_CHART_DEPARTMENTS).tolist()
+    else:
+        shown = [department]
+        if department not in set(forecasts["department"]):
+            st.info(f"{department} has too few recent weeks with enough answers to forecast.")
+            return
+        
+        if not flags.empty:
+            weeks = int(flags["weeks_to_threshold"].iloc[0])
+            if weeks == 0:
+                st.warning(f"{department} is {side} {threshold:.1f}.")
+            else:
+                st.warning(f"{department} is forecast to go {side} {threshold:.1f} in {weeks} weeks.")
+
+    specs = get_chart_specs(build_forecast_specs, key, history[history["department"].isin(shown)],
+                            forecasts[forecasts["department"].isin(shown)], metric)
+    st.vega_lite_chart(specs["forecast"], use_container_width=True)
+    st.caption(f"Whole weeks up to the last one that has ended, across all locations. Dashed lines are "
+               f"forecasts by damped trend exponential smoothing, with about 80% of outcomes expected in "
+               f"the shaded band; the red line is the risk threshold of {threshold:.1f}. Weeks with too few "
+               f"answers to show are left out.")
+
+def render_profiler_panel(trace, traces):
+    """Render the timing breakdown of the latest script run for admins"""
+    st.header("Performance Profiler")
+    st.caption(f"Last rerun took {trace.duration:.0f} ms. Spans are recorded around data, analysis, chart and LLM calls.")
+    
+    if not trace.spans:
+        st.info("No instrumented code ran during this rerun.")
+        return
+    
+    # Time spent per stage
+    totals = trace.totals_by_category()
+    metric_cols = st.columns(len(totals))
+    for col, (category, duration) in zip(metric_cols, sorted(totals.items(), key=lambda x: x[1], reverse=True)):
+        with col:
+            st.metric(category.title(), f"{duration:.0f} ms")
+    
+    spans_df = pd.DataFrame(trace.spans)
+    spans_df['end_ms'] = spans_df['start_ms'] + spans_df['duration_ms']
+    
+    # Flame-style timeline: one row per nesting depth
+    timeline = alt.Chart(spans_df).mark_bar(stroke='white').encode(
+        x=alt.X('start_ms:Q', title='Time since rerun start (ms)'),
+        x2='end_ms:Q',
+        y=alt.Y('depth:O', title='Depth'),
+        color=alt.Color('category:N', title='Stage'),
+        tooltip=['name:N', 'category:N', alt.Tooltip('duration_ms:Q', format='.1f')]
+    ).properties(
+        width='container',
+        height=40 + 30 * (spans_df['depth'].max() + 1)
+    )
+    
+    st.altair_chart(timeline, use_container_width=True)
+    
+    st.dataframe(
+        spans_df[['name', 'category', 'start_ms', 'duration_ms', 'depth']].round(2),
+        hide_index=True,
+        use_container_width=True
+    )
+    
+    # Export in Chrome Trace Event format for chrome://tracing or Perfetto
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "Download traces (Chrome trace format)",
+            data=json.dumps(to_chrome_trace(traces)),
+            file_name="hurdl-trace.json",
+            mime="application/json"
+        )
+    with col2:
+        if st.button("Save traces to data/traces"):
+            path = export_chrome_trace(traces, os.path.join("data", "traces", f"trace-{int(time.time())}.json"))
+            st.success(f"Saved {len(traces)} reruns to {path}")